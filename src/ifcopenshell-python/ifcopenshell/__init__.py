@@ -36,6 +36,7 @@ from __future__ import print_function
 
 import os
 import sys
+import mmap
 import tempfile
 import zipfile
 from pathlib import Path
@@ -91,16 +92,35 @@ class SchemaError(Error):
     pass
 
 
-def open(path: "os.PathLike | str", format: str = None, should_stream: bool = False) -> file:
+def open(
+    path: "os.PathLike | str",
+    format: str = None,
+    should_stream: bool = False,
+    zip_memory_limit: int = None,
+    save_index: bool = False,
+    index_path: "os.PathLike | str" = None,
+) -> file:
     """Loads an IFC dataset from a filepath
 
     You can specify a file format. If no format is given, it is guessed from its extension.
     Currently supported specified format : .ifc | .ifcZIP | .ifcXML
 
+    When streamed, the index of the file is reused from the sidecar file at
+    index_path, which defaults to the path suffixed with .index, if it is up
+    to date. If save_index is true and the index had to be built, it is saved
+    there so that later streamed opens of the same file are near instant.
+
+    IFC-SPF data in .ifcZIP archives is decompressed in memory. Members larger
+    than zip_memory_limit bytes, which defaults to
+    ifcopenshell.util.file.ZIP_MEMORY_LIMIT, are decompressed into a memory map
+    backed by a temporary file instead, so they don't need to fit in memory.
+
     Examples:
         model = ifcopenshell.open("/path/to/model.ifc")
         model = ifcopenshell.open("/path/to/model.ifcXML")
         model = ifcopenshell.open("/path/to/model.any_extension", ".ifc")
+        model = ifcopenshell.open("/path/to/model.ifcZIP", zip_memory_limit=1 << 30)
+        model = ifcopenshell.open("/path/to/model.ifc", should_stream=True, save_index=True)
     """
     path = Path(path)
     if format is None:
@@ -110,19 +130,34 @@ def open(path: "os.PathLike | str", format: str = None, should_stream: bool = Fa
         if f:
             return file(f)
         raise IOError(f"Failed to parse .ifcXML file from {path}")
-    if format == ".ifcZIP":
-        with tempfile.TemporaryDirectory() as unzipped_path:
-            with zipfile.ZipFile(path) as zf:
-                for name in zf.namelist():
-                    if Path(name).suffix.lower() in (".ifc", ".ifcxml"):
-                        return open(zf.extract(name, unzipped_path))
-                else:
-                    raise LookupError(f"No .ifc or .ifcXML file found in {path}")
     if format == ".ifcSQLite":
         return sqlite(path)
     if should_stream:
-        return stream(path)
-    f = ifcopenshell_wrapper.open(str(path.absolute()))
+        return stream(path, save_index=save_index, index_path=index_path)
+    if format == ".ifcZIP":
+        if zip_memory_limit is None:
+            zip_memory_limit = ifcopenshell.util.file.ZIP_MEMORY_LIMIT
+        with zipfile.ZipFile(path) as zf:
+            info = ifcopenshell.util.file.get_zip_member(zf)
+            # The XML parser only reads from disk, as does the SPF parser for
+            # data too large to be read from memory.
+            if (
+                Path(info.filename).suffix.lower() == ".ifcxml"
+                or info.file_size > ifcopenshell.util.file.SPF_BUFFER_LIMIT
+            ):
+                with tempfile.TemporaryDirectory() as unzipped_path:
+                    return open(zf.extract(info, unzipped_path))
+            if info.file_size > zip_memory_limit:
+                data = ifcopenshell.util.file.map_zip_member(zf, info)
+            else:
+                data = ifcopenshell.util.file.read_zip_member(zf, info)
+            try:
+                f = ifcopenshell_wrapper.read_buffer(data)
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+    else:
+        f = ifcopenshell_wrapper.open(str(path.absolute()))
     if f.good():
         return file(f)
     else:
@@ -138,6 +173,79 @@ def open(path: "os.PathLike | str", format: str = None, should_stream: bool = Fa
         raise exc(msg)
 
 
+def open_many(paths, workers=None, format=None, should_stream=False, with_stats=False):
+    """Loads a set of IFC datasets concurrently
+
+    Files are parsed in a pool of threads. The parser releases the GIL while
+    reading, so multiple files are parsed in parallel on multiple cores.
+
+    Example:
+
+    .. code:: python
+
+        models = ifcopenshell.open_many(["arch.ifc", "struct.ifc", "mep.ifc"], workers=4)
+        models, stats = ifcopenshell.open_many(paths, with_stats=True)
+        for s in stats:
+            print(s["path"], s["time"], s["memory"])
+
+    :param paths: The filepaths to load
+    :type paths: list[os.PathLike | str]
+    :param workers: The number of files loaded at the same time. Defaults to
+        the number of processors.
+    :type workers: int
+    :param format: The format of all files, see ``open``. Guessed from each
+        extension if None.
+    :type format: string
+    :param should_stream: Whether to open the files using the stream backend
+    :type should_stream: bool
+    :param with_stats: Whether to also return the load time in seconds and
+        the growth in process memory in bytes of each file. Memory is None
+        if it cannot be measured on this platform. With more than one worker
+        the growth includes files loaded at the same time, so it is an
+        upper bound.
+    :type with_stats: bool
+    :returns: The files, in the same order as paths, and if with_stats is
+        set a list of dictionaries of stats in the same order.
+    :rtype: list[ifcopenshell.file.file]
+    """
+    import time
+    import concurrent.futures
+
+    def load(path):
+        memory = _get_memory_usage()
+        start = time.perf_counter()
+        f = open(path, format=format, should_stream=should_stream)
+        stats = {"path": str(path), "time": time.perf_counter() - start, "memory": None}
+        if memory is not None:
+            stats["memory"] = max(0, _get_memory_usage() - memory)
+        return f, stats
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        results = list(executor.map(load, paths))
+
+    files = [r[0] for r in results]
+    if with_stats:
+        return files, [r[1] for r in results]
+    return files
+
+
+def _get_memory_usage():
+    """Returns the resident memory of this process in bytes, or None if unknown"""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        import io
+
+        with io.open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
 def create_entity(type, schema="IFC4", *args, **kwargs):
     """Creates a new IFC entity that does not belong to an IFC file object
 
@@ -97,6 +97,59 @@ for nm in ifcopenshell_wrapper.schema_names():
     register_schema_attributes(schema)
 
 
+INVALID, FORWARD, INVERSE = range(3)
+
+# For every schema and entity, a mapping of attribute names to how they are accessed in __getattr__. For forward
+# attributes this is the attribute index and for inverse attributes whether it is a non-aggregate inverse that may need
+# to be unpacked. This replaces querying the category and index and scanning the inverse attributes of the declaration
+# on every attribute access. Derived attributes are absent, so they fall through to the derived attribute handling.
+# Populated lazily per entity as there are thousands of them across all schemas.
+_attribute_dict = {}
+
+
+def get_attribute_accessors(fq_name):
+    accessors = _attribute_dict.get(fq_name)
+    if accessors is None:
+        accessors = {}
+        schema_name, name = fq_name.split(".")
+        decl = ifcopenshell_wrapper.schema_by_name(schema_name).declaration_by_name(name)
+        if isinstance(decl, ifcopenshell_wrapper.entity):
+            methods = _method_dict[fq_name]
+            for idx, attr in enumerate(decl.all_attributes()):
+                if methods[idx] is not set_derived_attribute:
+                    accessors[attr.name()] = (FORWARD, idx)
+            for inv in decl.all_inverse_attributes():
+                accessors[inv.name()] = (INVERSE, (inv.bound1(), inv.bound2()) == (-1, -1))
+        _attribute_dict[fq_name] = accessors
+    return accessors
+
+
+@functools.lru_cache(maxsize=None)
+def get_derived_attribute_function(fq_name, name):
+    # Resolving the rule that computes a derived attribute involves importing
+    # the (large) rules module of the schema and walking up the supertypes,
+    # so the result, including the absence of a rule, is memoised.
+    schema_name, entity_name = fq_name.split(".")
+    try:
+        rules = importlib.import_module(f"ifcopenshell.express.rules.{schema_name}")
+    except:
+        import os
+        current_dir_files = {fn.lower(): fn for fn in os.listdir('.')}
+        schema_path = current_dir_files.get(schema_name.lower() + '.exp')
+        fn = schema_path[:-4] + '.py'
+        if not os.path.exists(fn):
+            subprocess.run([sys.executable, "-m", "ifcopenshell.express.rule_compiler", schema_path, fn], check=True)
+            time.sleep(1.)
+        rules = importlib.import_module(schema_name)
+
+    decl = ifcopenshell_wrapper.schema_by_name(schema_name).declaration_by_name(entity_name)
+    while decl:
+        fn = getattr(rules, f"calc_{decl.name()}_{name}", None)
+        if fn:
+            return fn
+        decl = decl.supertype()
+
+
 class entity_instance(object):
     """Base class for all IFC objects.
 
@@ -139,7 +192,20 @@ class entity_instance(object):
         return file.file.from_pointer(self.wrapped_data.file_pointer())
 
     def __getattr__(self, name):
-        INVALID, FORWARD, INVERSE = range(3)
+        fq_name = self.wrapped_data.is_a(True)
+        accessors = _attribute_dict.get(fq_name)
+        if accessors is None:
+            accessors = get_attribute_accessors(fq_name)
+        accessor = accessors.get(name)
+        if accessor is not None:
+            attr_cat, value = accessor
+            if attr_cat == FORWARD:
+                return entity_instance.wrap_value(self.wrapped_data.get_argument(value), self.wrapped_data.file)
+            vs = entity_instance.wrap_value(self.wrapped_data.get_inverse(name), self.wrapped_data.file)
+            if value and settings.unpack_non_aggregate_inverses:
+                vs = vs[0] if vs else None
+            return vs
+
         attr_cat = self.wrapped_data.get_attribute_category(name)
         if attr_cat == FORWARD:
             idx = self.wrapped_data.get_argument_index(name)
@@ -160,29 +226,15 @@ class entity_instance(object):
             return vs
 
         # derived attribute perhaps?
-        schema_name = self.wrapped_data.is_a(True).split(".")[0]
-        try:
-            rules = importlib.import_module(f"ifcopenshell.express.rules.{schema_name}")
-        except:
-            import os
-            current_dir_files = {fn.lower(): fn for fn in os.listdir('.')}
-            schema_path = current_dir_files.get(schema_name.lower() + '.exp')
-            fn = schema_path[:-4] + '.py'
-            if not os.path.exists(fn):
-                subprocess.run([sys.executable, "-m", "ifcopenshell.express.rule_compiler", schema_path, fn], check=True)
-                time.sleep(1.)
-            rules = importlib.import_module(schema_name)
-
-        def yield_supertypes():
-            decl = ifcopenshell_wrapper.schema_by_name(schema_name).declaration_by_name(self.is_a())
-            while decl:
-                yield decl.name()
-                decl = decl.supertype()
-
-        for sty in yield_supertypes():
-            fn = getattr(rules, f"calc_{sty}_{name}", None)
-            if fn:
-                return fn(self)
+        fn = get_derived_attribute_function(fq_name, name)
+        if fn:
+            if settings.cache_derived_attributes and self.wrapped_data.file and self.id():
+                cache = self.wrapped_data.file.derived_attribute_cache
+                key = (self.id(), name)
+                if key not in cache:
+                    cache[key] = fn(self)
+                return cache[key]
+            return fn(self)
 
         if attr_cat != FORWARD:
             raise AttributeError(
@@ -250,6 +302,10 @@ class entity_instance(object):
         if self.wrapped_data.file and self.wrapped_data.file.transaction:
             self.wrapped_data.file.transaction.store_edit(self, idx, value)
 
+        if self.wrapped_data.file and self.wrapped_data.file.derived_attribute_cache:
+            # Derived values may depend on any other instance
+            self.wrapped_data.file.derived_attribute_cache.clear()
+
         if self.method_list is None:
             super(entity_instance, self).__setattr__("method_list", _method_dict[self.is_a(True)])
 
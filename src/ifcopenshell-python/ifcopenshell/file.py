@@ -23,15 +23,18 @@ from __future__ import print_function
 
 import os
 import re
+import sys
 import numbers
+import collections
 import zipfile
+import weakref
 import functools
 from pathlib import Path
 
 import ifcopenshell.util.element
 import ifcopenshell.util.file
 from . import ifcopenshell_wrapper
-from .entity_instance import entity_instance
+from .entity_instance import entity_instance, get_attribute_accessors, FORWARD
 
 try:
     # Python 2
@@ -41,32 +44,141 @@ except NameError:
     basestring = (str, bytes)
 
 
+class Reference(object):
+    """A serialised reference to an entity instance by its id, used in the transaction log"""
+
+    __slots__ = ("id",)
+
+    def __init__(self, id):
+        self.id = id
+
+    def __eq__(self, other):
+        return type(other) is Reference and other.id == self.id
+
+    def __hash__(self):
+        return hash((Reference, self.id))
+
+
+class TypedValue(object):
+    """A serialised entity instance without an id, such as IfcLabel('x'), used in the transaction log"""
+
+    __slots__ = ("type", "value")
+
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
+
+    def __eq__(self, other):
+        return type(other) is TypedValue and (other.type, other.value) == (self.type, self.value)
+
+    def __hash__(self):
+        return hash((TypedValue, self.type, self.value))
+
+
 class Transaction:
+    """A log of the changes made to a file which can be rolled back and committed again
+
+    The log is kept compact: operations are tuples, entities only store
+    their non-null attributes by index, equal values are stored once and
+    repeated edits of the same attribute are merged into a single edit.
+    ``size`` is an estimate in bytes of the memory used by the log.
+    """
+
+    CREATE, EDIT, DELETE, BATCH_DELETE = range(4)
+
     def __init__(self, ifc_file):
         self.file = ifc_file
         self.operations = []
+        self.size = 0
+        self.values = {}
+        self.edits = {}
+        self.spill_file = None
         self.is_batched = False
         self.batch_delete_index = 0
         self.batch_delete_ids = set()
-        self.batch_inverses = []
+
+    def intern(self, value):
+        if not isinstance(value, (str, tuple, Reference, TypedValue)):
+            if value is not None:
+                self.size += sys.getsizeof(value)
+            return value
+        # Values are keyed including their types, as 1 == 1.0 == True
+        key = Transaction.get_value_key(value)
+        try:
+            interned = self.values.get(key)
+        except TypeError:
+            self.size += Transaction.estimate_value_size(value)
+            return value
+        if interned is None:
+            self.values[key] = interned = value
+            self.size += Transaction.estimate_value_size(value)
+        return interned
+
+    @staticmethod
+    def estimate_value_size(value):
+        if isinstance(value, tuple):
+            return sys.getsizeof(value) + sum(Transaction.estimate_value_size(v) for v in value)
+        elif isinstance(value, TypedValue):
+            return sys.getsizeof(value) + Transaction.estimate_value_size(value.value)
+        return sys.getsizeof(value)
+
+    @staticmethod
+    def get_value_key(value):
+        if isinstance(value, tuple):
+            return tuple(map(Transaction.get_value_key, value))
+        return (type(value), value)
+
+    def append(self, operation):
+        self.operations.append(operation)
+        self.size += self.estimate_size(operation)
+        if operation[0] != Transaction.EDIT:
+            # Merging edits across a create or delete could change what is rolled back
+            self.edits = {}
+
+    @staticmethod
+    def estimate_size(operation):
+        """Estimates the memory used by an operation
+
+        The nested tuples, ids, indices and class names are counted. Attribute
+        values are shared between operations and already counted once by
+        intern(), so only the references to them are counted here.
+        """
+        size = sys.getsizeof(operation)
+        if operation[0] == Transaction.EDIT:
+            return size + sys.getsizeof(operation[1]) + sys.getsizeof(operation[2])
+        elif operation[0] == Transaction.BATCH_DELETE:
+            inverses = operation[1]
+        else:
+            step_id, ifc_class, attributes = operation[1]
+            size += sys.getsizeof(operation[1]) + sys.getsizeof(step_id) + sys.getsizeof(ifc_class)
+            size += sys.getsizeof(attributes) + sum(sys.getsizeof(a) + sys.getsizeof(a[0]) for a in attributes)
+            inverses = operation[2] if operation[0] == Transaction.DELETE else ()
+        if inverses:
+            size += sys.getsizeof(inverses)
+            size += sum(sys.getsizeof(i) + sys.getsizeof(i[0]) + sys.getsizeof(i[1]) for i in inverses)
+        return size
 
     def serialise_entity_instance(self, element):
-        info = element.get_info()
-        for key, value in info.items():
-            info[key] = self.serialise_value(element, value)
-        return info
+        attributes = []
+        for i in range(len(element)):
+            value = element[i]
+            if value is not None:
+                attributes.append((i, self.serialise_value(element, value)))
+        return (element.id(), element.is_a(), tuple(attributes))
 
     def serialise_value(self, element, value):
-        return element.walk(
-            lambda v: isinstance(v, entity_instance),
-            lambda v: {"id": v.id()} if v.id() else {"type": v.is_a(), "value": v.wrappedValue},
-            value,
+        return self.intern(
+            element.walk(
+                lambda v: isinstance(v, entity_instance),
+                lambda v: Reference(v.id()) if v.id() else TypedValue(v.is_a(), v.wrappedValue),
+                value,
+            )
         )
 
     def unserialise_value(self, element, value):
         return element.walk(
-            lambda v: isinstance(v, dict),
-            lambda v: self.file.by_id(v["id"]) if v.get("id") else self.file.create_entity(v["type"], v["value"]),
+            lambda v: isinstance(v, (Reference, TypedValue)),
+            lambda v: self.file.by_id(v.id) if isinstance(v, Reference) else self.file.create_entity(v.type, v.value),
             value,
         )
 
@@ -74,110 +186,325 @@ class Transaction:
         self.is_batched = True
         self.batch_delete_index = len(self.operations)
         self.batch_delete_ids = set()
-        self.batch_inverses = []
 
     def unbatch(self):
-        for inverses in self.batch_inverses:
-            if inverses:
-                self.operations.insert(self.batch_delete_index, {"action": "batch_delete", "inverses": inverses})
+        # Batched deletions are only processed when the file is unbatched, so
+        # all deleted elements and their inverses are still intact here.
+        inverses = self.get_batch_inverses(self.batch_delete_ids)
+        if inverses:
+            self.operations.insert(self.batch_delete_index, (Transaction.BATCH_DELETE, inverses))
+            self.size += self.estimate_size(self.operations[self.batch_delete_index])
+        self.edits = {}
         self.is_batched = False
         self.batch_delete_index = 0
         self.batch_delete_ids = set()
-        self.batch_inverses = []
 
     def store_create(self, element):
         if element.id():
-            self.operations.append({"action": "create", "value": self.serialise_entity_instance(element)})
+            self.append((Transaction.CREATE, self.serialise_entity_instance(element)))
 
     def store_edit(self, element, index, value):
         if element.id():
-            self.operations.append(
-                {
-                    "action": "edit",
-                    "id": element.id(),
-                    "index": index,
-                    "old": self.serialise_value(element, element[index]),
-                    "new": self.serialise_value(element, value),
-                }
-            )
+            key = (element.id(), index)
+            new = self.serialise_value(element, value)
+            position = self.edits.get(key)
+            if position is not None:
+                operation = self.operations[position]
+                self.operations[position] = operation[:4] + (new,)
+            else:
+                old = self.serialise_value(element, element[index])
+                self.edits[key] = len(self.operations)
+                self.append((Transaction.EDIT, key[0], index, old, new))
 
     def store_delete(self, element):
-        inverses = {}
+        inverses = ()
         if self.is_batched:
-            if element.id() not in self.batch_delete_ids:
-                self.batch_inverses.append(self.get_element_inverses(element))
+            # Inverses are captured for all deleted elements at once in unbatch()
             self.batch_delete_ids.add(element.id())
         else:
             inverses = self.get_element_inverses(element)
-        self.operations.append(
-            {"action": "delete", "inverses": inverses, "value": self.serialise_entity_instance(element)}
-        )
+        self.append((Transaction.DELETE, self.serialise_entity_instance(element), inverses))
 
     def get_element_inverses(self, element):
-        inverses = {}
+        inverses = []
         for inverse in self.file.get_inverse(element):
-            inverse_references = []
             for i, attribute in enumerate(inverse):
                 if ifcopenshell.util.element.has_element_reference(attribute, element):
-                    inverse_references.append((i, self.serialise_value(inverse, attribute)))
-            inverses[inverse.id()] = inverse_references
-        return inverses
+                    inverses.append((inverse.id(), i, self.serialise_value(inverse, attribute)))
+        return tuple(inverses)
+
+    def get_batch_inverses(self, ids):
+        """Captures the references to a set of deleted elements
+
+        Each inverse is scanned once, regardless of how many of the deleted
+        elements it references, so the cost is linear in the total number of
+        references rather than in deleted elements times inverse sizes.
+        """
+        affected = {}
+        for id in ids:
+            for inverse in self.file.get_inverse(self.file.by_id(id)):
+                affected.setdefault(inverse.id(), inverse)
+        inverses = []
+        for inverse in affected.values():
+            for i, attribute in enumerate(inverse):
+                if Transaction.has_reference(attribute, ids):
+                    inverses.append((inverse.id(), i, self.serialise_value(inverse, attribute)))
+        return tuple(inverses)
+
+    @staticmethod
+    def has_reference(value, ids):
+        if isinstance(value, (tuple, list)):
+            return any(Transaction.has_reference(v, ids) for v in value)
+        return isinstance(value, entity_instance) and value.id() in ids
+
+    def end(self):
+        """Releases the lookups which are only needed while changes are being recorded
+
+        Interned values remain shared by the operations which use them.
+        """
+        self.values = {}
+        self.edits = {}
+
+    def spill(self):
+        """Moves the log to a temporary file, to be read back on rollback or commit"""
+        import pickle
+        import tempfile
+
+        self.spill_file = tempfile.TemporaryFile()
+        pickle.dump(self.operations, self.spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.operations = None
+        self.size = 0
+
+    def get_operations(self):
+        if self.operations is None:
+            import pickle
+
+            self.spill_file.seek(0)
+            return pickle.load(self.spill_file)
+        return self.operations
+
+    def create_element(self, serialised):
+        id, ifc_class, attributes = serialised
+        e = self.file.create_entity(ifc_class, id=id)
+        for index, value in attributes:
+            try:
+                e[index] = self.unserialise_value(e, value)
+            except:
+                # Catch discrepancy where IfcOpenShell creates but doesn't allow editing of invalid values
+                pass
+
+    def restore_inverses(self, inverses):
+        for inverse_id, index, value in inverses:
+            inverse = self.file.by_id(inverse_id)
+            inverse[index] = self.unserialise_value(inverse, value)
 
     def rollback(self):
-        for operation in self.operations[::-1]:
-            if operation["action"] == "create":
-                element = self.file.by_id(operation["value"]["id"])
+        for operation in self.get_operations()[::-1]:
+            if operation[0] == Transaction.CREATE:
+                element = self.file.by_id(operation[1][0])
                 if hasattr(element, "GlobalId") and element.GlobalId is None:
                     # hack, otherwise ifcopenshell gets upset
                     element.GlobalId = "x"
                 self.file.remove(element)
-            elif operation["action"] == "edit":
-                element = self.file.by_id(operation["id"])
+            elif operation[0] == Transaction.EDIT:
+                element = self.file.by_id(operation[1])
                 try:
-                    element[operation["index"]] = self.unserialise_value(element, operation["old"])
+                    element[operation[2]] = self.unserialise_value(element, operation[3])
                 except:
                     # Catch discrepancy where IfcOpenShell creates but doesn't allow editing of invalid values
                     pass
-            elif operation["action"] == "delete":
-                e = self.file.create_entity(operation["value"]["type"], id=operation["value"]["id"])
-                for k, v in operation["value"].items():
-                    try:
-                        setattr(e, k, self.unserialise_value(e, v))
-                    except:
-                        # Catch discrepancy where IfcOpenShell creates but doesn't allow editing of invalid values
-                        pass
-                for inverse_id, data in operation["inverses"].items():
-                    inverse = self.file.by_id(inverse_id)
-                    for index, value in data:
-                        inverse[index] = self.unserialise_value(inverse, value)
-            elif operation["action"] == "batch_delete":
-                for inverse_id, data in operation["inverses"].items():
-                    inverse = self.file.by_id(inverse_id)
-                    for index, value in data:
-                        inverse[index] = self.unserialise_value(inverse, value)
+            elif operation[0] == Transaction.DELETE:
+                self.create_element(operation[1])
+                self.restore_inverses(operation[2])
+            elif operation[0] == Transaction.BATCH_DELETE:
+                self.restore_inverses(operation[1])
 
     def commit(self):
-        for operation in self.operations:
-            if operation["action"] == "create":
-                e = self.file.create_entity(operation["value"]["type"], id=operation["value"]["id"])
-                for k, v in operation["value"].items():
-                    try:
-                        setattr(e, k, self.unserialise_value(e, v))
-                    except:
-                        # Catch discrepancy where IfcOpenShell creates but doesn't allow editing of invalid values
-                        pass
-            elif operation["action"] == "edit":
-                element = self.file.by_id(operation["id"])
-                element[operation["index"]] = self.unserialise_value(element, operation["new"])
-            elif operation["action"] == "delete":
-                element = self.file.by_id(operation["value"]["id"])
+        for operation in self.get_operations():
+            if operation[0] == Transaction.CREATE:
+                self.create_element(operation[1])
+            elif operation[0] == Transaction.EDIT:
+                element = self.file.by_id(operation[1])
+                element[operation[2]] = self.unserialise_value(element, operation[4])
+            elif operation[0] == Transaction.DELETE:
+                element = self.file.by_id(operation[1][0])
                 self.file.remove(element)
-            elif operation["action"] == "batch_delete":
-                pass
+
+
+class LRUCache:
+    """A least recently used cache bounded by item count and approximate bytes
+
+    Used by the stream and sqlite backends to cache entity instances and
+    their parsed attribute values. When both limits are None the cache is
+    unbounded. Sizes are estimates provided by the caller and may be updated
+    after insertion, for example when attributes are lazily parsed.
+    """
+
+    # Rough size of an entity_instance, its SWIG object and backend wrapper
+    ENTITY_SIZE = 512
+
+    def __init__(self, max_items=None, max_bytes=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.items = collections.OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        item = self.items.get(key, None)
+        if item is None:
+            self.misses += 1
+            return default
+        self.items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def set(self, key, value, size=ENTITY_SIZE):
+        item = self.items.pop(key, None)
+        if item is not None:
+            self.total_bytes -= item[1]
+        self.items[key] = (value, size)
+        self.total_bytes += size
+        self.evict()
+
+    def peek(self, key, default=None):
+        """Returns an item without marking it as used or counting a hit or miss"""
+        item = self.items.get(key, None)
+        return default if item is None else item[0]
+
+    def pop(self, key, default=None):
+        item = self.items.pop(key, None)
+        if item is None:
+            return default
+        self.total_bytes -= item[1]
+        return item[0]
+
+    def resize(self, key, size):
+        item = self.items.get(key, None)
+        if item is not None:
+            self.items[key] = (item[0], size)
+            self.total_bytes += size - item[1]
+            self.evict()
+
+    def evict(self):
+        # The most recently used item is never evicted, even if it alone exceeds the budget
+        while len(self.items) > 1 and (
+            (self.max_items is not None and len(self.items) > self.max_items)
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            self.total_bytes -= self.items.popitem(last=False)[1][1]
+            self.evictions += 1
+
+    def clear(self):
+        self.items.clear()
+        self.total_bytes = 0
+
+    def get_stats(self):
+        """Returns counters to help tune the cache limits
+
+        :returns: A dictionary of hits, misses, evictions, hit_rate, items and bytes
+        :rtype: dict
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+            "items": len(self.items),
+            "bytes": self.total_bytes,
+        }
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    @staticmethod
+    def estimate_size(value):
+        """Estimates the memory used by a parsed attribute value
+
+        Referenced entity instances are not counted as they are cached separately.
+        """
+        if isinstance(value, (tuple, list)):
+            return sys.getsizeof(value) + sum(LRUCache.estimate_size(v) for v in value)
+        elif isinstance(value, entity_instance) and value.id():
+            return 0
+        return sys.getsizeof(value)
+
+
+def contains_instance(value):
+    if isinstance(value, tuple):
+        return any(contains_instance(v) for v in value)
+    return isinstance(value, ifcopenshell_wrapper.entity_instance)
+
+
+def to_array(values):
+    """Converts a column of attribute values to a numpy array
+
+    Columns of only integers, reals or booleans get a numeric dtype. Anything
+    else, such as strings, aggregates or missing values, is stored as objects.
+    """
+    import numpy as np
+
+    types = set(map(type, values))
+    if types and types <= {bool}:
+        return np.array(values, dtype=bool)
+    elif types and types <= {int}:
+        return np.array(values, dtype=np.int64)
+    elif types and types <= {int, float}:
+        return np.array(values, dtype=np.float64)
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+    return array
 
 
 file_dict = {}
 
+# Files registered using file.share(), keyed by the name of the shared memory
+# block holding their IFC-SPF data. Forked worker processes inherit this
+# registry, which is what allows the files to be unpickled by reference.
+# References are weak, so sharing a file does not keep it alive.
+shared_files = weakref.WeakValueDictionary()
+
+# Files parsed from shared memory by worker processes which were not forked,
+# kept for the lifetime of the process so that each worker parses them once
+attached_files = {}
+
+
+def get_shared_file(name, size):
+    """Returns a file registered using file.share(), used when unpickling in worker processes"""
+    result = shared_files.get(name) or attached_files.get(name)
+    if result is None:
+        from multiprocessing import shared_memory
+
+        try:
+            # Python 3.13+, otherwise the worker's resource tracker may unlink the block
+            memory = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            memory = shared_memory.SharedMemory(name)
+        try:
+            view = memory.buf[:size]
+            try:
+                result = attached_files[name] = file.from_bytes(view)
+            finally:
+                view.release()
+        finally:
+            memory.close()
+    return result
+
+
+def release_shared_memory(memory):
+    memory.close()
+    try:
+        memory.unlink()
+    except FileNotFoundError:
+        pass
+
 
 class file(object):
     """Base class for containing IFC files.
@@ -248,17 +575,75 @@ class file(object):
             args = map(ifcopenshell_wrapper.schema_by_name, args)
             self.wrapped_data = ifcopenshell_wrapper.file(*args)
         self.history_size = 64
+        self.history_max_bytes = None
+        self.history_spill_bytes = None
         self.history = []
         self.future = []
         self.transaction = None
+        self.derived_attribute_cache = {}
+        self.by_type_cache = None
 
         # Temporarily commented out until bot builds are available and tested to prevent user bugs.
         # file_dict[self.file_pointer()] = self
 
-    def set_history_size(self, size):
+    def set_history_size(self, size, max_bytes=None, spill_bytes=None):
+        """Limits how much undo history is kept
+
+        :param size: The maximum number of transactions to keep
+        :type size: int
+        :param max_bytes: The approximate memory budget of all kept
+            transactions. The oldest transactions are discarded until the
+            history fits, although the most recent one is always kept.
+        :type max_bytes: int
+        :param spill_bytes: Transactions larger than this many bytes are
+            moved to a temporary file when they end, and read back when they
+            are undone or redone.
+        :type spill_bytes: int
+        """
         self.history_size = size
+        self.history_max_bytes = max_bytes
+        self.history_spill_bytes = spill_bytes
+        self.trim_history()
+
+    def trim_history(self):
         while len(self.history) > self.history_size:
             self.history.pop(0)
+        if self.history_max_bytes is not None:
+            size = sum(t.size for t in self.history)
+            while len(self.history) > 1 and size > self.history_max_bytes:
+                size -= self.history.pop(0).size
+
+    def set_by_type_cache(self, enabled=True, max_items=None, max_bytes=None):
+        """Memoises the results of by_type until the file is changed
+
+        Useful when the same classes are repeatedly queried on a model which
+        isn't being modified, such as when validating or comparing models. The
+        cache is cleared whenever an entity instance is created, added or
+        removed, including by undo and redo. Editing attribute values does not
+        affect by_type, so does not clear the cache. Use
+        ``by_type_cache.get_stats()`` to see its hit rate.
+
+        :param enabled: Whether or not to cache by_type results
+        :type enabled: bool
+        :param max_items: The maximum number of cached queries
+        :type max_items: int
+        :param max_bytes: The approximate maximum memory used in bytes
+        :type max_bytes: int
+        """
+        self.by_type_cache = LRUCache(max_items, max_bytes) if enabled else None
+
+    def clear_by_type_cache(self):
+        if self.by_type_cache is not None:
+            self.by_type_cache.clear()
+
+    def clear_caches(self):
+        """Clears by_type results and derived attribute values cached for the current model
+
+        Called whenever entity instances are created, added or removed,
+        including by undo and redo, as derived values may depend on inverses.
+        """
+        self.derived_attribute_cache.clear()
+        self.clear_by_type_cache()
 
     def begin_transaction(self):
         if self.history_size:
@@ -266,9 +651,11 @@ class file(object):
 
     def end_transaction(self):
         if self.transaction:
+            self.transaction.end()
+            if self.history_spill_bytes is not None and self.transaction.size > self.history_spill_bytes:
+                self.transaction.spill()
             self.history.append(self.transaction)
-            if len(self.history) > self.history_size:
-                self.history.pop(0)
+            self.trim_history()
             self.future = []
             self.transaction = None
 
@@ -283,6 +670,7 @@ class file(object):
         transaction = self.history.pop()
         transaction.rollback()
         self.future.append(transaction)
+        self.clear_caches()
 
     def redo(self):
         if not self.future:
@@ -290,6 +678,7 @@ class file(object):
         transaction = self.future.pop()
         transaction.commit()
         self.history.append(transaction)
+        self.clear_caches()
 
     def create_entity(self, type, *args, **kwargs):
         """Create a new IFC entity in the file.
@@ -343,6 +732,7 @@ class file(object):
         # Once the values are populated add the instance
         # to the file.
         self.wrapped_data.add(e.wrapped_data, eid)
+        self.clear_caches()
 
         # The file container now handles the lifetime of
         # this instance. Tell SWIG that it is no longer
@@ -405,6 +795,7 @@ class file(object):
             max_id = self.wrapped_data.getMaxId()
         inst.wrapped_data.this.disown()
         result = entity_instance(self.wrapped_data.add(inst.wrapped_data, -1 if _id is None else _id), self)
+        self.clear_caches()
         if self.transaction:
             added_elements = [e for e in self.traverse(result) if e.id() > max_id]
             [self.transaction.store_create(e) for e in reversed(added_elements)]
@@ -422,9 +813,63 @@ class file(object):
         :returns: A list of ifcopenshell.entity_instance.entity_instance objects
         :rtype: list
         """
-        if include_subtypes:
-            return [entity_instance(e, self) for e in self.wrapped_data.by_type(type)]
-        return [entity_instance(e, self) for e in self.wrapped_data.by_type_excl_subtypes(type)]
+        if self.by_type_cache is None:
+            if include_subtypes:
+                return [entity_instance(e, self) for e in self.wrapped_data.by_type(type)]
+            return [entity_instance(e, self) for e in self.wrapped_data.by_type_excl_subtypes(type)]
+
+        key = (type.lower(), include_subtypes)
+        results = self.by_type_cache.get(key)
+        if results is None:
+            if include_subtypes:
+                results = [entity_instance(e, self) for e in self.wrapped_data.by_type(type)]
+            else:
+                results = [entity_instance(e, self) for e in self.wrapped_data.by_type_excl_subtypes(type)]
+            self.by_type_cache.set(key, results, LRUCache.ENTITY_SIZE * len(results))
+        # A copy, so that callers modifying the list don't affect the cache
+        return list(results)
+
+    def by_type_iter(self, type, include_subtypes=True):
+        """Lazily yield IFC objects filtered by IFC Type, one at a time.
+
+        Unlike ``by_type``, only the ids of the matching entities are held in
+        memory and each entity_instance is created as it is consumed. This is
+        useful when scanning many instances, or when stopping early.
+
+        Example:
+
+        .. code:: python
+
+            for wall in ifc_file.by_type_iter("IfcWall"):
+                if wall.Name == "Foo":
+                    break
+
+        :param type: The case insensitive type of IFC class to return.
+        :type type: string
+        :param include_subtypes: Whether or not to return subtypes of the IFC class
+        :type include_subtypes: bool
+        :returns: A generator of ifcopenshell.entity_instance.entity_instance objects
+        :rtype: generator
+        """
+        for id in self.by_type_ids(type, include_subtypes).tolist():
+            yield self.by_id(id)
+
+    def by_type_ids(self, type, include_subtypes=True):
+        """Return the ids of IFC objects filtered by IFC Type.
+
+        No entity_instance wrappers are created, so this is the cheapest way to
+        count or partition the instances of a class.
+
+        :param type: The case insensitive type of IFC class to return.
+        :type type: string
+        :param include_subtypes: Whether or not to return subtypes of the IFC class
+        :type include_subtypes: bool
+        :returns: The entity ids, in the same order as ``by_type``
+        :rtype: numpy.ndarray
+        """
+        import numpy as np
+
+        return np.array(self.wrapped_data.by_type_ids(type, include_subtypes), dtype=np.int64)
 
     def traverse(self, inst, max_levels=None, breadth_first=False):
         """Get a list of all referenced instances for a particular instance including itself
@@ -448,6 +893,69 @@ class file(object):
 
         return [entity_instance(e, self) for e in fn(inst.wrapped_data, max_levels)]
 
+    def iter_traverse(self, inst, max_levels=None, breadth_first=False, include=None, exclude=None):
+        """Lazily yield all referenced instances for a particular instance including itself
+
+        Unlike :func:`traverse`, instances are yielded as they are found, so
+        stopping iteration early (e.g. breaking out of a loop) also stops the
+        traversal. Each instance is visited at most once, even when it is
+        shared by multiple referencing instances. Only entity instances are
+        yielded, not inline typed values such as IfcLabel.
+
+        :param inst: The entity instance to start traversing from
+        :type inst: ifcopenshell.entity_instance.entity_instance
+        :param max_levels: How far deep to recursively fetch sub instances. None or -1 means infinite.
+        :type max_levels: None|int
+        :param breadth_first: Whether to use breadth-first search, the default is depth-first.
+        :type breadth_first: bool
+        :param include: If provided, only instances of these classes (including
+            subtypes) are yielded. Other instances are still traversed.
+        :type include: None|list[str]
+        :param exclude: Instances of these classes (including subtypes) are not
+            yielded nor traversed, pruning the subgraph beneath them. The
+            starting instance is never excluded.
+        :type exclude: None|list[str]
+        :returns: A generator of ifcopenshell.entity_instance.entity_instance objects
+        :rtype: Iterator[ifcopenshell.entity_instance.entity_instance]
+        """
+        if max_levels is None:
+            max_levels = -1
+        include = tuple(include or ())
+        exclude = tuple(exclude or ())
+
+        visited = {inst.id()}
+        queue = collections.deque([(inst, 0)])
+        while queue:
+            element, level = queue.popleft() if breadth_first else queue.pop()
+            if not include or any(element.is_a(c) for c in include):
+                yield element
+            if level == max_levels:
+                continue
+            references = self.get_direct_references(element)
+            if not breadth_first:
+                # The stack is popped in reverse, this keeps attribute order
+                references = reversed(references)
+            for reference in references:
+                reference_id = reference.id()
+                if reference_id in visited:
+                    continue
+                visited.add(reference_id)
+                if exclude and any(reference.is_a(c) for c in exclude):
+                    continue
+                queue.append((reference, level + 1))
+
+    def get_direct_references(self, inst):
+        """Returns the entity instances directly referenced by the attributes of an instance
+
+        :param inst: The entity instance to get the references of
+        :type inst: ifcopenshell.entity_instance.entity_instance
+        :returns: A list of unique ifcopenshell.entity_instance.entity_instance objects
+        :rtype: list
+        """
+        # The first instance is inst itself, then its references one level deep
+        references = self.wrapped_data.traverse(inst.wrapped_data, 1)
+        return [entity_instance(e, self) for e in references[1:] if e.id()]
+
     def get_inverse(self, inst, allow_duplicate=False, with_attribute_indices=False):
         """Return a list of entities that reference this entity
 
@@ -483,6 +991,131 @@ class file(object):
         """
         return self.wrapped_data.get_total_inverses(inst.wrapped_data)
 
+    def get_inverse_many(self, elements, allow_duplicate=False):
+        """Return the entities that reference each of many entities
+
+        This is the bulk equivalent of calling :func:`get_inverse` on every
+        element, so that graph algorithms can fetch all reverse edges of a
+        frontier of elements in a single call.
+
+        Example:
+
+        .. code:: python
+
+            subgraph = set(ifc_file.traverse(element))
+            inverses = ifc_file.get_inverse_many(subgraph)
+            shared = [e for e, references in inverses.items() if references - subgraph]
+
+        :param elements: The entity instances or their ids
+        :type elements: list[ifcopenshell.entity_instance.entity_instance|int]
+        :param allow_duplicate: Values are a `list` when True, `set` when False
+        :returns: A mapping of each of the elements, as provided, to its inverses
+        :rtype: dict
+        """
+        elements = list(elements)
+        ids = [e.id() if isinstance(e, entity_instance) else int(e) for e in elements]
+        container = list if allow_duplicate else set
+        return {
+            element: container(entity_instance(e, self) for e in inverses)
+            for element, inverses in zip(elements, self.wrapped_data.get_inverse_many(ids))
+        }
+
+    def get_total_inverses_many(self, elements):
+        """Returns the number of entities that reference each of many entities
+
+        :param elements: The entity instances or their ids
+        :type elements: list[ifcopenshell.entity_instance.entity_instance|int]
+        :returns: The total number of references of each element
+        :rtype: numpy.ndarray
+        """
+        import numpy as np
+
+        ids = [e.id() if isinstance(e, entity_instance) else int(e) for e in elements]
+        return np.array(self.wrapped_data.get_total_inverses_many(ids), dtype=np.int64)
+
+    def get_info_many(self, elements, attributes=None, scalar_only=True, return_type=dict):
+        """Return the attributes of many entity instances as columns
+
+        This is the bulk equivalent of calling ``get_info`` on every element,
+        without creating an entity_instance or dictionary per element. Each
+        column has a value for every element, which is None if the element
+        does not have that attribute.
+
+        Example:
+
+        .. code:: python
+
+            info = ifc_file.get_info_many(ifc_file.by_type_ids("IfcWall"), attributes=["GlobalId", "Name"])
+            print(info["id"][0], info["GlobalId"][0], info["Name"][0])
+            df = ifc_file.get_info_many(ifc_file.by_type("IfcProduct"), return_type="pandas")
+
+        :param elements: The entity instances or their ids
+        :type elements: list[ifcopenshell.entity_instance.entity_instance|int]
+        :param attributes: The names of the attributes to include. Defaults to
+            all attributes of the classes of the elements.
+        :type attributes: list[string]
+        :param scalar_only: Whether to replace values that are or contain IFC
+            instances with None. Otherwise they are returned as instances.
+        :type scalar_only: bool
+        :param return_type: dict for a dictionary of lists, "numpy" for a
+            dictionary of numpy arrays or "pandas" for a pandas DataFrame.
+        :type return_type: dict|string
+        :returns: The columns, always including "id" and "type"
+        :rtype: dict|pandas.DataFrame
+        """
+        rows = []
+        for element in elements:
+            if isinstance(element, entity_instance):
+                element = element.wrapped_data
+            else:
+                element = self.wrapped_data.by_id(int(element))
+            rows.append((element, element.is_a(True)))
+
+        columns = {"id": [], "type": []}
+        plans = {}
+        for fq_name in dict.fromkeys(fq_name for _, fq_name in rows):
+            accessors = get_attribute_accessors(fq_name)
+            names = attributes if attributes is not None else accessors.keys()
+            plans[fq_name] = [
+                (name, accessors[name][1]) for name in names if accessors.get(name, (None,))[0] == FORWARD
+            ]
+            for name, _ in plans[fq_name]:
+                columns.setdefault(name, [])
+        if attributes is not None:
+            for name in attributes:
+                columns.setdefault(name, [])
+
+        ids, types = columns["id"], columns["type"]
+        for fq_name, plan in plans.items():
+            present = {name for name, _ in plan}
+            plans[fq_name] = (
+                [(columns[name], idx) for name, idx in plan],
+                [v for k, v in columns.items() if k not in present and k not in ("id", "type")],
+            )
+
+        for element, fq_name in rows:
+            ids.append(element.id())
+            types.append(element.is_a())
+            present, absent = plans[fq_name]
+            for column, idx in present:
+                value = element.get_argument(idx)
+                if isinstance(value, (tuple, ifcopenshell_wrapper.entity_instance)):
+                    if not scalar_only:
+                        value = entity_instance.wrap_value(value, self)
+                    elif contains_instance(value):
+                        value = None
+                column.append(value)
+            for column in absent:
+                column.append(None)
+
+        if return_type == "numpy":
+            return {k: to_array(v) for k, v in columns.items()}
+        elif return_type == "pandas":
+            import pandas
+
+            return pandas.DataFrame(columns)
+        return return_type(columns)
+
     def remove(self, inst):
         """Deletes an IFC object in the file.
 
@@ -496,6 +1129,7 @@ class file(object):
         """
         if self.transaction:
             self.transaction.store_delete(inst)
+        self.clear_caches()
         return self.wrapped_data.remove(inst.wrapped_data)
 
     def batch(self):
@@ -508,6 +1142,7 @@ class file(object):
         """Low-level mechanism to speed up deletion of large subgraphs"""
         if self.transaction:
             self.transaction.unbatch()
+        self.clear_caches()
         return self.wrapped_data.unbatch()
 
     def __iter__(self):
@@ -544,23 +1179,103 @@ class file(object):
             return
         if format == ".ifcZIP":
             return self.write(path, ".ifc", zipped=True)
-        self.wrapped_data.write(str(path))
         if zipped:
-            unzipped_path = path.with_suffix(format)
-            path.rename(unzipped_path)
-            with zipfile.ZipFile(path, "w") as zip_file:
-                zip_file.write(
-                    unzipped_path,
-                    unzipped_path.name,
-                    compress_type=zipfile.ZIP_DEFLATED,
-                )
-                unzipped_path.unlink()
-        return
+            # The model is serialised in chunks directly into the archive, so
+            # neither an unzipped copy on disk nor the whole data in memory is needed.
+            with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+                with zip_file.open(path.with_suffix(format).name, "w", force_zip64=True) as f:
+                    self.wrapped_data.write_to(f.write, ifcopenshell.util.file.ZIP_CHUNK_SIZE)
+            return
+        self.wrapped_data.write(str(path))
+
+    def to_bytes(self):
+        """Serialise the model to IFC-SPF without going through a Python string
+
+        :returns: The IFC-SPF data
+        :rtype: bytes
+        """
+        return self.wrapped_data.to_bytes()
+
+    def share(self):
+        """Allow worker processes to use this model without it being pickled as text
+
+        Normally, pickling a model serialises it to IFC-SPF bytes which are
+        sent to, and parsed by, the receiving process for every task. Once
+        shared, the model is written once to a shared memory block and is
+        pickled as a small token naming that block instead.
+
+        Worker processes forked after this call already hold the parsed model
+        in memory (copy-on-write), so the token unpickles to that copy without
+        any parsing. Worker processes started using "spawn" or "forkserver",
+        the defaults on Windows and macOS, attach to the shared memory block
+        and parse it directly, without the data being copied through a pipe.
+        They do this only once and keep the parsed model for their lifetime,
+        so later tasks using the same model are not parsed again.
+
+        Changes made after sharing are only seen by forked workers. Call share
+        again to update the data seen by other workers. Changes made by a
+        worker are not visible to other processes.
+
+        The model is registered using a weak reference, so it may still be
+        garbage collected while shared, which also releases the shared memory.
+
+        Example:
+
+        .. code:: python
+
+            model = ifcopenshell.open("/path/to/model.ifc")
+            model.share()
+            with multiprocessing.Pool() as pool:
+                results = pool.starmap(process_storey, [(model, s.id()) for s in model.by_type("IfcBuildingStorey")])
+            model.unshare()
+        """
+        from multiprocessing import shared_memory
+
+        self.unshare()
+        data = self.to_bytes()
+        memory = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        memory.buf[: len(data)] = data
+        self.shared_token = (memory.name, len(data))
+        self.shared_memory_finalizer = weakref.finalize(self, release_shared_memory, memory)
+        shared_files[memory.name] = self
+
+    def unshare(self):
+        """Stop sharing a model shared using :func:`share` and release its shared memory"""
+        token = self.__dict__.pop("shared_token", None)
+        if token is not None:
+            shared_files.pop(token[0], None)
+            self.__dict__.pop("shared_memory_finalizer")()
+
+    def __reduce__(self):
+        token = self.__dict__.get("shared_token")
+        if token is not None:
+            return get_shared_file, token
+        return file.from_bytes, (self.to_bytes(),)
 
     @staticmethod
     def from_string(s):
         return file(ifcopenshell_wrapper.read(s))
 
+    @staticmethod
+    def from_bytes(data):
+        """Load an IFC-SPF model from an in-memory buffer
+
+        The buffer is copied once directly into the parser, so no intermediate
+        Python string is created or decoded.
+
+        Example:
+
+        .. code:: python
+
+            model = ifcopenshell.file.from_bytes(response.content)
+
+        :param data: The IFC-SPF data
+        :type data: bytes|bytearray|memoryview|mmap.mmap
+        :returns: The parsed model
+        :rtype: ifcopenshell.file.file
+        """
+        return file(ifcopenshell_wrapper.read_buffer(data))
+
     @staticmethod
     def from_pointer(v):
         return file_dict.get(v)
@@ -22,6 +22,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
 import uuid
 import string
 
@@ -56,3 +57,174 @@ def split(g):
 
 def new():
     return compress(uuid.uuid4().hex)
+
+
+_lookup_tables = None
+
+
+def get_lookup_tables():
+    """Returns the (cached) NumPy tables used by the vectorised functions
+
+    The first table maps a 6-bit value to its ASCII character code, the second
+    maps an ASCII character code to its 6-bit value, or -1 if the character is
+    not part of the encoding.
+    """
+    global _lookup_tables
+    if _lookup_tables is None:
+        import numpy as np
+
+        encode = np.frombuffer(chars.encode("ascii"), dtype=np.uint8)
+        decode = np.full(256, -1, dtype=np.int16)
+        decode[encode] = np.arange(64, dtype=np.int16)
+        _lookup_tables = encode, decode
+    return _lookup_tables
+
+
+def to_uint8_array(values, width):
+    """Converts a sequence of fixed width ASCII strings to an (n, width) uint8 array
+
+    Accepts a sequence of str, a NumPy array of dtype ``S`` or ``U``, or a
+    contiguous bytes-like object containing the concatenated strings.
+    """
+    import numpy as np
+
+    if isinstance(values, (bytes, bytearray, memoryview)):
+        # Individual strings can't be told apart, so only the total is checked
+        if len(values) % width:
+            raise ValueError(f"Expected strings of length {width}")
+        return np.frombuffer(values, dtype=np.uint8).reshape(-1, width)
+
+    # Every string is checked, as shorter and longer strings could otherwise
+    # be padded, truncated or concatenated into the expected total length
+    if isinstance(values, np.ndarray) and values.dtype.kind in ("S", "U"):
+        lengths = np.char.str_len(values).ravel()
+    else:
+        values = values if isinstance(values, (list, tuple)) else list(values)
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    if (lengths != width).any():
+        raise ValueError(f"Expected strings of length {width}")
+
+    if isinstance(values, np.ndarray):
+        return np.frombuffer(values.astype(f"S{width}").tobytes(), dtype=np.uint8).reshape(-1, width)
+    return np.frombuffer("".join(values).encode("ascii"), dtype=np.uint8).reshape(-1, width)
+
+
+def compress_many(guids, as_array=False):
+    """Compresses many UUIDs to IFC GlobalIds at once
+
+    This is equivalent to calling :func:`compress` on each UUID, but uses NumPy
+    lookup tables instead of per character Python operations, which is
+    considerably faster for large numbers of UUIDs.
+
+    :param guids: Either a sequence or NumPy array of 32 character hexadecimal
+        UUID strings (such as ``uuid.UUID.hex``), a bytes-like object of 16
+        bytes per UUID, or a uint8 NumPy array of shape (n, 16).
+    :param as_array: If true, returns a NumPy array of dtype ``S22`` instead of
+        a list of strings.
+    :return: The compressed GlobalIds.
+    :raises ValueError: If any of the UUIDs is not valid.
+    """
+    import numpy as np
+
+    if isinstance(guids, np.ndarray) and guids.dtype == np.uint8:
+        data = guids.reshape(-1, 16)
+    elif isinstance(guids, (bytes, bytearray, memoryview)):
+        if len(guids) % 16:
+            raise ValueError("Expected 16 bytes per UUID")
+        data = np.frombuffer(guids, dtype=np.uint8).reshape(-1, 16)
+    else:
+        hex_data = to_uint8_array(guids, 32).tobytes().decode("ascii")
+        data = np.frombuffer(bytes.fromhex(hex_data), dtype=np.uint8).reshape(-1, 16)
+
+    encode, _ = get_lookup_tables()
+    values = np.empty((len(data), 22), dtype=np.uint8)
+    values[:, 0] = data[:, 0] >> 6
+    values[:, 1] = data[:, 0] & 63
+    groups = data[:, 1:].reshape(-1, 5, 3).astype(np.uint32)
+    groups = (groups[:, :, 0] << 16) | (groups[:, :, 1] << 8) | groups[:, :, 2]
+    shifts = np.array([18, 12, 6, 0], dtype=np.uint32)
+    values[:, 2:] = ((groups[:, :, None] >> shifts) & 63).reshape(-1, 20)
+
+    result = encode[values].view("S22").ravel()
+    if as_array:
+        return result
+    return result.astype("U22").tolist()
+
+
+def expand_many(global_ids, as_array=False):
+    """Expands many IFC GlobalIds to UUIDs at once
+
+    This is the vectorised equivalent of :func:`expand`.
+
+    :param global_ids: A sequence of 22 character GlobalId strings, a NumPy
+        array of dtype ``S22`` or ``U22``, or a bytes-like object of the
+        concatenated GlobalIds.
+    :param as_array: If true, returns a uint8 NumPy array of shape (n, 16) with
+        the raw UUID bytes instead of a list of hexadecimal strings.
+    :return: The expanded UUIDs.
+    :raises ValueError: If any of the GlobalIds is not valid.
+    """
+    import numpy as np
+
+    _, decode = get_lookup_tables()
+    values = decode[to_uint8_array(global_ids, 22)]
+    if (values < 0).any() or (values[:, 0] > 3).any():
+        raise ValueError("Invalid GlobalId")
+    values = values.astype(np.uint32)
+
+    data = np.empty((len(values), 16), dtype=np.uint8)
+    data[:, 0] = (values[:, 0] << 6) | values[:, 1]
+    groups = values[:, 2:].reshape(-1, 5, 4)
+    groups = (groups[:, :, 0] << 18) | (groups[:, :, 1] << 12) | (groups[:, :, 2] << 6) | groups[:, :, 3]
+    shifts = np.array([16, 8, 0], dtype=np.uint32)
+    data[:, 1:] = ((groups[:, :, None] >> shifts) & 255).reshape(-1, 15)
+
+    if as_array:
+        return data
+    hex_data = data.tobytes().hex()
+    return [hex_data[i : i + 32] for i in range(0, len(hex_data), 32)]
+
+
+def new_many(n, as_array=False):
+    """Generates many new random GlobalIds at once
+
+    Like :func:`new`, the GlobalIds are compressed version 4 UUIDs.
+
+    :param n: The number of GlobalIds to generate.
+    :param as_array: If true, returns a NumPy array of dtype ``S22`` instead of
+        a list of strings.
+    :return: The new GlobalIds.
+    """
+    import numpy as np
+
+    data = np.frombuffer(bytearray(os.urandom(16 * n)), dtype=np.uint8).reshape(-1, 16)
+    # Set the version and variant bits as uuid.uuid4() does
+    data[:, 6] = (data[:, 6] & 0x0F) | 0x40
+    data[:, 8] = (data[:, 8] & 0x3F) | 0x80
+    return compress_many(data, as_array=as_array)
+
+
+def is_valid_many(global_ids):
+    """Checks whether many strings are valid IFC GlobalIds at once
+
+    A valid GlobalId is 22 characters long, only uses characters of the base 64
+    encoding and starts with a character between 0 and 3, as the first
+    character only encodes the two most significant bits.
+
+    :param global_ids: A sequence of strings.
+    :return: A boolean NumPy array with one value per string.
+    """
+    import numpy as np
+
+    global_ids = list(global_ids)
+    lengths = np.fromiter(map(len, global_ids), dtype=np.int64, count=len(global_ids))
+    result = lengths == 22
+    if not result.any():
+        return result
+    candidates = [global_ids[i] for i in np.flatnonzero(result)]
+    # Non ASCII characters are replaced by "?", which is not a valid character
+    data = "".join(candidates).encode("ascii", "replace")
+    _, decode = get_lookup_tables()
+    values = decode[np.frombuffer(data, dtype=np.uint8).reshape(-1, 22)]
+    result[result] = (values >= 0).all(axis=1) & (values[:, 0] <= 3)
+    return result
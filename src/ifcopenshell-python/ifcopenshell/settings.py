@@ -33,4 +33,17 @@ element or None. Example:
 #2=IfcRelAssignsToGroup($,$,$,$,$,$,#1)
 """
 
-unpack_non_aggregate_inverses = False
\ No newline at end of file
+unpack_non_aggregate_inverses = False
+
+"""
+When true the computed values of derived attributes are memoised per
+instance. As derived values may depend on other instances, the memoised
+values of a file are discarded whenever any of its instances is edited,
+created, added or removed, including by undo and redo. Example:
+
+>>> ifcopenshell.settings.cache_derived_attributes = True
+>>> f.by_type("IfcCartesianPoint")[0].Dim
+3
+"""
+
+cache_derived_attributes = False
@@ -1,28 +1,193 @@
 try:
     import re
     import json
+    import time
+    import types
+    import threading
+    from pathlib import Path
 
     import ifcopenshell.util.schema
-    from .file import file
+    import ifcopenshell.util.element
+    import ifcopenshell.util.attribute
+    from .file import file, LRUCache
     from . import ifcopenshell_wrapper
     from .entity_instance import entity_instance
 except ImportError as e:
     print(f"No SQL support: {e}")
 
 
+# The memory mapped per read only connection. Pages are shared between all
+# connections by the operating system, so this doesn't multiply memory use.
+READ_ONLY_MMAP_SIZE = 1 << 30
+
+GEOMETRY_QUERY = (
+    "SELECT ifc_id, x, y, z, matrix, geometry, verts, edges, faces, material_ids, materials "
+    "FROM shape LEFT JOIN geometry ON shape.geometry = geometry.id"
+)
+
+# The number of writes committed per transaction when writes are batched
+WRITE_BATCH_SIZE = 10000
+
+# Classes of which instances determine the rows of the denormalised psets
+# table. Not all exist in every schema.
+PSET_CLASSES = (
+    "IfcProperty",
+    "IfcPhysicalQuantity",
+    "IfcPropertySetDefinition",
+    "IfcExtendedProperties",
+    "IfcExtendedMaterialProperties",
+    "IfcRelDefinesByProperties",
+    "IfcRelDefinesByType",
+)
+
+SPF_HEADER = """ISO-10303-21;
+HEADER;
+FILE_DESCRIPTION(({description}),'2;1');
+FILE_NAME({name},'{timestring}',(''),(''),'IfcOpenShell-{version}','IfcOpenShell-{version}','');
+FILE_SCHEMA(('{schema}'));
+ENDSEC;
+DATA;
+"""
+
+
+def serialise_value(value):
+    """Converts an attribute value to the column value stored by Ifc2Sql
+
+    Entity instances are stored as their id, typed values such as
+    IfcLabel('x') as a type and value dictionary, and aggregates as JSON.
+    """
+    if isinstance(value, entity_instance):
+        if value.id():
+            return value.id()
+        return json.dumps({"type": value.is_a(), "value": value.wrappedValue})
+    elif isinstance(value, (tuple, list)):
+        return json.dumps(serialise_aggregate(value))
+    return value
+
+
+def serialise_aggregate(value):
+    if isinstance(value, (tuple, list)):
+        return [serialise_aggregate(v) for v in value]
+    elif isinstance(value, entity_instance):
+        return value.id() if value.id() else {"type": value.is_a(), "value": value.wrappedValue}
+    return value
+
+
+def get_primitive_type(attribute_or_data_type):
+    """Like :func:`ifcopenshell.util.attribute.get_primitive_type`, but distinguishes logicals
+
+    Booleans and logicals are both stored as integers, but only logicals
+    may also be UNKNOWN.
+    """
+    primitive = ifcopenshell.util.attribute.get_primitive_type(attribute_or_data_type)
+    if primitive == "boolean":
+        if hasattr(attribute_or_data_type, "type_of_attribute"):
+            attribute_or_data_type = attribute_or_data_type.type_of_attribute()
+        if "<logical>" in str(attribute_or_data_type):
+            return "logical"
+    return primitive
+
+
+def is_reference(primitive):
+    # Integers in selects are always references, as typed values are stored as dictionaries
+    return primitive == "entity" or (isinstance(primitive, tuple) and primitive[0] == "select")
+
+
+def get_reference_ids(value, primitive):
+    """Returns the ids referenced by a column value, parsed from JSON if necessary"""
+    if isinstance(value, list):
+        item_primitive = primitive if is_reference(primitive) else primitive[1]
+        return [i for item in value for i in get_reference_ids(item, item_primitive)]
+    elif isinstance(value, int) and not isinstance(value, bool) and is_reference(primitive):
+        return [value]
+    return []
+
+
+def remove_reference(value, primitive, ifc_id):
+    """Removes references to ifc_id from a column value, parsed from JSON if necessary
+
+    Like :func:`ifcopenshell.file.file.remove`, references are set to null or
+    removed from aggregates.
+    """
+    if isinstance(value, list):
+        item_primitive = primitive if is_reference(primitive) else primitive[1]
+        results = [remove_reference(item, item_primitive, ifc_id) for item in value]
+        return [item for item in results if item is not None]
+    elif get_reference_ids(value, primitive) == [ifc_id]:
+        return None
+    return value
+
+
+def encode_string(value):
+    """Quotes a string as an SPF string, escaping non-ASCII characters using \\X2\\"""
+    value = value.replace("\\", "\\\\").replace("'", "''")
+    value = re.sub(
+        r"[^\x20-\x7e]+",
+        lambda m: "\\X2\\" + m.group(0).encode("utf-16-be").hex().upper() + "\\X0\\",
+        value,
+    )
+    return f"'{value}'"
+
+
+def encode_binary(value):
+    """Quotes a binary, stored as a string of bits such as "0110", as an SPF binary
+
+    The first hex digit is the number of unused leading bits, as the bits
+    are padded to a whole number of hex digits.
+    """
+    unused = -len(value) % 4
+    digits = format(int(value, 2), f"0{(len(value) + unused) // 4}X") if value else ""
+    return f'"{unused}{digits}"'
+
+
+def format_real(value):
+    # SPF reals always have a decimal point, such as 1. or 1.E-05
+    mantissa, _, exponent = repr(float(value)).upper().partition("E")
+    if "." not in mantissa:
+        mantissa += "."
+    return f"{mantissa}E{exponent}" if exponent else mantissa
+
+
 class sqlite(file):
-    def __init__(self, filepath):
-        import sqlite3
+    def __init__(self, filepath, read_only=False, wal=False):
+        """Opens an IFC SQLite database, as created by the Ifc2Sql recipe
 
+        :param filepath: The path to the database
+        :param read_only: If true, the database is opened read only and can
+            be queried concurrently from multiple threads, such as from a
+            thread pool or the handlers of a web service. Each thread lazily
+            opens its own connection with mode=ro, so queries are not
+            serialised on a single cursor. Parsed entity instances are cached
+            and shared between threads.
+        :type read_only: bool
+        :param wal: If true and not read only, the database is switched to
+            write-ahead logging, so that readers, such as read only instances
+            in other threads or processes, do not block while this instance
+            writes and vice versa. The journal mode is stored in the database,
+            so later connections also use it.
+        :type wal: bool
+        """
         self.wrapped_data = None
         self.history_size = 64
+        self.history_max_bytes = None
+        self.history_spill_bytes = None
+        self.by_type_cache = None
         self.history = []
         self.future = []
         self.transaction = None
 
         self.filepath = filepath
-        self.db = sqlite3.connect(self.filepath)
-        self.db.row_factory = sqlite3.Row
+        self.read_only = read_only
+        self.wal = wal
+        self.is_batched = False
+        self.pending_writes = 0
+        # Instances of which the rows in the psets table are rewritten on commit
+        self.pending_pset_ids = set()
+        self.write_batch_size = WRITE_BATCH_SIZE
+        self.lock = threading.RLock()
+        self.connections = []
+        # Connections are per thread when read only, otherwise all threads share one
+        self.local = threading.local() if read_only else types.SimpleNamespace()
 
         # import mysql.connector
         # self.db = mysql.connector.connect(
@@ -32,8 +197,6 @@ class sqlite(file):
         #    database="test"
         # )
 
-        self.cursor = self.db.cursor()
-
         try:
             self.cursor.execute("SELECT preprocessor, schema, mvd FROM metadata LIMIT 1")
             row = self.cursor.fetchone()
@@ -43,24 +206,95 @@ class sqlite(file):
             assert False, "SQLite schema not supported."
 
         self.schema = row[1]
+
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        self.tables = {row[0] for row in self.cursor.fetchall()}
+        # Databases created by older versions of Ifc2Sql only have inverses columns
+        self.has_inverses_table = "inverses" in self.tables
         self.ifc_schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(self.schema)
 
         self.cursor.execute("SELECT ifc_id, ifc_class FROM id_map")
         self.id_map = {}
+        # Ids by class, stored as the keys of dicts so that they keep their
+        # order but can be removed in constant time
         self.class_map = {}
-        self.entity_cache = {}
+        self.entity_cache = LRUCache()
         for row in self.cursor.fetchall():
             self.id_map[row[0]] = row[1]
-            self.class_map.setdefault(row[1], []).append(row[0])
+            self.class_map.setdefault(row[1], {})[row[0]] = None
+        self.max_id = max(self.id_map, default=0)
+
+        # Class tables only have an inverses column if Ifc2Sql was run with should_get_inverses
+        self.has_inverses_column = False
+        for ifc_class in self.class_map:
+            self.cursor.execute(f"SELECT * FROM {ifc_class} LIMIT 0")
+            self.has_inverses_column = "inverses" in [d[0] for d in self.cursor.description]
+            break
 
         self.preprocess_schema()
 
+    def share(self):
+        """Databases are pickled by path and reconnected to, so sharing is not needed"""
+
+    def unshare(self):
+        pass
+
+    def __reduce__(self):
+        return sqlite, (self.filepath, self.read_only, self.wal)
+
+    @property
+    def db(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = self.connect()
+        return db
+
+    @property
+    def cursor(self):
+        cursor = getattr(self.local, "cursor", None)
+        if cursor is None:
+            cursor = self.db.cursor()
+            self.local.cursor = cursor
+        return cursor
+
+    def connect(self):
+        import sqlite3
+
+        if self.read_only:
+            uri = Path(self.filepath).resolve().as_uri() + "?mode=ro"
+            # Connections may be closed by any thread, but are only used by one
+            db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            db.execute("PRAGMA query_only = ON")
+            db.execute("PRAGMA temp_store = MEMORY")
+            db.execute(f"PRAGMA mmap_size = {READ_ONLY_MMAP_SIZE}")
+        else:
+            db = sqlite3.connect(self.filepath)
+            if self.wal:
+                db.execute("PRAGMA journal_mode = WAL")
+        db.row_factory = sqlite3.Row
+        self.local.db = db
+        with self.lock:
+            self.connections.append(db)
+        return db
+
+    def close(self):
+        """Commits any pending writes and closes the database connections of all threads"""
+        if self.pending_writes:
+            self.commit()
+        with self.lock:
+            for db in self.connections:
+                db.close()
+            self.connections = []
+            self.local = threading.local() if self.read_only else types.SimpleNamespace()
+
     def preprocess_schema(self):
         self.ifc_class_subtypes = {}
         self.ifc_class_attributes = {}
         self.ifc_class_inverse_attributes = {}
         self.ifc_class_references = {}
         self.ifc_class_inverses = {}
+        self.ifc_class_primitives = {}
+        self.ifc_type_primitives = {}
 
         for declaration in self.ifc_schema.entities():
             # print('Dealing with declaration', declaration.name())
@@ -73,8 +307,10 @@ class sqlite(file):
 
             entity = []
             entity_list = []
+            primitives = self.ifc_class_primitives[declaration.name()] = {}
             for attribute in declaration.all_attributes():
-                primitive = ifcopenshell.util.attribute.get_primitive_type(attribute)
+                primitive = get_primitive_type(attribute)
+                primitives[attribute.name()] = primitive
                 if primitive == "entity":
                     entity.append(attribute.name())
 
@@ -99,29 +335,378 @@ class sqlite(file):
             self.ifc_class_references[declaration.name()] = {"entity": entity, "entity_list": entity_list}
 
     def clear_cache(self):
-        self.entity_cache = {}
+        with self.lock:
+            self.entity_cache.clear()
+
+    def set_cache_size(self, max_items=None, max_bytes=None):
+        """Bounds the number and approximate memory of cached entity instances
+
+        Least recently used instances and their parsed attributes are evicted
+        once either limit is exceeded. Both default to None, meaning unbounded.
+        Use entity_cache.get_stats() to see hit rates when tuning the limits.
+
+        :param max_items: The maximum number of cached entity instances
+        :type max_items: int
+        :param max_bytes: The approximate maximum memory used in bytes
+        :type max_bytes: int
+        """
+        with self.lock:
+            self.entity_cache.max_items = max_items
+            self.entity_cache.max_bytes = max_bytes
+            self.entity_cache.evict()
+
+    def create_entity(self, type, *args, **kwargs):
+        """Creates a new entity instance in the database
+
+        Writes are committed immediately, unless they are batched. See
+        :func:`batch`. Typed values such as IfcLabel are not stored in their
+        own table, so are returned as instances that do not belong to a file.
+
+        :param type: Case insensitive name of the IFC class
+        :type type: string
+        :param args: The positional arguments of the IFC class
+        :param kwargs: The keyword arguments of the IFC class. An id may be
+            given, otherwise the next available id is used.
+        :returns: An entity instance
+        :rtype: ifcopenshell.sql.sqlite_entity
+        """
+        declaration = self.ifc_schema.declaration_by_name(type)
+        if declaration.as_entity() is None:
+            return ifcopenshell.create_entity(declaration.name(), self.schema, *args, **kwargs)
+
+        ifc_class = declaration.name()
+        ifc_id = kwargs.pop("id", None)
+        if ifc_id is None:
+            ifc_id = self.max_id + 1
+        elif ifc_id in self.id_map:
+            raise ValueError(f"An instance with id #{ifc_id} already exists")
+
+        attributes = self.ifc_class_attributes[ifc_class]
+        values = dict(zip(attributes, args))
+        for name, value in kwargs.items():
+            if name not in attributes:
+                raise AttributeError("entity instance of type '%s' has no attribute '%s'" % (ifc_class, name))
+            values[name] = value
+        row = {name: serialise_value(value) for name, value in values.items()}
 
-    def create_entity(self, type, *args, **kawrgs):
-        assert False
+        columns = ",".join(["ifc_id"] + [f"`{name}`" for name in row])
+        placeholders = ",".join(["?"] * (len(row) + 1))
+        self.cursor.execute(f"INSERT INTO {ifc_class} ({columns}) VALUES ({placeholders})", (ifc_id, *row.values()))
+        self.cursor.execute("INSERT INTO id_map VALUES (?, ?)", (ifc_id, ifc_class))
+        self.update_references(ifc_id, {}, self.get_references(ifc_class, row))
+
+        self.id_map[ifc_id] = ifc_class
+        self.class_map.setdefault(ifc_class, {})[ifc_id] = None
+        self.max_id = max(self.max_id, ifc_id)
+        self.clear_by_type_cache()
+        element = self.by_id(ifc_id)
+        if self.affects_psets(element):
+            self.pending_pset_ids |= self.get_pset_element_ids(element)
+        self.record_write()
+        return element
+
+    def set_attribute(self, inst, name, value):
+        """Sets the value of an attribute of an entity instance in the database
+
+        This is called when setting attributes of an instance, such as
+        ``wall.Name = "Foo"``. Writes are committed immediately, unless they
+        are batched. See :func:`batch`. Editing properties, property sets or
+        their relationships also rewrites the rows of the affected instances
+        in the psets table when the write is committed.
+
+        :param inst: The entity instance to edit
+        :type inst: ifcopenshell.sql.sqlite_entity
+        :param name: The name of the attribute
+        :type name: string
+        :param value: The new value of the attribute
+        """
+        ifc_class = inst.sqlite_wrapper.ifc_class
+        ifc_id = inst.sqlite_wrapper.id
+        if name not in self.ifc_class_attributes[ifc_class]:
+            raise AttributeError("entity instance of type '%s' has no attribute '%s'" % (ifc_class, name))
+        value = serialise_value(value)
+        affects_psets = self.affects_psets(inst, name)
+        if affects_psets:
+            # Instances may stop as well as start depending on the edited instance
+            self.pending_pset_ids |= self.get_pset_element_ids(inst)
+
+        primitive = self.ifc_class_primitives[ifc_class][name]
+        if primitive == "entity" or isinstance(primitive, tuple):
+            # Inverses only need updating if references may have changed
+            self.cursor.execute(f"SELECT * FROM {ifc_class} WHERE `ifc_id` = ? LIMIT 1", (ifc_id,))
+            old_row = dict(self.cursor.fetchone())
+            new_row = {**old_row, name: value}
+            old_references = self.get_references(ifc_class, old_row)
+            new_references = self.get_references(ifc_class, new_row)
+            if old_references != new_references:
+                self.update_references(ifc_id, old_references, new_references)
+
+        self.cursor.execute(f"UPDATE {ifc_class} SET `{name}` = ? WHERE `ifc_id` = ?", (value, ifc_id))
+        inst.sqlite_wrapper.attribute_cache = {}
+        if affects_psets:
+            self.pending_pset_ids |= self.get_pset_element_ids(inst)
+        self.record_write()
+
+    def remove(self, inst):
+        """Deletes an entity instance from the database
+
+        Like :func:`ifcopenshell.file.file.remove`, attributes of other
+        instances referencing the deleted instance are set to null, or the
+        reference is removed from the aggregate. Rows of the deleted instance
+        in the psets and shape tables are also deleted, and rows of instances
+        whose property sets depended on it are rewritten when committed.
+
+        :param inst: The entity instance to delete
+        :type inst: ifcopenshell.sql.sqlite_entity
+        """
+        ifc_class = inst.sqlite_wrapper.ifc_class
+        ifc_id = inst.sqlite_wrapper.id
+        if self.affects_psets(inst):
+            self.pending_pset_ids |= self.get_pset_element_ids(inst)
+
+        for element in self.get_inverse(inst):
+            element_class = element.sqlite_wrapper.ifc_class
+            self.cursor.execute(f"SELECT * FROM {element_class} WHERE `ifc_id` = ? LIMIT 1", (element.id(),))
+            row = self.cursor.fetchone()
+            for name, primitive in self.ifc_class_primitives[element_class].items():
+                value = row[name]
+                if isinstance(value, str) and isinstance(primitive, tuple):
+                    value = json.loads(value)
+                if ifc_id in get_reference_ids(value, primitive):
+                    self.set_attribute(element, name, remove_reference(value, primitive, ifc_id))
+
+        self.cursor.execute(f"SELECT * FROM {ifc_class} WHERE `ifc_id` = ? LIMIT 1", (ifc_id,))
+        self.update_references(ifc_id, self.get_references(ifc_class, dict(self.cursor.fetchone())), {})
+        self.cursor.execute(f"DELETE FROM {ifc_class} WHERE `ifc_id` = ?", (ifc_id,))
+        self.cursor.execute("DELETE FROM id_map WHERE `ifc_id` = ?", (ifc_id,))
+        for table in ("psets", "shape"):
+            if table in self.tables:
+                self.cursor.execute(f"DELETE FROM {table} WHERE `ifc_id` = ?", (ifc_id,))
+
+        del self.id_map[ifc_id]
+        del self.class_map[ifc_class][ifc_id]
+        with self.lock:
+            self.entity_cache.pop(ifc_id)
+        self.clear_by_type_cache()
+        self.record_write()
+
+    def get_references(self, ifc_class, row):
+        """Returns the ids referenced by a row of a class table, by attribute index
+
+        :param ifc_class: The IFC class of the row
+        :type ifc_class: string
+        :param row: The column values by attribute name. Missing attributes
+            are treated as null.
+        :type row: dict
+        :rtype: dict[int, list[int]]
+        """
+        references = {}
+        for i, (name, primitive) in enumerate(self.ifc_class_primitives[ifc_class].items()):
+            value = row.get(name, None)
+            if value is None or not (primitive == "entity" or isinstance(primitive, tuple)):
+                continue
+            if isinstance(value, str):
+                value = json.loads(value)
+            ids = get_reference_ids(value, primitive)
+            if ids:
+                references[i] = ids
+        return references
+
+    def update_references(self, ifc_id, old_references, new_references):
+        """Updates the inverses of instances which ifc_id stopped or started referencing
+
+        :param ifc_id: The id of the referencing instance
+        :type ifc_id: int
+        :param old_references: See :func:`get_references`
+        :type old_references: dict[int, list[int]]
+        :param new_references: See :func:`get_references`
+        :type new_references: dict[int, list[int]]
+        """
+        if self.has_inverses_table:
+            for index in old_references.keys() | new_references.keys():
+                if old_references.get(index) == new_references.get(index):
+                    continue
+                query = "DELETE FROM inverses WHERE referenced_by = ? AND attribute_index = ?"
+                self.cursor.execute(query, (ifc_id, index))
+                rows = [(i, ifc_id, index) for i in new_references.get(index, ())]
+                self.cursor.executemany("INSERT INTO inverses VALUES (?, ?, ?)", rows)
+
+        old_ids = {i for ids in old_references.values() for i in ids}
+        new_ids = {i for ids in new_references.values() for i in ids}
+        for i in old_ids ^ new_ids:
+            ifc_class = self.id_map.get(i, None)
+            if not ifc_class:
+                continue
+            if self.has_inverses_column:
+                self.cursor.execute(f"SELECT inverses FROM {ifc_class} WHERE `ifc_id` = ? LIMIT 1", (i,))
+                row = self.cursor.fetchone()
+                inverses = json.loads(row[0]) if row and row[0] else []
+                if i in new_ids:
+                    inverses.append(ifc_id)
+                elif ifc_id in inverses:
+                    inverses.remove(ifc_id)
+                query = f"UPDATE {ifc_class} SET inverses = ? WHERE `ifc_id` = ?"
+                self.cursor.execute(query, (json.dumps(inverses), i))
+            with self.lock:
+                entity = self.entity_cache.peek(i)
+            if entity is not None:
+                entity.sqlite_wrapper.inverse_attribute_cache = {}
+
+    def affects_psets(self, inst, name=None):
+        """Returns whether editing, creating or removing an instance may change rows of the psets table
+
+        :param inst: The entity instance
+        :type inst: ifcopenshell.sql.sqlite_entity
+        :param name: The name of the edited attribute, or None if the
+            instance is created or removed
+        :type name: string
+        :rtype: bool
+        """
+        if "psets" not in self.tables:
+            return False
+        elif inst.is_a("IfcTypeObject"):
+            return name in (None, "HasPropertySets")
+        return any(inst.is_a(ifc_class) for ifc_class in PSET_CLASSES)
+
+    def get_pset_element_ids(self, inst):
+        """Returns the ids of instances of which the psets may depend on an instance
+
+        The properties, property sets and relationships referencing the
+        instance are followed up to the objects, type objects, materials or
+        profiles they define. Occurrences of type objects are included, as
+        they inherit the property sets of their type.
+
+        :param inst: A property related entity instance, see :func:`affects_psets`
+        :type inst: ifcopenshell.sql.sqlite_entity
+        :rtype: set[int]
+        """
+        ids = set()
+        queue = [inst]
+        visited = set()
+        while queue:
+            element = queue.pop()
+            if element is None or element.id() in visited:
+                continue
+            visited.add(element.id())
+            if element.is_a("IfcRelDefinesByProperties") or element.is_a("IfcRelDefinesByType"):
+                queue.extend(element.RelatedObjects or ())
+            elif element.is_a("IfcTypeObject"):
+                ids.add(element.id())
+                for rel in self.get_inverse(element):
+                    if rel.is_a("IfcRelDefinesByType"):
+                        queue.append(rel)
+            elif element.is_a("IfcExtendedProperties") or element.is_a("IfcExtendedMaterialProperties"):
+                # Material and profile properties reference what they define
+                queue.append(getattr(element, "Material", None) or getattr(element, "ProfileDefinition", None))
+                queue.extend(self.get_inverse(element))
+            elif any(element.is_a(ifc_class) for ifc_class in PSET_CLASSES):
+                queue.extend(self.get_inverse(element))
+            else:
+                ids.add(element.id())
+        return ids
+
+    def update_psets(self):
+        """Rewrites the rows of the psets table of instances affected by pending writes
+
+        Rows are derived as by Ifc2Sql, using
+        :func:`ifcopenshell.util.element.get_psets`.
+        """
+        ids, self.pending_pset_ids = self.pending_pset_ids, set()
+        for ifc_id in ids:
+            self.cursor.execute("DELETE FROM psets WHERE `ifc_id` = ?", (ifc_id,))
+            element = self.by_id(ifc_id)
+            if element is None:
+                continue
+            rows = []
+            for pset_name, pset_data in ifcopenshell.util.element.get_psets(element).items():
+                for prop_name, value in pset_data.items():
+                    if prop_name == "id":
+                        continue
+                    rows.append((ifc_id, pset_name, prop_name, value))
+            self.cursor.executemany("INSERT INTO psets VALUES (?, ?, ?, ?)", rows)
+
+    def record_write(self):
+        self.pending_writes += 1
+        if not self.is_batched or (self.write_batch_size and self.pending_writes >= self.write_batch_size):
+            self.commit()
+
+    def commit(self):
+        """Commits pending writes to the database"""
+        if self.pending_pset_ids:
+            self.update_psets()
+        self.db.commit()
+        self.pending_writes = 0
+
+    def batch(self):
+        """Defers committing writes until :func:`unbatch` is called
+
+        Committing is by far the slowest part of a write, so committing many
+        writes at once is much faster than committing each separately. Writes
+        are committed in transactions of at most write_batch_size writes, or
+        in a single transaction if write_batch_size is None. SQLite spills
+        large transactions to disk, so memory use remains bounded. Pending
+        writes are visible to queries before they are committed, except for
+        rows of the psets table, which are rewritten once per affected
+        instance on commit.
+
+        Example:
+
+        .. code:: python
+
+            ifc.batch()
+            for wall in ifc.by_type("IfcWall"):
+                wall.Description = "Foobar"
+            ifc.unbatch()
+        """
+        self.is_batched = True
+
+    def unbatch(self):
+        """Commits any pending writes and stops batching writes. See :func:`batch`"""
+        self.commit()
+        self.is_batched = False
 
     def by_id(self, id):
-        entity = self.entity_cache.get(id, None)
-        if entity:
-            return entity
-        ifc_class = self.id_map.get(id, None)
-        if ifc_class:
-            entity = sqlite_entity(id, ifc_class, self)
-            self.entity_cache[id] = entity
-            return entity
-        self.cursor.execute("SELECT ifc_id, ifc_class FROM id_map LIMIT 1")
-        row = self.cursor.fetchone()
-        if row:
-            self.id_map[row[0]] = row[1]
-            entity = sqlite_entity(id, ifc_class, self)
-            self.entity_cache[id] = entity
+        # The cache is shared by all threads when read only
+        with self.lock:
+            entity = self.entity_cache.get(id, None)
+            if entity is not None:
+                return entity
+            ifc_class = self.id_map.get(id, None)
+        if not ifc_class:
+            # Queried outside of the lock, as each thread has its own connection when read only
+            self.cursor.execute("SELECT ifc_id, ifc_class FROM id_map WHERE ifc_id = ? LIMIT 1", (id,))
+            row = self.cursor.fetchone()
+            if not row:
+                return
+            ifc_class = row[1]
+        with self.lock:
+            # Another thread may have created the instance in the meantime
+            entity = self.entity_cache.peek(id)
+            if entity is None:
+                self.id_map.setdefault(id, ifc_class)
+                entity = sqlite_entity(id, ifc_class, self)
+                self.entity_cache.set(id, entity)
             return entity
 
-    def by_type(self, type, include_subtypes=True):
+    def by_type(self, type, include_subtypes=True, prefetch=None):
+        """Return entity instances filtered by IFC class
+
+        :param type: The IFC class
+        :type type: string
+        :param include_subtypes: Whether or not to return subtypes of the IFC class
+        :type include_subtypes: bool
+        :param prefetch: The names of attributes to load up front for all
+            results, or True for all attributes. See :func:`prefetch`.
+        :type prefetch: None|bool|list[str]
+        :returns: A list of entity instances
+        :rtype: list
+        """
+        results = self.get_by_type(type, include_subtypes)
+        if prefetch:
+            self.prefetch(results, None if prefetch is True else prefetch)
+        return results
+
+    def get_by_type(self, type, include_subtypes=True):
         if self.class_map:
             results = []
             subtypes = self.ifc_class_subtypes[type] if include_subtypes else self.ifc_class_subtypes[type][0:1]
@@ -138,35 +723,106 @@ class sqlite(file):
         rows = self.cursor.fetchall()
         return [self.by_id(r[0]) for r in rows]
 
-    def traverse(self, inst, max_levels=None, breadth_first=False):
-        results = [inst]
-        queue = [inst]
-        while queue:
-            if max_levels is not None:
-                max_levels -= 1
+    def prefetch(self, elements, attributes=None):
+        """Loads the attributes of many entity instances with one query per class
 
-            cur = queue.pop()
-            reference_attributes = self.ifc_class_references[cur.sqlite_wrapper.ifc_class]
-            attributes = reference_attributes["entity"] + reference_attributes["entity_list"]
-            if not attributes:
-                continue
+        Without prefetching, the attributes of every entity instance are
+        queried separately when one of them is first accessed. When all
+        instances of a class are prefetched the whole table is read at once,
+        otherwise the rows are selected by id in chunks.
+
+        :param elements: The entity instances to load the attributes of
+        :type elements: list[ifcopenshell.sql.sqlite_entity]
+        :param attributes: The names of the attributes to load. Names which
+            are not attributes of a particular class are ignored. Defaults to
+            all attributes.
+        :type attributes: None|list[str]
+        """
+        elements_by_class = {}
+        for element in elements:
+            elements_by_class.setdefault(element.sqlite_wrapper.ifc_class, {})[element.sqlite_wrapper.id] = element
 
-            for attribute in attributes:
-                result = getattr(cur, attribute, [])
-                if not result:
+        for ifc_class, class_elements in elements_by_class.items():
+            if attributes is None:
+                columns = "*"
+            else:
+                names = [a for a in attributes if a in self.ifc_class_attributes[ifc_class]]
+                if not names:
                     continue
-                elif isinstance(result, tuple):
-                    results.extend(result)
-                    if max_levels is None or max_levels:
-                        queue.extend(result)
-                else:
-                    results.append(result)
-                    if max_levels is None or max_levels:
-                        queue.append(result)
-        # print('traverse results', results)
-        return results
+                columns = ",".join(["ifc_id"] + [f"`{a}`" for a in names])
+
+            if len(class_elements) == len(self.class_map.get(ifc_class, ())):
+                queries = [f"SELECT {columns} FROM {ifc_class}"]
+            else:
+                ids = list(class_elements.keys())
+                queries = [
+                    f"SELECT {columns} FROM {ifc_class} WHERE `ifc_id` IN ({','.join(map(str, ids[i : i + 10000]))})"
+                    for i in range(0, len(ids), 10000)
+                ]
+            for query in queries:
+                # Rows are fetched up front as loading attributes uses the cursor
+                self.cursor.execute(query)
+                for row in self.cursor.fetchall():
+                    element = class_elements.get(row["ifc_id"])
+                    if element is not None:
+                        element.load_attributes(row)
+
+    def by_type_iter(self, type, include_subtypes=True):
+        # Ids are fetched up front as by_id shares the cursor
+        for i in self.by_type_ids(type, include_subtypes).tolist():
+            yield self.by_id(i)
+
+    def by_type_ids(self, type, include_subtypes=True):
+        import numpy as np
+
+        if self.class_map:
+            subtypes = self.ifc_class_subtypes[type] if include_subtypes else self.ifc_class_subtypes[type][0:1]
+            ids = []
+            for subtype in subtypes:
+                ids.extend(self.class_map.get(subtype.name(), ()))
+            return np.array(ids, dtype=np.int64)
+        if include_subtypes:
+            declaration = self.ifc_schema.declaration_by_name(type)
+            subtypes = ",".join([f"'{st.name()}'" for st in ifcopenshell.util.schema.get_subtypes(declaration)])
+            self.cursor.execute(f"SELECT ifc_id FROM id_map WHERE ifc_class IN ({subtypes})")
+        else:
+            self.cursor.execute(f"SELECT ifc_id FROM id_map WHERE ifc_class='{type}'")
+        return np.array([r[0] for r in self.cursor.fetchall()], dtype=np.int64)
+
+    def traverse(self, inst, max_levels=None, breadth_first=False):
+        return list(self.iter_traverse(inst, max_levels=max_levels, breadth_first=breadth_first))
+
+    def get_direct_references(self, inst):
+        if self.has_inverses_table:
+            query = "SELECT ifc_id FROM inverses WHERE referenced_by = ? ORDER BY attribute_index"
+            self.cursor.execute(query, (inst.sqlite_wrapper.id,))
+            references = (self.by_id(i) for i in dict.fromkeys(r[0] for r in self.cursor.fetchall()))
+            return [r for r in references if r is not None]
+        references = {}
+        queue = list(inst.get_info(include_identifier=False).values())
+        while queue:
+            value = queue.pop()
+            if isinstance(value, (tuple, list)):
+                queue.extend(value)
+            elif isinstance(value, entity_instance) and value.id():
+                references[value.id()] = value
+        # Values were popped in reverse, restore attribute order
+        return list(references.values())[::-1]
 
     def get_inverse(self, inst, allow_duplicate=False, with_attribute_indices=False):
+        if with_attribute_indices and not allow_duplicate:
+            raise ValueError("with_attribute_indices requires allow_duplicate to be True")
+
+        if self.has_inverses_table:
+            query = "SELECT referenced_by, attribute_index FROM inverses WHERE ifc_id = ?"
+            self.cursor.execute(query, (inst.sqlite_wrapper.id,))
+            rows = self.cursor.fetchall()
+            if not allow_duplicate:
+                return {self.by_id(r[0]) for r in rows}
+            elif with_attribute_indices:
+                return [(self.by_id(r[0]), r[1]) for r in rows]
+            return [self.by_id(r[0]) for r in rows]
+
         query = f"SELECT inverses FROM {inst.sqlite_wrapper.ifc_class} WHERE `ifc_id` = {inst.sqlite_wrapper.id} LIMIT 1"
         self.cursor.execute(query)
         row = self.cursor.fetchone()
@@ -174,6 +830,138 @@ class sqlite(file):
             return set()
         return {self.by_id(e) for e in json.loads(row[0])}
 
+    def get_total_inverses(self, inst):
+        if self.has_inverses_table:
+            self.cursor.execute("SELECT COUNT(*) FROM inverses WHERE ifc_id = ?", (inst.sqlite_wrapper.id,))
+            return self.cursor.fetchone()[0]
+        return len(self.get_inverse(inst))
+
+    def get_inverse_many(self, elements, allow_duplicate=False):
+        container = list if allow_duplicate else set
+        element_ids = {}
+        for element in elements:
+            element_ids[element] = element.id() if isinstance(element, entity_instance) else int(element)
+        inverse_ids = self.get_inverse_ids_many(element_ids.values())
+        return {e: container(self.by_id(i) for i in inverse_ids.get(e_id, ())) for e, e_id in element_ids.items()}
+
+    def get_total_inverses_many(self, elements):
+        import numpy as np
+
+        ids = [e.id() if isinstance(e, entity_instance) else int(e) for e in elements]
+        inverse_ids = self.get_inverse_ids_many(ids)
+        return np.array([len(inverse_ids.get(i, ())) for i in ids], dtype=np.int64)
+
+    def get_inverse_ids_many(self, ids):
+        results = {}
+        if self.has_inverses_table:
+            ids = list(dict.fromkeys(ids))
+            # Chunked to stay well within SQLite's maximum statement length
+            for i in range(0, len(ids), 10000):
+                ids_csv = ",".join(map(str, ids[i : i + 10000]))
+                self.cursor.execute(f"SELECT ifc_id, referenced_by FROM inverses WHERE ifc_id IN ({ids_csv})")
+                for row in self.cursor.fetchall():
+                    results.setdefault(row[0], []).append(row[1])
+            return results
+
+        # One query per class, rather than one per element
+        ids_by_class = {}
+        for i in ids:
+            ifc_class = self.id_map.get(i, None)
+            if ifc_class:
+                ids_by_class.setdefault(ifc_class, set()).add(i)
+        for ifc_class, class_ids in ids_by_class.items():
+            class_ids = list(class_ids)
+            # Chunked to stay well within SQLite's maximum statement length
+            for i in range(0, len(class_ids), 10000):
+                ids_csv = ",".join(map(str, class_ids[i : i + 10000]))
+                self.cursor.execute(f"SELECT ifc_id, inverses FROM {ifc_class} WHERE `ifc_id` IN ({ids_csv})")
+                for row in self.cursor.fetchall():
+                    results[row[0]] = json.loads(row[1]) if row[1] else []
+        return results
+
+    def write(self, path):
+        """Writes the database to an IFC-SPF file
+
+        Rows are read in batches one class at a time, so memory use does not
+        grow with the size of the model. Instances keep their ids, but are
+        grouped by class rather than sorted by id. Any pending writes are
+        committed first.
+
+        :param path: The path of the IFC-SPF file to write
+        :type path: os.PathLike | str
+        """
+        self.commit()
+        self.cursor.execute("SELECT mvd FROM metadata LIMIT 1")
+        row = self.cursor.fetchone()
+        header = SPF_HEADER.format(
+            description=encode_string(row[0] if row and row[0] else ""),
+            name=encode_string(Path(path).name),
+            timestring=time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+            version=ifcopenshell.version,
+            schema=self.schema,
+        )
+        # A dedicated cursor, so that the caller may still query the file
+        cursor = self.db.cursor()
+        with open(path, "w", encoding="ascii", newline="\n") as f:
+            f.write(header)
+            for ifc_class in sorted(self.class_map):
+                if not self.class_map[ifc_class]:
+                    continue
+                derived = self.ifc_schema.declaration_by_name(ifc_class).derived()
+                primitives = list(self.ifc_class_primitives[ifc_class].items())
+                keyword = ifc_class.upper()
+                cursor.execute(f"SELECT * FROM {ifc_class}")
+                while True:
+                    rows = cursor.fetchmany(10000)
+                    if not rows:
+                        break
+                    lines = []
+                    for row in rows:
+                        values = []
+                        for i, (name, primitive) in enumerate(primitives):
+                            value = row[name]
+                            if derived[i]:
+                                values.append("*")
+                                continue
+                            elif isinstance(value, str) and isinstance(primitive, tuple):
+                                value = json.loads(value)
+                            values.append(self.serialise_spf_value(value, primitive))
+                        lines.append(f"#{row['ifc_id']}={keyword}({','.join(values)});\n")
+                    f.write("".join(lines))
+            f.write("ENDSEC;\nEND-ISO-10303-21;\n")
+
+    def serialise_spf_value(self, value, primitive):
+        if value is None:
+            return "$"
+        elif isinstance(value, dict):
+            # A typed value, such as IFCLABEL('x') in a select
+            type_primitive = self.ifc_type_primitives.get(value["type"], None)
+            if type_primitive is None:
+                declaration = self.ifc_schema.declaration_by_name(value["type"])
+                type_primitive = get_primitive_type(declaration)
+                self.ifc_type_primitives[value["type"]] = type_primitive
+            return f"{value['type'].upper()}({self.serialise_spf_value(value['value'], type_primitive)})"
+        elif isinstance(value, list):
+            item_primitive = primitive if is_reference(primitive) else primitive[1]
+            return f"({','.join(self.serialise_spf_value(v, item_primitive) for v in value)})"
+        elif is_reference(primitive):
+            return f"#{value}"
+        elif primitive == "logical":
+            if value == "UNKNOWN":
+                return ".U."
+            return ".T." if value else ".F."
+        elif primitive == "boolean" or isinstance(value, bool):
+            return ".T." if value else ".F."
+        elif primitive == "binary":
+            return encode_binary(value)
+        elif primitive == "enum":
+            return f".{value}."
+        elif primitive == "float" or isinstance(value, float):
+            return format_real(value)
+        elif isinstance(value, str):
+            return encode_string(value)
+        return str(value)
+
     def is_entity_list(self, attribute):
         attribute = str(attribute.type_of_attribute())
         if (attribute.startswith("<list") or attribute.startswith("<set")) and "<entity" in attribute:
@@ -183,31 +971,31 @@ class sqlite(file):
             return True
         return False
 
-    def get_geometry(self, ids):
+    def get_geometry(self, ids, as_array=False):
+        """Returns the placements and tessellated geometry of many shapes
+
+        :param ids: The ids of the elements to get the shapes of
+        :type ids: list[int]
+        :param as_array: If true, geometry arrays are read-only numpy views of
+            the stored data, rather than lists. This avoids copying and
+            converting every coordinate to a Python float.
+        :type as_array: bool
+        :returns: A dictionary of "shapes" by element id and "geometry" by
+            geometry id, referenced by the shapes.
+        :rtype: dict
+        """
         import numpy as np
 
-        ids_csv = ",".join(map(str, ids))
-        query = f"SELECT ifc_id, x, y, z, matrix, geometry, verts, edges, faces, material_ids, materials FROM shape LEFT JOIN geometry ON shape.geometry = geometry.id WHERE `ifc_id` IN ({ids_csv})"
-        self.cursor.execute(query)
-        rows = self.cursor.fetchall()
+        ids = list(ids)
         shapes = {}
         geometry = {}
-        for row in rows:
-            if row["geometry"] and row["geometry"] not in geometry:
-                geometry[row["geometry"]] = {
-                    "verts": np.frombuffer(row["verts"]).tolist() if row["verts"] else [],
-                    "edges": np.frombuffer(row["edges"], dtype=np.int64).tolist() if row["edges"] else [],
-                    "faces": np.frombuffer(row["faces"], dtype=np.int64).tolist() if row["faces"] else [],
-                    "material_ids": np.frombuffer(row["material_ids"], dtype=np.int64).tolist()
-                    if row["material_ids"]
-                    else [],
-                    "materials": json.loads(row["materials"]) if row["materials"] else [],
-                }
-            shapes[row["ifc_id"]] = {
-                "co": [row["x"], row["y"], row["z"]],
-                "matrix": np.copy(np.frombuffer(row["matrix"]).reshape((4, 4))),
-                "geometry": row["geometry"],
-            }
+        # Chunked to stay well within SQLite's maximum statement length
+        for i in range(0, len(ids), 10000):
+            ids_csv = ",".join(map(str, ids[i : i + 10000]))
+            self.cursor.execute(f"{GEOMETRY_QUERY} WHERE `ifc_id` IN ({ids_csv})")
+            chunk_shapes, chunk_geometry = self.load_geometry(self.cursor.fetchall(), as_array, geometry)
+            shapes.update(chunk_shapes)
+            geometry.update(chunk_geometry)
         ids_without_geometry = set(ids) - set(shapes.keys())
         for id in ids_without_geometry:
             shapes[id] = {
@@ -217,6 +1005,87 @@ class sqlite(file):
             }
         return {"shapes": shapes, "geometry": geometry}
 
+    def iter_geometry(self, ids=None, batch_size=10000, as_array=True):
+        """Pages through the placements and tessellated geometry of many shapes
+
+        Each batch has the same format as :func:`get_geometry`. Geometry that
+        is shared by shapes is only included in the first batch it is used in,
+        so consumers should keep geometry from previous batches that they may
+        need again.
+
+        Example:
+
+        .. code:: python
+
+            for batch in ifc.iter_geometry(batch_size=5000):
+                for ifc_id, shape in batch["shapes"].items():
+                    ...
+
+        :param ids: The ids of the elements to get the shapes of. Defaults to
+            all shapes in the database, which are then read using a single
+            query rather than a query per batch.
+        :type ids: list[int]
+        :param batch_size: The maximum number of shapes in each batch
+        :type batch_size: int
+        :param as_array: See :func:`get_geometry`
+        :type as_array: bool
+        :returns: A generator of dictionaries of "shapes" and "geometry"
+        :rtype: Iterator[dict]
+        """
+        seen_geometry = set()
+        if ids is None:
+            # A dedicated cursor, so that the caller may still query the file
+            cursor = self.db.cursor()
+            cursor.execute(GEOMETRY_QUERY)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                shapes, geometry = self.load_geometry(rows, as_array, seen_geometry)
+                seen_geometry.update(geometry.keys())
+                yield {"shapes": shapes, "geometry": geometry}
+            return
+        ids = list(ids)
+        for i in range(0, len(ids), batch_size):
+            batch = self.get_geometry(ids[i : i + batch_size], as_array=as_array)
+            for geometry_id in list(batch["geometry"].keys()):
+                if geometry_id in seen_geometry:
+                    del batch["geometry"][geometry_id]
+                seen_geometry.add(geometry_id)
+            yield batch
+
+    def load_geometry(self, rows, as_array=False, seen_geometry=()):
+        import numpy as np
+
+        shapes = {}
+        geometry = {}
+        for row in rows:
+            if row["geometry"] and row["geometry"] not in geometry and row["geometry"] not in seen_geometry:
+                verts = np.frombuffer(row["verts"]) if row["verts"] else np.empty(0)
+                edges = np.frombuffer(row["edges"], dtype=np.int64) if row["edges"] else np.empty(0, dtype=np.int64)
+                faces = np.frombuffer(row["faces"], dtype=np.int64) if row["faces"] else np.empty(0, dtype=np.int64)
+                material_ids = (
+                    np.frombuffer(row["material_ids"], dtype=np.int64)
+                    if row["material_ids"]
+                    else np.empty(0, dtype=np.int64)
+                )
+                if not as_array:
+                    verts, edges, faces, material_ids = (a.tolist() for a in (verts, edges, faces, material_ids))
+                geometry[row["geometry"]] = {
+                    "verts": verts,
+                    "edges": edges,
+                    "faces": faces,
+                    "material_ids": material_ids,
+                    "materials": json.loads(row["materials"]) if row["materials"] else [],
+                }
+            matrix = np.frombuffer(row["matrix"]).reshape((4, 4))
+            shapes[row["ifc_id"]] = {
+                "co": [row["x"], row["y"], row["z"]],
+                "matrix": matrix if as_array else np.copy(matrix),
+                "geometry": row["geometry"],
+            }
+        return shapes, geometry
+
 
 class sqlite_entity(entity_instance):
     def __init__(self, id, ifc_class, file=None):
@@ -238,11 +1107,10 @@ class sqlite_entity(entity_instance):
         return self.__getattr__(list(self.sqlite_wrapper.attributes.keys())[key])
 
     def __setattr__(self, key, value):
-        # query = f"UPDATE `{self.sqlite_wrapper.ifc_class}` SET `{key}`='' WHERE `ifc_id` = {self.sqlite_wrapper.id}"
-        query = f"UPDATE `{self.sqlite_wrapper.ifc_class}` SET `{key}` = ? WHERE ifc_id = {self.sqlite_wrapper.id}"
-        self.sqlite_wrapper.file.cursor.execute(query, (value,))
-        self.sqlite_wrapper.file.db.commit()
-        self.sqlite_wrapper.attribute_cache = {}
+        self.sqlite_wrapper.file.set_attribute(self, key, value)
+
+    def __setitem__(self, idx, value):
+        self.sqlite_wrapper.file.set_attribute(self, list(self.sqlite_wrapper.attributes.keys())[idx], value)
 
     def __getattr__(self, name):
         # print("*" * 100)
@@ -251,36 +1119,10 @@ class sqlite_entity(entity_instance):
         INVALID, FORWARD, INVERSE = range(3)
         attr_cat = self.wrapped_data.get_attribute_category(name)
         if attr_cat == FORWARD:
-            if self.sqlite_wrapper.attribute_cache:
-                # print(self.sqlite_wrapper.ifc_class)
-                # print(self.sqlite_wrapper.attribute_cache)
+            # The cache may only be partially populated by sqlite.prefetch()
+            if name in self.sqlite_wrapper.attribute_cache:
                 return self.sqlite_wrapper.attribute_cache[name]
-
-            # print('first time for', self.sqlite_wrapper.ifc_class)
-
-            # print("IT IS A FORWARD")
-            query = f"SELECT * FROM {self.sqlite_wrapper.ifc_class} WHERE `ifc_id` = {self.sqlite_wrapper.id} LIMIT 1"
-            self.sqlite_wrapper.file.cursor.execute(query)
-            row = self.sqlite_wrapper.file.cursor.fetchone()
-
-            for attribute in self.sqlite_wrapper.attributes.values():
-                # attribute = self.sqlite_wrapper.attributes[name]
-                aname = attribute.name()
-                primitive = ifcopenshell.util.attribute.get_primitive_type(attribute)
-
-                if not row or row[aname] is None:
-                    self.sqlite_wrapper.attribute_cache[aname] = None
-                elif primitive == "entity":
-                    self.sqlite_wrapper.attribute_cache[aname] = self.sqlite_wrapper.file.by_id(row[aname])
-                elif isinstance(primitive, tuple):
-                    if isinstance(row[aname], int):
-                        self.sqlite_wrapper.attribute_cache[aname] = self.sqlite_wrapper.file.by_id(row[aname])
-                    else:
-                        self.sqlite_wrapper.attribute_cache[aname] = self.unserialise_value(json.loads(row[aname]))
-                else:
-                    self.sqlite_wrapper.attribute_cache[aname] = row[aname]
-                if isinstance(self.sqlite_wrapper.attribute_cache[aname], list):
-                    self.sqlite_wrapper.attribute_cache[aname] = tuple(self.sqlite_wrapper.attribute_cache[aname])
+            self.load_attributes()
             return self.sqlite_wrapper.attribute_cache[name]
         elif attr_cat == INVERSE:
             if self.sqlite_wrapper.inverse_attribute_cache:
@@ -290,6 +1132,11 @@ class sqlite_entity(entity_instance):
 
             results = []
 
+            if self.sqlite_wrapper.file.has_inverses_table:
+                results = self.get_inverse_attribute(name)
+                self.sqlite_wrapper.inverse_attribute_cache[name] = results
+                return results
+
             query = f"SELECT inverses FROM {self.sqlite_wrapper.ifc_class} WHERE `ifc_id` = {self.sqlite_wrapper.id} LIMIT 1"
             self.sqlite_wrapper.file.cursor.execute(query)
             row = self.sqlite_wrapper.file.cursor.fetchone()
@@ -324,6 +1171,58 @@ class sqlite_entity(entity_instance):
             "entity instance of type '%s' has no attribute '%s'" % (self.wrapped_data.is_a(True), name)
         )
 
+    def get_inverse_attribute(self, name):
+        """Gets the value of an inverse attribute using the indexed inverses table
+
+        References are matched on the class and attribute index stored in the
+        table, so no referencing instances need to be loaded.
+        """
+        file = self.sqlite_wrapper.file
+        attribute = self.sqlite_wrapper.inverse_attributes[name]
+        entity_class = attribute.entity_reference().name()
+        declaration = file.ifc_schema.declaration_by_name(entity_class)
+        subtypes = {st.name() for st in ifcopenshell.util.schema.get_subtypes(declaration)}
+        # Inherited attributes keep their index in subtypes
+        forward_index = list(file.ifc_class_attributes[entity_class]).index(attribute.attribute_reference().name())
+
+        query = "SELECT referenced_by FROM inverses WHERE ifc_id = ? AND attribute_index = ?"
+        file.cursor.execute(query, (self.sqlite_wrapper.id, forward_index))
+        element_ids = dict.fromkeys(r[0] for r in file.cursor.fetchall())
+        return tuple(file.by_id(i) for i in element_ids if file.id_map.get(i) in subtypes)
+
+    def load_attributes(self, row=None):
+        """Populates the attribute cache from a row of the class table
+
+        :param row: A row with the ifc_id and any attribute columns. If None,
+            the entire row is queried.
+        """
+        if row is None:
+            query = f"SELECT * FROM {self.sqlite_wrapper.ifc_class} WHERE `ifc_id` = {self.sqlite_wrapper.id} LIMIT 1"
+            self.sqlite_wrapper.file.cursor.execute(query)
+            row = self.sqlite_wrapper.file.cursor.fetchone()
+        names = set(row.keys()) if row else self.sqlite_wrapper.attributes.keys()
+        primitives = self.sqlite_wrapper.file.ifc_class_primitives[self.sqlite_wrapper.ifc_class]
+
+        for aname, primitive in primitives.items():
+            if aname not in names:
+                continue
+            if not row or row[aname] is None:
+                self.sqlite_wrapper.attribute_cache[aname] = None
+            elif primitive == "entity":
+                self.sqlite_wrapper.attribute_cache[aname] = self.sqlite_wrapper.file.by_id(row[aname])
+            elif isinstance(primitive, tuple):
+                if isinstance(row[aname], int):
+                    self.sqlite_wrapper.attribute_cache[aname] = self.sqlite_wrapper.file.by_id(row[aname])
+                else:
+                    self.sqlite_wrapper.attribute_cache[aname] = self.unserialise_value(json.loads(row[aname]))
+            else:
+                self.sqlite_wrapper.attribute_cache[aname] = row[aname]
+            if isinstance(self.sqlite_wrapper.attribute_cache[aname], list):
+                self.sqlite_wrapper.attribute_cache[aname] = tuple(self.sqlite_wrapper.attribute_cache[aname])
+        size = LRUCache.ENTITY_SIZE + LRUCache.estimate_size(tuple(self.sqlite_wrapper.attribute_cache.values()))
+        with self.sqlite_wrapper.file.lock:
+            self.sqlite_wrapper.file.entity_cache.resize(self.sqlite_wrapper.id, size)
+
     def unserialise_value(self, value):
         if isinstance(value, (tuple, list)):
             for i, value2 in enumerate(value):
@@ -352,8 +1251,8 @@ class sqlite_entity(entity_instance):
 
     def get_info(self, include_identifier=True, recursive=False, return_type=dict, ignore=(), scalar_only=False):
         info = {"id": self.sqlite_wrapper.id, "type": self.sqlite_wrapper.ifc_class}
-        if not self.sqlite_wrapper.attribute_cache:
-            self.__getitem__(0) # This will get all attributes
+        if len(self.sqlite_wrapper.attribute_cache) < len(self.sqlite_wrapper.attributes):
+            self.load_attributes()
         info.update(self.sqlite_wrapper.attribute_cache)
         return info
 
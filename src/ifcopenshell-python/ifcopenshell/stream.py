@@ -1,379 +1,1095 @@
 try:
+    import os
     import re
+    import sys
+    import json
+    import mmap
+    import array
+    import bisect
+    import hashlib
+    import numpy as np
+    import itertools
+    import zipfile
+    import concurrent.futures
+    from pathlib import Path
 
+    import ifcopenshell.util.file
     import ifcopenshell.util.schema
-    from .file import file
+    from .file import file, LRUCache
     from . import ifcopenshell_wrapper
     from .entity_instance import entity_instance
+except ImportError as e:
+    # numpy is a hard requirement of the stream backend. ifcopenshell only
+    # imports the backend if it is available, so fail clearly rather than
+    # leaving the module partially defined.
+    raise ImportError(f"No stream support (requires numpy): {e}") from e
 
+try:
     from lark import Lark, Transformer
+except ImportError:
+    # Lark is only required for the legacy parser, see stream.parser
+    Lark = None
+    Transformer = object
+
+
+INDEX_SUFFIX = ".index"
+INDEX_MAGIC = b"IFCOPENSHELL-STREAM-INDEX\n"
+INDEX_VERSION = 2
+FINGERPRINT_SIZE = 65536
+
+# The tokenizer below operates directly on bytes (or any buffer such as an
+# mmap) and dispatches on the first byte of every token. Compared to running
+# the Lark grammar per record this avoids building a parse tree, avoids
+# decoding the line to a str, and visits every nested list exactly once.
+HASH, QUOTE, DQUOTE, DOLLAR, STAR, DOT = b"#", b"'", b'"', b"$", b"*", b"."
+LPAREN, RPAREN, COMMA, SEMICOLON, SLASH = b"(", b")", b",", b";", b"/"
+WHITESPACE = frozenset(b" \t\r\n")
+NUMBER_START = frozenset(b"+-0123456789")
+KEYWORD_START = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_")
+
+record_pattern = re.compile(rb"\s*#([0-9]+)\s*=\s*([A-Za-z0-9_]+)\s*\(")
+reference_pattern = re.compile(rb"#([0-9]+)")
+string_pattern = re.compile(rb"'((?:[^']|'')*)'")
+binary_pattern = re.compile(rb'"([0-9A-Fa-f]*)"')
+number_pattern = re.compile(rb"[+-]?[0-9]*\.?[0-9]*(?:[Ee][+-]?[0-9]+)?")
+enum_pattern = re.compile(rb"\.([A-Za-z0-9_]+)\.")
+keyword_pattern = re.compile(rb"([A-Za-z_][A-Za-z0-9_]*)\s*\(")
+schema_pattern = re.compile(rb"FILE_SCHEMA\s*\(\s*\(\s*'([^']*)'")
+data_section_pattern = re.compile(rb"\bDATA\s*;")
+# Matches both record starts (#1=IFCWALL) and references (#1) in a single
+# pass over the data. Only the former capture a class name.
+index_pattern = re.compile(rb"#([0-9]+)(?:[ \t\r\n]*=[ \t\r\n]*([A-Za-z0-9_]+))?")
+boundary_pattern = re.compile(rb";[ \t\r\n]*(#)[0-9]+[ \t\r\n]*=")
+comment_pattern = re.compile(rb"/\*.*?\*/", re.DOTALL)
+directive_pattern = re.compile(
+    rb"\\X2\\((?:[0-9A-Fa-f]{4})*)\\X0\\"
+    rb"|\\X4\\((?:[0-9A-Fa-f]{8})*)\\X0\\"
+    rb"|\\X\\([0-9A-Fa-f]{2})"
+    rb"|\\S\\(.)"
+    rb"|\\P[A-I]\\"
+    rb"|\\\\",
+    re.DOTALL,
+)
+
+
+def decode_bytes(value):
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.decode("latin-1")
+
+
+def decode_directive(match):
+    x2, x4, x, s = match.groups()
+    if x2 is not None:
+        return bytes.fromhex(x2.decode("ascii")).decode("utf-16-be").encode("utf-8")
+    elif x4 is not None:
+        return bytes.fromhex(x4.decode("ascii")).decode("utf-32-be").encode("utf-8")
+    elif x is not None:
+        return chr(int(x, 16)).encode("utf-8")
+    elif s is not None:
+        return chr(s[0] + 128).encode("utf-8")
+    elif match.group(0) == b"\\\\":
+        return b"\\"
+    return b""  # Code page switches are not supported, ISO 8859-1 is assumed
+
+
+def decode_string(value):
+    """Decodes the raw bytes between the quotes of an SPF string
+
+    Doubled apostrophes are unescaped and the \\X2\\, \\X4\\, \\X\\ and \\S\\
+    control directives are converted to their unicode equivalent.
+    """
+    if b"''" in value:
+        value = value.replace(b"''", b"'")
+    if b"\\" in value:
+        value = directive_pattern.sub(decode_directive, value)
+    return decode_bytes(value)
+
+
+def parse_arguments(data, pos, resolve=None, create=None):
+    """Parses a parenthesised SPF argument list starting at ``data[pos]``
+
+    :param data: A bytes-like object such as bytes, a memoryview or an mmap
+    :param pos: The offset of the opening parenthesis
+    :param resolve: Called with the integer ID of every #reference. If None,
+        the integer ID is returned instead.
+    :param create: Called with the type name and value of every inline typed
+        value such as IFCLABEL('x'). If None, a (type, value) tuple is returned.
+    :returns: A tuple of (values, end) where end is the offset after the
+        closing parenthesis.
+    """
+    stack = []
+    values = []
+    type_name = None
+    pos += 1
+    try:
+        while True:
+            c = data[pos : pos + 1]
+            if c == COMMA or c[0] in WHITESPACE:
+                pos += 1
+            elif c == HASH:
+                match = reference_pattern.match(data, pos)
+                step_id = int(match.group(1))
+                values.append(resolve(step_id) if resolve else step_id)
+                pos = match.end()
+            elif c == QUOTE:
+                match = string_pattern.match(data, pos)
+                values.append(decode_string(match.group(1)))
+                pos = match.end()
+            elif c == DOLLAR or c == STAR:
+                values.append(None)
+                pos += 1
+            elif c == DOT:
+                match = enum_pattern.match(data, pos)
+                value = match.group(1)
+                if value == b"T":
+                    values.append(True)
+                elif value == b"F":
+                    values.append(False)
+                elif value == b"U":
+                    values.append("UNKNOWN")
+                else:
+                    values.append(value.decode("ascii"))
+                pos = match.end()
+            elif c == LPAREN:
+                stack.append((values, type_name))
+                values = []
+                type_name = None
+                pos += 1
+            elif c == RPAREN:
+                pos += 1
+                if type_name is None:
+                    value = tuple(values)
+                elif create:
+                    value = create(type_name, values[0])
+                else:
+                    value = (type_name, values[0])
+                if not stack:
+                    return value, pos
+                values, type_name = stack.pop()
+                values.append(value)
+            elif c[0] in NUMBER_START:
+                match = number_pattern.match(data, pos)
+                value = match.group(0)
+                if b"." in value or b"E" in value or b"e" in value:
+                    values.append(float(value))
+                else:
+                    values.append(int(value))
+                pos = match.end()
+            elif c[0] in KEYWORD_START:
+                match = keyword_pattern.match(data, pos)
+                stack.append((values, type_name))
+                values = []
+                type_name = match.group(1).decode("ascii")
+                pos = match.end()
+            elif c == DQUOTE:
+                match = binary_pattern.match(data, pos)
+                values.append(match.group(1).decode("ascii"))
+                pos = match.end()
+            elif c == SLASH:
+                pos = comment_pattern.match(data, pos).end()
+            else:
+                raise ValueError(f"Unexpected character {c!r} at offset {pos}")
+    except (IndexError, AttributeError):
+        # IndexError when running off the end of the data, AttributeError
+        # when one of the token patterns did not match.
+        raise ValueError(f"Unable to parse SPF arguments at offset {pos}")
+
+
+def parse_record(data, pos=0, resolve=None, create=None):
+    """Parses a single #id=TYPE(...); entity instance record
+
+    See parse_arguments for a description of the arguments.
+
+    :returns: A tuple of (id, TYPE, attributes, end) where attributes is a
+        tuple and end is the offset after the terminating semicolon.
+    """
+    match = record_pattern.match(data, pos)
+    if not match:
+        raise ValueError(f"Expected an entity instance record at offset {pos}")
+    attributes, pos = parse_arguments(data, match.end() - 1, resolve, create)
+    while data[pos : pos + 1] != SEMICOLON:
+        if not data[pos : pos + 1]:
+            break
+        pos += 1
+    return int(match.group(1)), match.group(2).decode("ascii"), attributes, pos + 1
+
+
+class array_map:
+    """A read-only mapping of sorted integer keys to values stored in arrays
+
+    Compared to a dict of Python ints this uses two machine words per entry.
+    Lookups are O(1) when keys are contiguous, which is typical for STEP ids,
+    and a binary search otherwise. If labels are provided, values are used as
+    indices into labels, which is used to store class names compactly.
+    """
+
+    def __init__(self, keys, values, labels=None):
+        self.keys_array = keys
+        self.values_array = values
+        self.labels = labels
+        self.first = keys[0] if keys else 0
+        self.is_dense = bool(keys) and keys[-1] - keys[0] + 1 == len(keys)
+
+    def index(self, key):
+        if self.is_dense:
+            i = key - self.first
+            return i if 0 <= i < len(self.keys_array) else -1
+        i = bisect.bisect_left(self.keys_array, key)
+        if i < len(self.keys_array) and self.keys_array[i] == key:
+            return i
+        return -1
+
+    def get(self, key, default=None):
+        i = self.index(key)
+        if i == -1:
+            return default
+        if self.labels is None:
+            return self.values_array[i]
+        return self.labels[self.values_array[i]]
+
+    def __getitem__(self, key):
+        i = self.index(key)
+        if i == -1:
+            raise KeyError(key)
+        if self.labels is None:
+            return self.values_array[i]
+        return self.labels[self.values_array[i]]
+
+    def __contains__(self, key):
+        return self.index(key) != -1
+
+    def __len__(self):
+        return len(self.keys_array)
+
+    def __iter__(self):
+        return iter(self.keys_array)
+
+    def keys(self):
+        return self.keys_array
+
+    def values(self):
+        if self.labels is None:
+            return self.values_array
+        return [self.labels[v] for v in self.values_array]
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+
+class csr_map:
+    """A read-only mapping of STEP ids to the ids of instances referencing them
+
+    The inverse relationships are stored in compressed sparse row form: the
+    referencing ids of the instance at position i of the index are
+    values[offsets[i]:offsets[i + 1]]. This costs 8 bytes per reference and
+    per instance, compared to a Python list per referenced instance.
+    """
+
+    def __init__(self, index, offsets, values):
+        self.index = index
+        self.offsets = offsets
+        self.values = values
+
+    @classmethod
+    def from_pairs(cls, index, references, referencing):
+        """Builds the mapping from two parallel arrays of referenced and referencing ids
+
+        References to ids which are not in the index are discarded.
+        """
+        keys = np.frombuffer(index.keys_array, dtype=np.int64)
+        references = np.frombuffer(references, dtype=np.int64)
+        referencing = np.frombuffer(referencing, dtype=np.int64)
+        rows = np.searchsorted(keys, references)
+        is_valid = rows < len(keys)
+        is_valid[is_valid] = keys[rows[is_valid]] == references[is_valid]
+        rows = rows[is_valid]
+        values = referencing[is_valid][np.argsort(rows, kind="stable")]
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(keys)), out=offsets[1:])
+        return cls(index, offsets, values)
+
+    def count(self, key):
+        i = self.index.index(key)
+        if i == -1:
+            return 0
+        return int(self.offsets[i + 1] - self.offsets[i])
+
+    def count_many(self, keys):
+        """Returns an integer array with the count of each key, vectorised with NumPy"""
+        keys = np.asarray(keys, dtype=np.int64)
+        counts = np.zeros(len(keys), dtype=np.int64)
+        index_keys = np.frombuffer(self.index.keys_array, dtype=np.int64)
+        if not len(index_keys):
+            return counts
+        rows = np.minimum(np.searchsorted(index_keys, keys), len(index_keys) - 1)
+        is_valid = index_keys[rows] == keys
+        rows = rows[is_valid]
+        counts[is_valid] = self.offsets[rows + 1] - self.offsets[rows]
+        return counts
+
+    def get(self, key, default=None):
+        i = self.index.index(key)
+        if i == -1 or self.offsets[i] == self.offsets[i + 1]:
+            return default
+        return self.values[self.offsets[i] : self.offsets[i + 1]].tolist()
+
+    def __getitem__(self, key):
+        result = self.get(key)
+        if result is None:
+            raise KeyError(key)
+        return result
+
+    def __contains__(self, key):
+        return self.count(key) > 0
+
+
+class StreamTransformer(Transformer):
+    def string(self, items):
+        return str(items[0])[1:-1]
+
+    def float(self, items):
+        return float(items[0])
+
+    def ifcint(self, items):
+        return int(items[0])
+
+    def null(self, items):
+        return None
+
+    def derived(self, items):
+        return None
+
+    def enum(self, items):
+        if items[0] == ".T.":
+            return True
+        elif items[0] == ".F.":
+            return False
+        elif items[0] == ".U.":
+            return "UNKNOWN"
+        return str(items[0])[1:-1]
+
+    def list(self, items):
+        # List is always called twice, I think due to an ambiguity in the Lark
+        # definition between a list and an arg, but I'm not quite sure.
+        # print('calling list with', items)
+        if items and isinstance(items[0], dict):
+            return tuple(items[0]["list"])
+        return {"list": items}
+
+    def inline_type(self, items):
+        # inline_type is also always called twice. Why?
+        if items and isinstance(items[0], dict):
+            return items[0]["inline_type"]
+        entity = ifcopenshell.create_entity(items[0])
+        entity[0] = items[1]
+        return {"inline_type": entity}
+
+    def reference(self, items):
+        return self.file.by_id(int(items[0][1:]))
+
+    def arg(self, items):
+        return items[0]
+
+    def args(self, items):
+        return items
+
+    def start(self, items):
+        return (int(items[0]), str(items[1]), items[2])
+
+
+# common.INT doesn't support negative integers.
+lark_grammar = r"""
+    start: "#" NUMBER "=" TYPE "(" args ")" ";"
+
+    args: arg ("," arg)*
+
+    arg: STRING        -> string
+        | FLOAT        -> float
+        | IFCINT       -> ifcint
+        | NULL         -> null
+        | DERIVED      -> derived
+        | ENUM         -> enum
+        | REFERENCE    -> reference
+        | list         -> list
+        | inline_type  -> inline_type
+
+    list: "(" arg? ("," arg)* ")"
+    inline_type: TYPE "(" arg ")"
+    REFERENCE: "#" /[0-9]+/
+
+    TYPE: CNAME
+    NUMBER: INT
+
+    STRING: "'" /([^']|'')*/ "'"
+    IFCINT: /-?[0-9]+/
+    FLOAT: /-?[0-9]+\.[0-9]*([Ee]-?[0-9]+)?/
+    NULL: "$"
+    DERIVED: "*"
+    ENUM: "." CNAME "."
+
+    %import common.INT
+    %import common.CNAME
+"""
+
+
+def get_index_path(filepath):
+    """Returns the default path of the sidecar index file of an IFC file"""
+    return str(filepath) + INDEX_SUFFIX
+
+
+def get_fingerprint(filepath, data=None):
+    """Returns what identifies the contents of an IFC file for index invalidation
+
+    The size and modification time are checked together with a hash of the
+    first and last 64KB, which catches most in-place edits without hashing
+    potentially gigabytes of data.
+    """
+    stat = os.stat(filepath)
+    if data is None:
+        with open(filepath, "rb") as f:
+            head = f.read(FINGERPRINT_SIZE)
+            f.seek(max(0, stat.st_size - FINGERPRINT_SIZE))
+            tail = f.read()
+    else:
+        head = data[:FINGERPRINT_SIZE]
+        tail = data[max(0, len(data) - FINGERPRINT_SIZE) :]
+    digest = hashlib.sha1(head)
+    digest.update(tail)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest.hexdigest()}
+
+
+def index_records(data, start, end):
+    """Finds all records and references in a byte range of SPF data
+
+    The range must start outside of a record, such as directly after the DATA
+    section header or at the # of a record.
+
+    :returns: A dictionary of arrays describing the records found
+    """
+    ids = array.array("q")
+    offsets = array.array("q")
+    classes = array.array("I")
+    class_indices = {}
+    class_ids = []
+    references = array.array("q")
+    referencing = array.array("q")
+    is_sorted = True
+    step_id = 0
+    record_start = start
+    quotes = 0
+
+    for match in index_pattern.finditer(data, start, end):
+        reference, ifc_class = match.groups()
+        if ifc_class is None:
+            references.append(int(reference))
+            referencing.append(step_id)
+            continue
+        offset = match.start()
+        record_quotes = data[record_start:offset].count(QUOTE)
+        if record_quotes % 2:
+            # Looks like a record, but is part of a string. Escaped quotes
+            # come in pairs so an odd count means we are inside a string.
+            continue
+        quotes += record_quotes
+        record_start = offset
+        previous_id = step_id
+        step_id = int(reference)
+        if step_id < previous_id:
+            is_sorted = False
+        class_index = class_indices.get(ifc_class, None)
+        if class_index is None:
+            class_index = class_indices[ifc_class] = len(class_indices)
+            class_ids.append(array.array("q"))
+        ids.append(step_id)
+        offsets.append(offset)
+        classes.append(class_index)
+        class_ids[class_index].append(step_id)
+
+    return {
+        "ids": ids,
+        "offsets": offsets,
+        "classes": classes,
+        "class_names": [c.decode("ascii") for c in class_indices.keys()],
+        "class_ids": class_ids,
+        "references": references,
+        "referencing": referencing,
+        "is_sorted": is_sorted,
+        "quotes": quotes + data[record_start:end].count(QUOTE),
+    }
+
+
+def index_file_range(filepath, start, end):
+    """Runs index_records on a file, used by worker processes in parallel indexing"""
+    with open(filepath, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return index_records(data, start, end)
+        finally:
+            data.close()
+
+
+def merge_indexes(chunks):
+    """Concatenates the results of index_records for consecutive byte ranges"""
+    if len(chunks) == 1:
+        return chunks[0]
+    result = {
+        "ids": array.array("q"),
+        "offsets": array.array("q"),
+        "classes": array.array("I"),
+        "class_names": [],
+        "class_ids": [],
+        "references": array.array("q"),
+        "referencing": array.array("q"),
+        "is_sorted": True,
+    }
+    class_indices = {}
+    for chunk in chunks:
+        remap = []
+        for name, class_ids in zip(chunk["class_names"], chunk["class_ids"]):
+            class_index = class_indices.get(name, None)
+            if class_index is None:
+                class_index = class_indices[name] = len(class_indices)
+                result["class_names"].append(name)
+                result["class_ids"].append(array.array("q"))
+            result["class_ids"][class_index].extend(class_ids)
+            remap.append(class_index)
+        if not chunk["is_sorted"] or (result["ids"] and chunk["ids"] and chunk["ids"][0] < result["ids"][-1]):
+            result["is_sorted"] = False
+        classes = np.asarray(remap, dtype=np.uint32)[np.frombuffer(chunk["classes"], dtype=np.uint32)]
+        result["classes"].frombytes(classes.tobytes())
+        for key in ("ids", "offsets", "references", "referencing"):
+            result[key].extend(chunk[key])
+    return result
+
+
+def build_indexes(directory, pattern="*.ifc", recursive=False, workers=1):
+    """Prebuilds sidecar indexes for all IFC files in a directory
+
+    Files which already have an up to date index are skipped.
+
+    :param directory: The directory to search for IFC files
+    :param pattern: A glob pattern of files to index
+    :param recursive: Whether or not to also search subdirectories
+    :param workers: The number of processes used to index each file
+    :returns: A list of index file paths
+    """
+    directory = Path(directory)
+    paths = directory.rglob(pattern) if recursive else directory.glob(pattern)
+    results = []
+    for path in sorted(paths):
+        stream(path, use_index=True, save_index=True, workers=workers)
+        results.append(get_index_path(path))
+    return results
+
+
+class stream(file):
+    def __init__(self, filepath, use_index=True, save_index=False, index_path=None, workers=1):
+        """Opens an IFC-SPF file without loading it into memory
 
-    class StreamTransformer(Transformer):
-        def string(self, items):
-            return str(items[0])[1:-1]
-    
-        def float(self, items):
-            return float(items[0])
-    
-        def ifcint(self, items):
-            return int(items[0])
-    
-        def null(self, items):
-            return None
-    
-        def derived(self, items):
-            return None
-    
-        def enum(self, items):
-            if items[0] == ".T.":
-                return True
-            elif items[0] == ".F.":
-                return False
-            elif items[0] == ".U.":
-                return "UNKNOWN"
-            return str(items[0])[1:-1]
-    
-        def list(self, items):
-            # List is always called twice, I think due to an ambiguity in the Lark
-            # definition between a list and an arg, but I'm not quite sure.
-            # print('calling list with', items)
-            if items and isinstance(items[0], dict):
-                return tuple(items[0]["list"])
-            return {"list": items}
-    
-        def inline_type(self, items):
-            # inline_type is also always called twice. Why?
-            if items and isinstance(items[0], dict):
-                return items[0]["inline_type"]
-            entity = ifcopenshell.create_entity(items[0])
-            entity[0] = items[1]
-            return {"inline_type": entity}
-    
-        def reference(self, items):
-            return self.file.by_id(int(items[0][1:]))
-    
-        def arg(self, items):
-            return items[0]
-    
-        def args(self, items):
-            return items
-    
-        def start(self, items):
-            return (int(items[0]), str(items[1]), items[2])
-    
-    
-    class stream(file):
-        def __init__(self, filepath):
-            self.wrapped_data = None
-            self.history_size = 64
-            self.history = []
-            self.future = []
-            self.transaction = None
-    
-            self.filepath = filepath
-    
-            self.file = open(filepath, "r")
-            self.id_map = {}
-            self.class_map = {}
-            self.id_offset = {}
-            self.schema = "IFC4"
-            self.reference_pattern = re.compile(r"#(\d+)")
-            self.entity_cache = {}
-            self.inverses = {}
-    
-            # common.INT doesn't support negative integers.
-            grammar = r"""
-                start: "#" NUMBER "=" TYPE "(" args ")" ";"
-    
-                args: arg ("," arg)*
-    
-                arg: STRING        -> string
-                    | FLOAT        -> float
-                    | IFCINT       -> ifcint
-                    | NULL         -> null
-                    | DERIVED      -> derived
-                    | ENUM         -> enum
-                    | REFERENCE    -> reference
-                    | list         -> list
-                    | inline_type  -> inline_type
-    
-                list: "(" arg? ("," arg)* ")"
-                inline_type: TYPE "(" arg ")"
-                REFERENCE: "#" /[0-9]+/
-    
-                TYPE: CNAME
-                NUMBER: INT
-    
-                STRING: "'" /([^']|'')*/ "'"
-                IFCINT: /-?[0-9]+/
-                FLOAT: /-?[0-9]+\.[0-9]*([Ee]-?[0-9]+)?/
-                NULL: "$"
-                DERIVED: "*"
-                ENUM: "." CNAME "."
-    
-                %import common.INT
-                %import common.CNAME
-            """
-    
+        Records are located using an index of offsets and only parsed when
+        their attributes are accessed. The index may be persisted to a sidecar
+        file so that subsequent opens of the same file are near instant.
+
+        The stream backend requires numpy, which is used for the index.
+
+        :param filepath: The path to the IFC-SPF file. An .ifcZIP archive is
+            decompressed into memory instead, without extracting it to disk.
+        :param use_index: Whether or not to load an existing sidecar index if
+            it is up to date with the IFC file
+        :param save_index: Whether or not to write the sidecar index if it had
+            to be (re)built
+        :param index_path: The path of the sidecar index. Defaults to the IFC
+            filepath suffixed with .index
+        :param workers: The number of processes used to build the index. Large
+            files benefit from using one per available core.
+        """
+        self.wrapped_data = None
+        self.history_size = 64
+        self.history_max_bytes = None
+        self.history_spill_bytes = None
+        self.by_type_cache = None
+        self.history = []
+        self.future = []
+        self.transaction = None
+
+        self.filepath = filepath
+
+        if ifcopenshell.util.file.guess_format(Path(filepath)) == ".ifcZIP":
+            # The archive member is decompressed into anonymous memory rather
+            # than a temporary file. Offsets in the index refer to this data.
+            with zipfile.ZipFile(filepath) as zf:
+                info = ifcopenshell.util.file.get_zip_member(zf, suffixes=(".ifc",))
+                self.file = None
+                # Empty data can't be memory mapped
+                self.data = mmap.mmap(-1, info.file_size) if info.file_size else b""
+                if info.file_size:
+                    ifcopenshell.util.file.read_zip_member(zf, info, self.data)
+        else:
+            self.file = open(filepath, "rb")
+            if os.fstat(self.file.fileno()).st_size:
+                self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.data = b""
+        self.schema = "IFC4"
+        self.entity_cache = LRUCache()
+        self.lark_parser = None
+
+        self.index_path = index_path or get_index_path(filepath)
+
+        if not (use_index and self.load_index()):
+            self.build_index(workers=workers)
+            if save_index:
+                self.save_index()
+        self.ifc_schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(self.schema)
+        self.preprocess_schema()
+
+    def build_index(self, workers=1):
+        """Scans the memory mapped file for records and references
+
+        The scan runs over raw bytes so offsets are exact regardless of line
+        endings, and records spanning multiple lines are supported. Results
+        are stored in array backed id_map, id_offset and class_map structures.
+
+        :param workers: If more than one, the data section is split into byte
+            ranges at record boundaries which are indexed in parallel by
+            worker processes and then merged.
+        """
+        match = schema_pattern.search(self.data)
+        if match:
+            self.schema = match.group(1).decode("ascii")
+        match = data_section_pattern.search(self.data)
+        start = match.end() if match else 0
+        end = len(self.data)
+
+        chunks = None
+        # Worker processes map the file from disk, which is not possible for
+        # data decompressed from an archive.
+        if workers > 1 and self.file is not None:
+            boundaries = [start]
+            for i in range(1, workers):
+                match = boundary_pattern.search(self.data, max(boundaries[-1], start + (end - start) * i // workers))
+                if not match:
+                    break
+                boundaries.append(match.start(1))
+            boundaries.append(end)
+            starts, ends = boundaries[:-1], boundaries[1:]
+            with concurrent.futures.ProcessPoolExecutor(max_workers=len(starts)) as executor:
+                chunks = list(executor.map(index_file_range, itertools.repeat(str(self.filepath)), starts, ends))
+            # A boundary inside a string is only detectable after the fact by
+            # an odd number of quotes in the preceding range. Extremely rare,
+            # but fall back to a sequential scan to guarantee correctness.
+            if any(chunk["quotes"] % 2 for chunk in chunks):
+                chunks = None
+        if chunks is None:
+            chunks = [index_records(self.data, start, end)]
+
+        index = merge_indexes(chunks)
+        ids, offsets, classes = index["ids"], index["offsets"], index["classes"]
+        if not index["is_sorted"]:
+            order = sorted(range(len(ids)), key=ids.__getitem__)
+            ids = array.array("q", (ids[i] for i in order))
+            offsets = array.array("q", (offsets[i] for i in order))
+            classes = array.array("I", (classes[i] for i in order))
+
+        class_names = index["class_names"]
+        self.id_map = array_map(ids, classes, class_names)
+        self.id_offset = array_map(ids, offsets)
+        self.class_map = dict(zip(class_names, index["class_ids"]))
+        self.inverses = csr_map.from_pairs(self.id_map, index["references"], index["referencing"])
+
+    def save_index(self, path=None):
+        """Writes the index to a sidecar file
+
+        The file consists of a JSON header followed by the raw bytes of the
+        index arrays. It is written to a temporary file first so that
+        concurrent readers never see a partial index.
+
+        :param path: Defaults to the index_path of the stream
+        """
+        path = path or self.index_path
+        arrays = {
+            "ids": self.id_map.keys_array,
+            "offsets": self.id_offset.values_array,
+            "classes": self.id_map.values_array,
+            "inverse_offsets": self.inverses.offsets,
+            "inverse_values": self.inverses.values,
+        }
+        class_names = self.id_map.labels
+        class_ids = [self.class_map[name] for name in class_names]
+        header = {
+            "version": INDEX_VERSION,
+            "byteorder": sys.byteorder,
+            "fingerprint": get_fingerprint(self.filepath, self.data),
+            "schema": self.schema,
+            "class_names": class_names,
+            "arrays": [[name, getattr(a, "typecode", "q"), len(a)] for name, a in arrays.items()],
+            "class_ids": [len(a) for a in class_ids],
+        }
+        header = json.dumps(header).encode("utf-8")
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(INDEX_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for a in itertools.chain(arrays.values(), class_ids):
+                a.tofile(f)
+        os.replace(temporary_path, path)
+
+    def load_index(self, path=None):
+        """Loads the index from a sidecar file if it is up to date
+
+        An index is considered stale and ignored if it was written by an
+        incompatible version of IfcOpenShell, or if the size, modification time
+        or hashed head and tail of the IFC file have changed.
+
+        :param path: Defaults to the index_path of the stream
+        :returns: True if the index was loaded, False otherwise
+        """
+        path = path or self.index_path
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                    return False
+                header = json.loads(f.read(int.from_bytes(f.read(8), "little")))
+                if header["version"] != INDEX_VERSION:
+                    return False
+                elif header["fingerprint"] != get_fingerprint(self.filepath, self.data):
+                    return False
+                arrays = {}
+                for name, typecode, length in header["arrays"]:
+                    arrays[name] = array.array(typecode)
+                    arrays[name].fromfile(f, length)
+                class_ids = []
+                for length in header["class_ids"]:
+                    class_ids.append(array.array("q"))
+                    class_ids[-1].fromfile(f, length)
+        except (OSError, EOFError, ValueError, KeyError, TypeError):
+            return False
+
+        if header["byteorder"] != sys.byteorder:
+            for a in itertools.chain(arrays.values(), class_ids):
+                a.byteswap()
+
+        self.schema = header["schema"]
+        class_names = header["class_names"]
+        self.id_map = array_map(arrays["ids"], arrays["classes"], class_names)
+        self.id_offset = array_map(arrays["ids"], arrays["offsets"])
+        self.class_map = dict(zip(class_names, class_ids))
+        self.inverses = csr_map(
+            self.id_map,
+            np.frombuffer(arrays["inverse_offsets"], dtype=np.int64),
+            np.frombuffer(arrays["inverse_values"], dtype=np.int64),
+        )
+        return True
+
+    @property
+    def parser(self):
+        """The legacy Lark based record parser
+
+        This is much slower than parse_record and only kept for comparison
+        purposes. It requires the optional lark package.
+        """
+        if self.lark_parser is None:
+            if Lark is None:
+                raise ImportError("The lark package is required for the legacy stream parser")
             transformer = StreamTransformer()
             transformer.file = self
-            self.parser = Lark(grammar, parser="lalr", transformer=transformer)
-    
-            exclude_classes = [
-                "IfcObjectPlacement",
-                "IfcPresentationItem",
-                "IfcPresentationStyle",
-                "IfcProductRepresentation",
-                "IfcRepresentation",
-                "IfcRepresentationItem",
-            ]
-            exclude_classes = []
-    
-            exclude = set()
-    
-            offset = 0
-            for line in self.file:
-                line = line.strip()
-                if line.startswith("#"):
-                    step_id, ifc_class = line.split("(")[0].split("=")
-                    step_id = int(step_id.strip()[1:])
-                    ifc_class = ifc_class.strip()
-    
-                    if ifc_class in exclude:
-                        offset += len(line) + 1  # +1 for the newline character
-                        continue
-    
-                    for reference_id in self.reference_pattern.findall(line[1:]):
-                        self.inverses.setdefault(int(reference_id), []).append(step_id)
-    
-                    self.id_map[step_id] = ifc_class
-                    self.class_map.setdefault(ifc_class, []).append(step_id)
-                    self.id_offset[step_id] = offset
-                elif line.startswith("FILE_SCHEMA"):
-                    self.schema = line.split("'")[1]
-                    self.ifc_schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(self.schema)
-                    for ifc_class in exclude_classes:
-                        declaration = self.ifc_schema.declaration_by_name(ifc_class)
-                        exclude.update([st.name().upper() for st in ifcopenshell.util.schema.get_subtypes(declaration)])
-                offset += len(line) + 1  # +1 for the newline character
-    
-            self.preprocess_schema()
-    
-        def preprocess_schema(self):
-            self.ifc_class_names = {}
-            self.ifc_class_subtypes = {}
-            self.ifc_class_attributes = {}
-            self.ifc_class_inverse_attributes = {}
-            self.ifc_class_references = {}
-            self.ifc_class_inverses = {}
-    
-            for declaration in self.ifc_schema.entities():
-                self.ifc_class_names[declaration.name().upper()] = declaration.name()
-    
-                self.ifc_class_subtypes[declaration.name()] = ifcopenshell.util.schema.get_subtypes(declaration)
-                self.ifc_class_attributes[declaration.name()] = {a.name(): a for a in declaration.all_attributes()}
-                self.ifc_class_inverse_attributes[declaration.name()] = {
-                    a.name(): a for a in declaration.all_inverse_attributes()
-                }
-    
-                entity = []
-                entity_list = []
-                for attribute in declaration.all_attributes():
-                    primitive = ifcopenshell.util.attribute.get_primitive_type(attribute)
-                    if primitive == "entity":
-                        entity.append(attribute.name())
-    
-                        attribute_entity = attribute.type_of_attribute().declared_type()
+            self.lark_parser = Lark(lark_grammar, parser="lalr", transformer=transformer)
+        return self.lark_parser
+
+    def share(self):
+        """Streamed files are pickled by path and reopened using their saved index, so sharing is not needed"""
+
+    def unshare(self):
+        pass
+
+    def __reduce__(self):
+        # Reopening is cheap when the index was saved, as it is reused
+        return stream, (self.filepath, True, False, self.index_path)
+
+    def close(self):
+        """Unmaps the data and closes the file
+
+        Entity instances whose attributes have not yet been parsed can no
+        longer be used once the stream is closed.
+        """
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = b""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.entity_cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def read_record(self, id):
+        """Returns the raw bytes of the record of an entity instance"""
+        offset = self.id_offset[id]
+        return self.data[offset : parse_record(self.data, offset)[3]]
+
+    def parse_attributes(self, id):
+        """Returns a tuple of the parsed attribute values of an entity instance"""
+        return parse_record(self.data, self.id_offset[id], self.by_id, self.create_type)[2]
+
+    def create_type(self, ifc_class, value):
+        entity = ifcopenshell.create_entity(ifc_class, self.schema)
+        entity[0] = value
+        return entity
+
+    def preprocess_schema(self):
+        self.ifc_class_names = {}
+        self.ifc_class_subtypes = {}
+        self.ifc_class_attributes = {}
+        self.ifc_class_inverse_attributes = {}
+        self.ifc_class_references = {}
+        self.ifc_class_inverses = {}
+
+        for declaration in self.ifc_schema.entities():
+            self.ifc_class_names[declaration.name().upper()] = declaration.name()
+
+            self.ifc_class_subtypes[declaration.name()] = ifcopenshell.util.schema.get_subtypes(declaration)
+            self.ifc_class_attributes[declaration.name()] = {a.name(): a for a in declaration.all_attributes()}
+            self.ifc_class_inverse_attributes[declaration.name()] = {
+                a.name(): a for a in declaration.all_inverse_attributes()
+            }
+
+            entity = []
+            entity_list = []
+            for attribute in declaration.all_attributes():
+                primitive = ifcopenshell.util.attribute.get_primitive_type(attribute)
+                if primitive == "entity":
+                    entity.append(attribute.name())
+
+                    attribute_entity = attribute.type_of_attribute().declared_type()
+                    for subtype in ifcopenshell.util.schema.get_subtypes(attribute_entity):
+                        self.ifc_class_inverses.setdefault(subtype.name(), {})
+                        self.ifc_class_inverses[subtype.name()].setdefault(declaration.name(), [])
+                        self.ifc_class_inverses[subtype.name()][declaration.name()].append(attribute.name())
+
+                elif self.is_entity_list(attribute):
+                    entity_list.append(attribute.name())
+
+                    for entity_name in re.findall("<entity (.*?)>", str(attribute)):
+                        attribute_entity = self.ifc_schema.declaration_by_name(entity_name)
                         for subtype in ifcopenshell.util.schema.get_subtypes(attribute_entity):
+                            # self.ifc_class_inverses.setdefault(subtype.name(), set()).add(declaration.name())
                             self.ifc_class_inverses.setdefault(subtype.name(), {})
                             self.ifc_class_inverses[subtype.name()].setdefault(declaration.name(), [])
                             self.ifc_class_inverses[subtype.name()][declaration.name()].append(attribute.name())
-    
-                    elif self.is_entity_list(attribute):
-                        entity_list.append(attribute.name())
-    
-                        for entity_name in re.findall("<entity (.*?)>", str(attribute)):
-                            attribute_entity = self.ifc_schema.declaration_by_name(entity_name)
-                            for subtype in ifcopenshell.util.schema.get_subtypes(attribute_entity):
-                                # self.ifc_class_inverses.setdefault(subtype.name(), set()).add(declaration.name())
-                                self.ifc_class_inverses.setdefault(subtype.name(), {})
-                                self.ifc_class_inverses[subtype.name()].setdefault(declaration.name(), [])
-                                self.ifc_class_inverses[subtype.name()][declaration.name()].append(attribute.name())
-    
-                self.ifc_class_references[declaration.name()] = {"entity": entity, "entity_list": entity_list}
-    
-        def clear_cache(self):
-            self.entity_cache = {}
-    
-        def create_entity(self, type, *args, **kawrgs):
+
+            self.ifc_class_references[declaration.name()] = {"entity": entity, "entity_list": entity_list}
+
+    def clear_cache(self):
+        self.entity_cache.clear()
+
+    def set_cache_size(self, max_items=None, max_bytes=None):
+        """Bounds the number and approximate memory of cached entity instances
+
+        Least recently used instances and their parsed attributes are evicted
+        once either limit is exceeded. Both default to None, meaning unbounded.
+        Use entity_cache.get_stats() to see hit rates when tuning the limits.
+
+        :param max_items: The maximum number of cached entity instances
+        :type max_items: int
+        :param max_bytes: The approximate maximum memory used in bytes
+        :type max_bytes: int
+        """
+        self.entity_cache.max_items = max_items
+        self.entity_cache.max_bytes = max_bytes
+        self.entity_cache.evict()
+
+    def create_entity(self, type, *args, **kawrgs):
+        assert False
+
+    def by_id(self, id):
+        entity = self.entity_cache.get(id, None)
+        if entity is not None:
+            return entity
+        ifc_class = self.id_map.get(id, None)
+        if ifc_class:
+            entity = stream_entity(id, self.ifc_class_names[ifc_class], self)
+            self.entity_cache.set(id, entity)
+            return entity
+
+    def by_type(self, type, include_subtypes=True):
+        return list(self.by_type_iter(type, include_subtypes))
+
+    def by_type_iter(self, type, include_subtypes=True):
+        subtypes = self.ifc_class_subtypes[type] if include_subtypes else self.ifc_class_subtypes[type][0:1]
+        for subtype in subtypes:
+            for i in self.class_map.get(subtype.name().upper(), ()):
+                yield self.by_id(i)
+
+    def by_type_ids(self, type, include_subtypes=True):
+        subtypes = self.ifc_class_subtypes[type] if include_subtypes else self.ifc_class_subtypes[type][0:1]
+        ids = [self.class_map.get(subtype.name().upper()) for subtype in subtypes]
+        ids = [np.frombuffer(i, dtype=np.int64) for i in ids if i]
+        if not ids:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(ids)
+
+    def traverse(self, inst, max_levels=None, breadth_first=False):
+        return list(self.iter_traverse(inst, max_levels=max_levels, breadth_first=breadth_first))
+
+    def get_direct_references(self, inst):
+        # References are collected while parsing the raw record. Other values
+        # are still decoded, as a #123 in a string is not a reference, but no
+        # entity instances are created for the record or cached.
+        reference_ids = []
+        parse_record(self.data, self.id_offset[inst.stream_wrapper.id], reference_ids.append)
+        references = (self.by_id(i) for i in dict.fromkeys(reference_ids))
+        return [r for r in references if r is not None]
+
+    def get_inverse(self, inst, allow_duplicate=False, with_attribute_indices=False):
+        inverses = [self.by_id(e) for e in self.inverses.get(inst.stream_wrapper.id, [])]
+        if allow_duplicate:
+            return inverses
+        return set(inverses)
+
+    def get_total_inverses(self, inst):
+        return self.inverses.count(inst.stream_wrapper.id)
+
+    def get_inverse_many(self, elements, allow_duplicate=False):
+        container = list if allow_duplicate else set
+        results = {}
+        for element in elements:
+            element_id = element.id() if isinstance(element, entity_instance) else int(element)
+            results[element] = container(self.by_id(e) for e in self.inverses.get(element_id, ()))
+        return results
+
+    def get_total_inverses_many(self, elements):
+        ids = [e.id() if isinstance(e, entity_instance) else int(e) for e in elements]
+        return self.inverses.count_many(ids)
+
+    def is_entity_list(self, attribute):
+        attribute = str(attribute.type_of_attribute())
+        if (attribute.startswith("<list") or attribute.startswith("<set")) and "<entity" in attribute:
+            for data_type in re.findall("<(.*?) .*?>", attribute):
+                if data_type not in ("list", "set", "select", "entity"):
+                    return False
+            return True
+        return False
+
+
+class stream_entity(entity_instance):
+    def __init__(self, id, ifc_class, file=None):
+        if not ifc_class:
+            print(id, ifc_class, file)
             assert False
-    
-        def by_id(self, id):
-            entity = self.entity_cache.get(id, None)
-            if entity:
-                return entity
-            ifc_class = self.id_map.get(id, None)
-            if ifc_class:
-                entity = stream_entity(id, self.ifc_class_names[ifc_class], self)
-                self.entity_cache[id] = entity
-                return entity
-    
-        def by_type(self, type, include_subtypes=True):
-            results = []
-            subtypes = self.ifc_class_subtypes[type] if include_subtypes else self.ifc_class_subtypes[type][0:1]
-            for subtype in subtypes:
-                results.extend([self.by_id(i) for i in self.class_map.get(subtype.name().upper(), [])])
-            return results
-    
-        def traverse(self, inst, max_levels=None, breadth_first=False):
-            results = [inst]
-            queue = [inst]
-            while queue:
-                if max_levels is not None:
-                    max_levels -= 1
-    
-                cur = queue.pop()
-                level_results = set()
-    
-                for reference_id in self.reference_pattern.findall(str(cur)[1:]):
-                    result = self.by_id(int(reference_id))
-                    results.append(result)
-                    if max_levels is None or max_levels:
-                        queue.append(result)
-    
-            return results
-    
-        def get_inverse(self, inst, allow_duplicate=False, with_attribute_indices=False):
-            return {self.by_id(e) for e in self.inverses.get(inst.stream_wrapper.id, [])}
-    
-        def is_entity_list(self, attribute):
-            attribute = str(attribute.type_of_attribute())
-            if (attribute.startswith("<list") or attribute.startswith("<set")) and "<entity" in attribute:
-                for data_type in re.findall("<(.*?) .*?>", attribute):
-                    if data_type not in ("list", "set", "select", "entity"):
-                        return False
-                return True
-            return False
-    
-    
-    class stream_entity(entity_instance):
-        def __init__(self, id, ifc_class, file=None):
-            if not ifc_class:
-                print(id, ifc_class, file)
-                assert False
-            e = ifcopenshell_wrapper.new_IfcBaseClass(file.schema, ifc_class)
-            s = stream_wrapper(id, ifc_class, file)
-            super(entity_instance, self).__setattr__("wrapped_data", e)
-            super(entity_instance, self).__setattr__("stream_wrapper", s)
-    
-        def id(self):
-            return self.stream_wrapper.id
-    
-        def __repr__(self):
-            offset = self.stream_wrapper.file.id_offset[self.stream_wrapper.id]
-            self.stream_wrapper.file.file.seek(offset)
-            return self.stream_wrapper.file.file.readline().strip()
-    
-        def __del__(self):
-            pass
-    
-        def __getitem__(self, key):
-            return self.__getattr__(list(self.stream_wrapper.attributes.keys())[key])
-    
-        def __setattr__(self, key, value):
-            query = f"UPDATE `{self.stream_wrapper.ifc_class}` SET `{key}` = ? WHERE ifc_id = {self.stream_wrapper.id}"
-            self.stream_wrapper.file.cursor.execute(query, (value,))
-            self.stream_wrapper.file.db.commit()
-            self.stream_wrapper.attribute_cache = {}
-    
-        def __getattr__(self, name):
-            INVALID, FORWARD, INVERSE = range(3)
-            attr_cat = self.wrapped_data.get_attribute_category(name)
-            if attr_cat == FORWARD:
-                if self.stream_wrapper.attribute_cache:
-                    return self.stream_wrapper.attribute_cache[name]
-    
-                offset = self.stream_wrapper.file.id_offset[self.stream_wrapper.id]
-                self.stream_wrapper.file.file.seek(offset)
-                line = self.stream_wrapper.file.file.readline()
-                attributes = self.stream_wrapper.file.parser.parse(line.strip())[2]
-    
-                for i, attribute in enumerate(self.stream_wrapper.attributes.values()):
-                    self.stream_wrapper.attribute_cache[attribute.name()] = attributes[i]
+        e = ifcopenshell_wrapper.new_IfcBaseClass(file.schema, ifc_class)
+        s = stream_wrapper(id, ifc_class, file)
+        super(entity_instance, self).__setattr__("wrapped_data", e)
+        super(entity_instance, self).__setattr__("stream_wrapper", s)
+
+    def id(self):
+        return self.stream_wrapper.id
+
+    def __repr__(self):
+        return decode_bytes(self.stream_wrapper.file.read_record(self.stream_wrapper.id).strip())
+
+    def __del__(self):
+        pass
+
+    def __getitem__(self, key):
+        return self.__getattr__(list(self.stream_wrapper.attributes.keys())[key])
+
+    def __setattr__(self, key, value):
+        query = f"UPDATE `{self.stream_wrapper.ifc_class}` SET `{key}` = ? WHERE ifc_id = {self.stream_wrapper.id}"
+        self.stream_wrapper.file.cursor.execute(query, (value,))
+        self.stream_wrapper.file.db.commit()
+        self.stream_wrapper.attribute_cache = {}
+
+    def __getattr__(self, name):
+        INVALID, FORWARD, INVERSE = range(3)
+        attr_cat = self.wrapped_data.get_attribute_category(name)
+        if attr_cat == FORWARD:
+            if self.stream_wrapper.attribute_cache:
                 return self.stream_wrapper.attribute_cache[name]
-            elif attr_cat == INVERSE:
-                if self.stream_wrapper.inverse_attribute_cache:
-                    results = self.stream_wrapper.inverse_attribute_cache.get(name, None)
-                    if results is not None:
-                        return results
-    
-                results = []
-    
-                element_ids = self.stream_wrapper.file.inverses.get(self.stream_wrapper.id, [])
-                if not element_ids:
-                    self.stream_wrapper.inverse_attribute_cache[name] = tuple()
-                    return self.stream_wrapper.inverse_attribute_cache[name]
-    
-                attribute = self.stream_wrapper.inverse_attributes[name]
-                entity_class = attribute.entity_reference().name()
-                declaration = self.stream_wrapper.file.ifc_schema.declaration_by_name(entity_class)
-                forward_name = attribute.attribute_reference().name()
-    
-                subtypes = [st.name() for st in ifcopenshell.util.schema.get_subtypes(declaration)]
-                for element_id in element_ids:
-                    ifc_class = self.stream_wrapper.file.ifc_class_names[self.stream_wrapper.file.id_map[element_id]]
-                    if ifc_class in subtypes:
-                        potential_result = self.stream_wrapper.file.by_id(element_id)
-                        forward_value = getattr(potential_result, forward_name, None)
-                        if not forward_value:
-                            pass
-                        elif isinstance(forward_value, tuple):
-                            if self.stream_wrapper.id in [e.id() for e in forward_value]:
-                                results.append(potential_result)
-                        elif forward_value.id() == self.stream_wrapper.id:
-                            results.append(potential_result)
-    
-                self.stream_wrapper.inverse_attribute_cache[name] = tuple(results)
-                return self.stream_wrapper.inverse_attribute_cache[name]
-    
-            raise AttributeError(
-                "entity instance of type '%s' has no attribute '%s'" % (self.wrapped_data.is_a(True), name)
+
+            attributes = self.stream_wrapper.file.parse_attributes(self.stream_wrapper.id)
+
+            for i, attribute in enumerate(self.stream_wrapper.attributes.values()):
+                self.stream_wrapper.attribute_cache[attribute.name()] = attributes[i]
+            self.stream_wrapper.file.entity_cache.resize(
+                self.stream_wrapper.id, LRUCache.ENTITY_SIZE + LRUCache.estimate_size(attributes)
             )
-    
-        def __eq__(self, other):
-            if not isinstance(self, type(other)):
-                return False
-            elif None in (self.stream_wrapper.file, other.stream_wrapper.file):
-                assert False  # not implemented
-            if self.stream_wrapper.id:
-                return self.stream_wrapper.id == other.stream_wrapper.id
+            return self.stream_wrapper.attribute_cache[name]
+        elif attr_cat == INVERSE:
+            if self.stream_wrapper.inverse_attribute_cache:
+                results = self.stream_wrapper.inverse_attribute_cache.get(name, None)
+                if results is not None:
+                    return results
+
+            results = []
+
+            element_ids = self.stream_wrapper.file.inverses.get(self.stream_wrapper.id, [])
+            if not element_ids:
+                self.stream_wrapper.inverse_attribute_cache[name] = tuple()
+                return self.stream_wrapper.inverse_attribute_cache[name]
+
+            attribute = self.stream_wrapper.inverse_attributes[name]
+            entity_class = attribute.entity_reference().name()
+            declaration = self.stream_wrapper.file.ifc_schema.declaration_by_name(entity_class)
+            forward_name = attribute.attribute_reference().name()
+
+            subtypes = [st.name() for st in ifcopenshell.util.schema.get_subtypes(declaration)]
+            for element_id in element_ids:
+                ifc_class = self.stream_wrapper.file.ifc_class_names[self.stream_wrapper.file.id_map[element_id]]
+                if ifc_class in subtypes:
+                    potential_result = self.stream_wrapper.file.by_id(element_id)
+                    forward_value = getattr(potential_result, forward_name, None)
+                    if not forward_value:
+                        pass
+                    elif isinstance(forward_value, tuple):
+                        if self.stream_wrapper.id in [e.id() for e in forward_value]:
+                            results.append(potential_result)
+                    elif forward_value.id() == self.stream_wrapper.id:
+                        results.append(potential_result)
+
+            self.stream_wrapper.inverse_attribute_cache[name] = tuple(results)
+            return self.stream_wrapper.inverse_attribute_cache[name]
+
+        raise AttributeError(
+            "entity instance of type '%s' has no attribute '%s'" % (self.wrapped_data.is_a(True), name)
+        )
+
+    def __eq__(self, other):
+        if not isinstance(self, type(other)):
+            return False
+        elif None in (self.stream_wrapper.file, other.stream_wrapper.file):
             assert False  # not implemented
-    
-        def __hash__(self):
-            if self.stream_wrapper.id:
-                return hash((self.stream_wrapper.id, self.stream_wrapper.file.filepath))
-    
-        def get_info(self, include_identifier=True, recursive=False, return_type=dict, ignore=(), scalar_only=False):
-            info = {"id": self.stream_wrapper.id, "type": self.stream_wrapper.ifc_class}
-            if not self.stream_wrapper.attribute_cache:
-                self.__getitem__(0)  # This will get all attributes
-            info.update(self.stream_wrapper.attribute_cache)
-            return info
-    
-    
-    class stream_wrapper:
-        def __init__(self, id, ifc_class, file):
-            self.id = id
-            self.ifc_class = ifc_class
-            self.file = file
-            self.attributes = self.file.ifc_class_attributes[self.ifc_class]
-            self.inverse_attributes = self.file.ifc_class_inverse_attributes[self.ifc_class]
-            self.attribute_cache = {}
-            self.inverse_attribute_cache = {}
-    
-        def __repr__(self):
-            return "todo"
+        if self.stream_wrapper.id:
+            return self.stream_wrapper.id == other.stream_wrapper.id
+        assert False  # not implemented
 
-except ImportError as e:
-    import sys
-    print(f"No stream support: {e}", file=sys.stderr)
+    def __hash__(self):
+        if self.stream_wrapper.id:
+            return hash((self.stream_wrapper.id, self.stream_wrapper.file.filepath))
+
+    def get_info(self, include_identifier=True, recursive=False, return_type=dict, ignore=(), scalar_only=False):
+        info = {"id": self.stream_wrapper.id, "type": self.stream_wrapper.ifc_class}
+        if not self.stream_wrapper.attribute_cache:
+            self.__getitem__(0)  # This will get all attributes
+        info.update(self.stream_wrapper.attribute_cache)
+        return info
+
+
+class stream_wrapper:
+    def __init__(self, id, ifc_class, file):
+        self.id = id
+        self.ifc_class = ifc_class
+        self.file = file
+        self.attributes = self.file.ifc_class_attributes[self.ifc_class]
+        self.inverse_attributes = self.file.ifc_class_inverse_attributes[self.ifc_class]
+        self.attribute_cache = {}
+        self.inverse_attribute_cache = {}
+
+    def __repr__(self):
+        return "todo"
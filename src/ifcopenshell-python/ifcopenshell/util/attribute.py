@@ -44,6 +44,8 @@ def get_primitive_type(attribute_or_data_type):
         return "boolean"
     elif "<enumeration" in data_type:
         return "enum"
+    elif "<binary>" in data_type:
+        return "binary"
 
 
 def get_enum_items(attribute):
@@ -861,14 +861,15 @@ def remove_deep2(ifc_file, element, also_consider=[], do_not_delete=[]):
     subgraph = list(ifc_file.traverse(element, breadth_first=True))
     subgraph.extend(also_consider)
     subgraph_set = set(subgraph)
+    # The inverses of each level of subelements are fetched in a single call
     subelement_queue = ifc_file.traverse(element, max_levels=1)
     while subelement_queue:
-        subelement = subelement_queue.pop(0)
-        if (
-            subelement.id()
-            and subelement not in do_not_delete
-            and len(set(ifc_file.get_inverse(subelement)) - subgraph_set) == 0
-        ):
+        subelements = [e for e in subelement_queue if e.id() and e not in do_not_delete]
+        inverses = ifc_file.get_inverse_many(subelements)
+        subelement_queue = []
+        for subelement in subelements:
+            if inverses[subelement] - subgraph_set:
+                continue
             to_delete.add(subelement)
             subelement_queue.extend(ifc_file.traverse(subelement, max_levels=1)[1:])
             # See #3052. IfcOpenShell is extremely slow in removing elements if
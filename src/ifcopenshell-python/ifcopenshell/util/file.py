@@ -16,8 +16,18 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with IfcOpenShell.  If not, see <http://www.gnu.org/licenses/>.
 
+import zipfile
 from pathlib import Path
 
+ZIP_CHUNK_SIZE = 1 << 24
+# Parsing SPF data from memory requires a copy of it, so archive members
+# larger than this are decompressed into a memory map backed by a temporary
+# file by default when opened, rather than into anonymous memory.
+ZIP_MEMORY_LIMIT = 1 << 28
+# The native parser can't read SPF data larger than this from memory, so
+# larger archive members are extracted to a temporary file when opened.
+SPF_BUFFER_LIMIT = (1 << 31) - 1
+
 
 def guess_format(path: Path) -> "str | None":
     """Try to guess format using file extension"""
@@ -27,3 +37,67 @@ def guess_format(path: Path) -> "str | None":
         return ".ifcXML"
     elif path.suffix.lower() in (".ifcsqlite", ".sqlite", ".db"):
         return ".ifcSQLite"
+
+
+def get_zip_member(zip_file: zipfile.ZipFile, suffixes=(".ifc", ".ifcxml")) -> zipfile.ZipInfo:
+    """Find the first IFC dataset stored in a zip archive
+
+    :param zip_file: The opened archive
+    :param suffixes: Lowercase file extensions of the members to look for
+    :returns: The archive member
+    :raises LookupError: If no member has a matching extension
+    """
+    for info in zip_file.infolist():
+        if Path(info.filename).suffix.lower() in suffixes:
+            return info
+    raise LookupError(f"No {' or '.join(suffixes)} file found in {zip_file.filename}")
+
+
+def read_zip_member(zip_file: zipfile.ZipFile, info: zipfile.ZipInfo, buffer=None):
+    """Decompress a zip archive member into memory without extracting to disk
+
+    The member is decompressed in chunks directly into a buffer of its
+    uncompressed size, so no intermediate copies are made.
+
+    :param zip_file: The opened archive
+    :param info: The archive member to read
+    :param buffer: A writable buffer of at least info.file_size bytes, such
+        as an anonymous mmap. A bytearray is allocated if None.
+    :returns: The buffer holding the uncompressed data
+    """
+    if buffer is None:
+        buffer = bytearray(info.file_size)
+    offset = 0
+    with memoryview(buffer) as view, zip_file.open(info) as f:
+        while offset < info.file_size:
+            read = f.readinto(view[offset : offset + ZIP_CHUNK_SIZE])
+            if not read:
+                break
+            offset += read
+    if offset != info.file_size:
+        raise zipfile.BadZipFile(f"Unexpected end of data in {info.filename}")
+    return buffer
+
+
+def map_zip_member(zip_file: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """Decompress a zip archive member into a memory map backed by a temporary file
+
+    Unlike anonymous memory, the pages of the map can be written out and
+    dropped by the operating system while the data is being copied or parsed,
+    so the uncompressed data doesn't need to fit in memory. The temporary file
+    has no name and is deleted once the map is closed.
+
+    :param zip_file: The opened archive
+    :param info: The archive member to read
+    :returns: An mmap holding the uncompressed data, or an empty bytearray if
+        the member is empty, as empty data can't be memory mapped.
+    """
+    import mmap
+    import tempfile
+
+    if not info.file_size:
+        return bytearray()
+    with tempfile.TemporaryFile() as f:
+        f.truncate(info.file_size)
+        buffer = mmap.mmap(f.fileno(), info.file_size)
+    return read_zip_member(zip_file, info, buffer)
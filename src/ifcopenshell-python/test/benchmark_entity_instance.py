@@ -0,0 +1,59 @@
+# IfcOpenShell - IFC toolkit and geometry engine
+# Copyright (C) 2021 Thomas Krijnen <thomas@aecgeeks.com>
+#
+# This file is part of IfcOpenShell.
+#
+# IfcOpenShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# IfcOpenShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with IfcOpenShell.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmarks for attribute access on entity instances
+
+Measures the rate of accessing a forward attribute (wall.Name), an inverse
+attribute (wall.IsDefinedBy) and an entity reference (rel.RelatingStructure).
+
+Usage: python benchmark_entity_instance.py [iterations]
+"""
+
+import sys
+import time
+import ifcopenshell
+import ifcopenshell.guid
+
+
+def create_model():
+    model = ifcopenshell.file(schema="IFC4")
+    storey = model.createIfcBuildingStorey(ifcopenshell.guid.new())
+    wall = model.createIfcWall(ifcopenshell.guid.new(), Name="Wall")
+    pset = model.createIfcPropertySet(ifcopenshell.guid.new(), Name="Pset_WallCommon")
+    model.createIfcRelDefinesByProperties(ifcopenshell.guid.new(), RelatedObjects=[wall], RelatingPropertyDefinition=pset)
+    rel = model.createIfcRelContainedInSpatialStructure(
+        ifcopenshell.guid.new(), RelatedElements=[wall], RelatingStructure=storey
+    )
+    return wall, rel
+
+
+def benchmark(label, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    print(f"{label}: {iterations / (time.perf_counter() - start):,.0f} accesses/s")
+
+
+def main(iterations=100000):
+    wall, rel = create_model()
+    benchmark("wall.Name", lambda: wall.Name, iterations)
+    benchmark("wall.IsDefinedBy", lambda: wall.IsDefinedBy, iterations)
+    benchmark("rel.RelatingStructure", lambda: rel.RelatingStructure, iterations)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,47 @@
+# IfcOpenShell - IFC toolkit and geometry engine
+# Copyright (C) 2021 Thomas Krijnen <thomas@aecgeeks.com>
+#
+# This file is part of IfcOpenShell.
+#
+# IfcOpenShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# IfcOpenShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with IfcOpenShell.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmarks the vectorised GlobalId functions against their scalar equivalents
+
+Usage: python benchmark_guid.py [number of GlobalIds]
+"""
+
+import sys
+import time
+import ifcopenshell.guid
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label}: {time.perf_counter() - start:.3f}s")
+    return result
+
+
+def main(n):
+    print(f"{n:,} GlobalIds")
+    global_ids = timed("new", lambda: [ifcopenshell.guid.new() for i in range(n)])
+    timed("new_many", lambda: ifcopenshell.guid.new_many(n))
+    guids = timed("expand", lambda: [ifcopenshell.guid.expand(g) for g in global_ids])
+    timed("expand_many", lambda: ifcopenshell.guid.expand_many(global_ids))
+    timed("compress", lambda: [ifcopenshell.guid.compress(g) for g in guids])
+    timed("compress_many", lambda: ifcopenshell.guid.compress_many(guids))
+    timed("is_valid_many", lambda: ifcopenshell.guid.is_valid_many(global_ids))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,52 @@
+# IfcOpenShell - IFC toolkit and geometry engine
+# Copyright (C) 2021 Thomas Krijnen <thomas@aecgeeks.com>
+#
+# This file is part of IfcOpenShell.
+#
+# IfcOpenShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# IfcOpenShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with IfcOpenShell.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmarks attribute access on the sqlite backend with and without prefetching
+
+Reads one attribute of every instance of a class, either querying each row
+when it is first accessed, or prefetching the rows for the whole class.
+
+Usage: python benchmark_sql.py /path/to/model.sqlite [IfcClass] [Attribute]
+
+The database can be created from an IFC-SPF model using the Ifc2Sql recipe.
+"""
+
+import sys
+import time
+import ifcopenshell.sql
+
+
+def run(label, ifc, ifc_class, attribute, prefetch):
+    ifc.clear_cache()
+    queries = []
+    ifc.db.set_trace_callback(queries.append)
+    start = time.perf_counter()
+    values = [getattr(e, attribute) for e in ifc.by_type(ifc_class, prefetch=prefetch)]
+    duration = time.perf_counter() - start
+    ifc.db.set_trace_callback(None)
+    print(f"{label}: {len(values):,} values, {len(queries):,} queries, {duration:.3f}s")
+
+
+def main(path, ifc_class="IfcProduct", attribute="Name"):
+    ifc = ifcopenshell.sql.sqlite(path)
+    run("per entity", ifc, ifc_class, attribute, None)
+    run(f"prefetch {attribute}", ifc, ifc_class, attribute, [attribute])
+    run("prefetch all attributes", ifc, ifc_class, attribute, True)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
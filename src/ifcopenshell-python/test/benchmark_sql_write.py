@@ -0,0 +1,69 @@
+# IfcOpenShell - IFC toolkit and geometry engine
+# Copyright (C) 2021 Thomas Krijnen <thomas@aecgeeks.com>
+#
+# This file is part of IfcOpenShell.
+#
+# IfcOpenShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# IfcOpenShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with IfcOpenShell.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmarks editing and exporting a model using the sqlite backend
+
+Sets the Description of every instance of a class, committing each write
+separately and then batching writes, and finally exports the model to
+IFC-SPF. A copy of the database is edited, so the original is unchanged.
+
+Usage: python benchmark_sql_write.py /path/to/model.sqlite [IfcClass] [limit]
+
+The database can be created from an IFC-SPF model using the Ifc2Sql recipe.
+Committing each write separately is slow, so only the first limit instances
+are edited without batching, which defaults to 1000.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import ifcopenshell.sql
+
+
+def run(label, ifc, elements, batch):
+    start = time.perf_counter()
+    if batch:
+        ifc.batch()
+    for element in elements:
+        element.Description = label
+    if batch:
+        ifc.unbatch()
+    duration = time.perf_counter() - start
+    print(f"{label}: {len(elements):,} writes, {duration:.3f}s, {len(elements) / duration:,.0f} writes/s")
+
+
+def main(path, ifc_class="IfcProduct", limit=1000):
+    with tempfile.TemporaryDirectory() as directory:
+        copy = os.path.join(directory, "model.sqlite")
+        shutil.copyfile(path, copy)
+        ifc = ifcopenshell.sql.sqlite(copy)
+        elements = ifc.by_type(ifc_class)
+        run("unbatched", ifc, elements[: int(limit)], False)
+        run("batched", ifc, elements, True)
+
+        output = os.path.join(directory, "model.ifc")
+        start = time.perf_counter()
+        ifc.write(output)
+        duration = time.perf_counter() - start
+        print(f"export: {os.path.getsize(output):,} bytes, {duration:.3f}s")
+        ifc.close()
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,75 @@
+# IfcOpenShell - IFC toolkit and geometry engine
+# Copyright (C) 2021 Thomas Krijnen <thomas@aecgeeks.com>
+#
+# This file is part of IfcOpenShell.
+#
+# IfcOpenShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# IfcOpenShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with IfcOpenShell.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks for the ifcopenshell.stream backend
+
+Usage: python benchmark_stream.py /path/to/model.ifc [max_records]
+"""
+
+import sys
+import time
+import tracemalloc
+from ifcopenshell.stream import stream, parse_record
+
+
+def benchmark_parse_record(ifc, ids):
+    start = time.perf_counter()
+    for step_id in ids:
+        parse_record(ifc.read_record(step_id), 0, ifc.by_id, ifc.create_type)
+    return len(ids) / (time.perf_counter() - start)
+
+
+def benchmark_lark(ifc, ids):
+    parser = ifc.parser
+    start = time.perf_counter()
+    for step_id in ids:
+        parser.parse(ifc.read_record(step_id).decode("utf-8").strip())
+    return len(ids) / (time.perf_counter() - start)
+
+
+def benchmark_inverse_memory(ifc):
+    csr_size = ifc.inverses.offsets.nbytes + ifc.inverses.values.nbytes
+    tracemalloc.start()
+    inverses = {}
+    for step_id in ifc.id_map.keys():
+        referencing = ifc.inverses.get(step_id)
+        if referencing:
+            inverses[step_id] = referencing
+    dict_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return csr_size, dict_size
+
+
+def main(path, max_records=100000):
+    start = time.perf_counter()
+    ifc = stream(path)
+    print(f"Indexed {len(ifc.id_map)} records in {time.perf_counter() - start:.2f}s")
+    csr_size, dict_size = benchmark_inverse_memory(ifc)
+    print(f"Inverses: {csr_size / 1e6:,.1f}MB as CSR arrays, {dict_size / 1e6:,.1f}MB as a dict of lists")
+    ids = list(ifc.id_offset.keys())[:max_records]
+    print(f"Parsing {len(ids)} records from {path}")
+    print(f"parse_record: {benchmark_parse_record(ifc, ids):,.0f} records/s")
+    ifc.clear_cache()
+    try:
+        print(f"lark: {benchmark_lark(ifc, ids):,.0f} records/s")
+    except ImportError as e:
+        print(f"lark: skipped ({e})")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], *map(int, sys.argv[2:3]))
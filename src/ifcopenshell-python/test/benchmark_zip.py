@@ -0,0 +1,79 @@
+# IfcOpenShell - IFC toolkit and geometry engine
+# Copyright (C) 2021 Thomas Krijnen <thomas@aecgeeks.com>
+#
+# This file is part of IfcOpenShell.
+#
+# IfcOpenShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# IfcOpenShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with IfcOpenShell.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmarks for reading and writing .ifcZIP archives
+
+Compares decompressing in memory to the previous approach of extracting the
+archive member to a temporary directory, for both the native parser and the
+stream backend, and writing zipped models with and without an unzipped copy.
+The native parser is timed both decompressing into anonymous memory and, as
+for members above the zip_memory_limit of ifcopenshell.open(), into a memory
+map backed by a temporary file.
+
+Usage: python benchmark_zip.py /path/to/model.ifcZIP
+"""
+
+import os
+import sys
+import time
+import zipfile
+import tempfile
+from pathlib import Path
+import ifcopenshell
+import ifcopenshell.util.file
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label}: {time.perf_counter() - start:.2f}s")
+    return result
+
+
+def open_extracted(path, should_stream=False):
+    with tempfile.TemporaryDirectory() as unzipped_path:
+        with zipfile.ZipFile(path) as zf:
+            info = ifcopenshell.util.file.get_zip_member(zf)
+            return ifcopenshell.open(zf.extract(info, unzipped_path), should_stream=should_stream)
+
+
+def write_extracted(model, path):
+    unzipped_path = path.with_suffix(".ifc")
+    model.write(unzipped_path)
+    with zipfile.ZipFile(path, "w") as zip_file:
+        zip_file.write(unzipped_path, unzipped_path.name, compress_type=zipfile.ZIP_DEFLATED)
+    unzipped_path.unlink()
+
+
+def main(path):
+    with zipfile.ZipFile(path) as zf:
+        info = ifcopenshell.util.file.get_zip_member(zf)
+    print(f"{path}: {os.path.getsize(path) / 1e6:,.1f}MB compressed, {info.file_size / 1e6:,.1f}MB uncompressed")
+
+    timed("open, extracted to disk", lambda: open_extracted(path))
+    model = timed("open, in memory", lambda: ifcopenshell.open(path, zip_memory_limit=info.file_size))
+    timed("open, file backed memory map", lambda: ifcopenshell.open(path, zip_memory_limit=0))
+    timed("stream, extracted to disk", lambda: open_extracted(path, should_stream=True))
+    timed("stream, in memory", lambda: ifcopenshell.open(path, should_stream=True))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        timed("write, via unzipped copy", lambda: write_extracted(model, Path(temp_dir) / "a.ifcZIP"))
+        timed("write, streamed into the archive", lambda: model.write(Path(temp_dir) / "b.ifcZIP"))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
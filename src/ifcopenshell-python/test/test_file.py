@@ -16,11 +16,40 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with IfcOpenShell.  If not, see <http://www.gnu.org/licenses/>.
 
+import gc
+import sys
+import pickle
 import pytest
+import weakref
+import multiprocessing
 import test.bootstrap
 import ifcopenshell
 import ifcopenshell.api
 import ifcopenshell.util.element
+from ifcopenshell.file import TypedValue
+
+
+def get_name(model, element_id):
+    return model.by_id(element_id).Name
+
+
+def get_name_and_model_id(model, element_id):
+    return model.by_id(element_id).Name, id(model)
+
+
+def get_footprint(value, seen=None):
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(get_footprint(v, seen) for v in value)
+    elif isinstance(value, dict):
+        size += sum(get_footprint(k, seen) + get_footprint(v, seen) for k, v in value.items())
+    elif isinstance(value, TypedValue):
+        size += get_footprint(value.type, seen) + get_footprint(value.value, seen)
+    return size
 
 
 class TestTransaction(test.bootstrap.IFC4):
@@ -88,6 +117,26 @@ class TestTransaction(test.bootstrap.IFC4):
         self.file.redo()
         assert rel.RelatingObject is None
 
+    def test_that_you_can_undo_and_redo_batched_deletion_of_many_elements_with_shared_inverses(self):
+        elements = [self.file.createIfcWall(GlobalId=f"id{i}") for i in range(3)]
+        rel = self.file.createIfcRelAggregates(RelatingObject=elements[0], RelatedObjects=elements)
+        elements[1].ObjectPlacement = self.file.createIfcLocalPlacement()
+        self.file.begin_transaction()
+        self.file.batch()
+        for element in elements:
+            self.file.remove(element)
+        self.file.unbatch()
+        self.file.end_transaction()
+        transaction = self.file.history[0]
+        assert len([o for o in transaction.operations if o[0] == transaction.BATCH_DELETE]) == 1
+        self.file.undo()
+        assert rel.RelatingObject == self.file.by_id(1)
+        assert rel.RelatedObjects == tuple(self.file.by_id(i) for i in (1, 2, 3))
+        assert self.file.by_id(2).ObjectPlacement.is_a("IfcLocalPlacement")
+        self.file.redo()
+        assert rel.RelatingObject is None
+        assert not rel.RelatedObjects
+
     def test_that_you_can_undo_and_redo_deletion_with_aggregated_inverse_relationships(self):
         element = self.file.createIfcWall(GlobalId="id")
         rel = self.file.createIfcRelAggregates()
@@ -119,6 +168,70 @@ class TestTransaction(test.bootstrap.IFC4):
         self.file.set_history_size(1)
         assert len(self.file.history) == 1
 
+    def test_setting_the_history_size_in_bytes(self):
+        self.file.set_history_size(64, max_bytes=1)
+        self.file.begin_transaction()
+        self.file.createIfcWall()
+        self.file.end_transaction()
+        self.file.begin_transaction()
+        self.file.createIfcWall()
+        self.file.end_transaction()
+        assert len(self.file.history) == 1
+        self.file.undo()
+        assert len(list(self.file)) == 1
+
+    def test_estimating_the_size_of_a_transaction(self):
+        self.file.begin_transaction()
+        self.file.createIfcWall(GlobalId="id", Name="name", Description="description")
+        self.file.end_transaction()
+        transaction = self.file.history[0]
+        operation = transaction.operations[0]
+        values = sum(sys.getsizeof(v) for v in ("id", "name", "description"))
+        # The nested entity and attribute tuples are counted, not just the operation
+        assert transaction.size > sys.getsizeof(operation) + sys.getsizeof(operation[1]) + values
+
+    def test_estimating_the_size_of_an_edit_heavy_transaction(self):
+        storeys = [self.file.createIfcBuildingStorey() for i in range(500)]
+        points = [self.file.createIfcCartesianPoint((0.0, 0.0, 0.0)) for i in range(500)]
+        self.file.begin_transaction()
+        for i, (storey, point) in enumerate(zip(storeys, points)):
+            storey.Name = f"Storey {i}"
+            storey.Elevation = i * 3.5
+            storey.Elevation = i * 3.0
+            point.Coordinates = (float(i), i + 0.5, 1.0)
+        self.file.end_transaction()
+        transaction = self.file.history[0]
+        assert not transaction.values and not transaction.edits
+        footprint = get_footprint(transaction.operations)
+        # Shared small ints and floats may be counted more than once, but nothing is missed
+        assert footprint <= transaction.size <= footprint * 1.5
+
+    def test_that_repeated_edits_are_stored_once(self):
+        element = self.file.createIfcWall(Name="foo")
+        self.file.begin_transaction()
+        element.Name = "bar"
+        element.Name = "baz"
+        self.file.end_transaction()
+        assert len(self.file.history[0].operations) == 1
+        self.file.undo()
+        assert element.Name == "foo"
+        self.file.redo()
+        assert element.Name == "baz"
+
+    def test_that_you_can_undo_and_redo_a_transaction_spilled_to_disk(self):
+        element = self.file.createIfcWall(GlobalId="id")
+        rel = self.file.createIfcRelAggregates()
+        rel.RelatedObjects = [element]
+        self.file.set_history_size(64, spill_bytes=0)
+        self.file.begin_transaction()
+        self.file.remove(element)
+        self.file.end_transaction()
+        assert self.file.history[0].operations is None
+        self.file.undo()
+        assert rel.RelatedObjects == (self.file.by_id(1),)
+        self.file.redo()
+        assert len(rel.RelatedObjects) == 0
+
     def test_discarding_the_active_transaction(self):
         self.file.begin_transaction()
         self.file.discard_transaction()
@@ -199,6 +312,57 @@ class TestFile(test.bootstrap.IFC4):
         result = self.file.add(element)
         assert result.is_a() == element.is_a()
 
+    def test_getting_attributes_of_an_element(self):
+        wall = self.file.createIfcWall(Name="Foo")
+        opening = self.file.createIfcOpeningElement()
+        rel = self.file.createIfcRelVoidsElement(RelatingBuildingElement=wall, RelatedOpeningElement=opening)
+        assert wall.Name == "Foo"
+        assert wall.HasOpenings == (rel,)
+        assert opening.VoidsElements == (rel,)
+        ifcopenshell.settings.unpack_non_aggregate_inverses = True
+        try:
+            assert opening.VoidsElements == rel
+            assert wall.HasOpenings == (rel,)
+        finally:
+            ifcopenshell.settings.unpack_non_aggregate_inverses = False
+        with pytest.raises(AttributeError):
+            wall.Foo
+
+    def test_getting_derived_attributes_of_an_element(self):
+        point = self.file.createIfcCartesianPoint((0.0, 0.0, 0.0))
+        assert point.Dim == 3
+        ifcopenshell.settings.cache_derived_attributes = True
+        try:
+            assert point.Dim == 3
+            assert self.file.derived_attribute_cache == {(point.id(), "Dim"): 3}
+            point.Coordinates = (0.0, 0.0)
+            assert not self.file.derived_attribute_cache
+            assert point.Dim == 2
+        finally:
+            ifcopenshell.settings.cache_derived_attributes = False
+
+    def test_clearing_cached_derived_attributes_when_the_model_changes(self):
+        # Derived values may depend on inverses, so creating or removing any instance invalidates them
+        point = self.file.createIfcCartesianPoint((0.0, 0.0, 0.0))
+        ifcopenshell.settings.cache_derived_attributes = True
+        try:
+            self.file.begin_transaction()
+            assert point.Dim == 3
+            self.file.createIfcWall()
+            assert not self.file.derived_attribute_cache
+            assert point.Dim == 3
+            self.file.add(ifcopenshell.file().createIfcWall())
+            assert not self.file.derived_attribute_cache
+            self.file.end_transaction()
+            assert point.Dim == 3
+            self.file.undo()
+            assert not self.file.derived_attribute_cache
+            assert point.Dim == 3
+            self.file.redo()
+            assert not self.file.derived_attribute_cache
+        finally:
+            ifcopenshell.settings.cache_derived_attributes = False
+
     def test_getting_elements_by_type(self):
         wall = self.file.createIfcWall()
         slab = self.file.createIfcSlab()
@@ -209,6 +373,21 @@ class TestFile(test.bootstrap.IFC4):
         assert self.file.by_type("IfcElement") == [wall]
         assert len(self.file.by_type("IfcElement", include_subtypes=False)) == 0
 
+    def test_iterating_elements_by_type(self):
+        wall = self.file.createIfcWall()
+        slab = self.file.createIfcSlab()
+        elements = self.file.by_type_iter("IfcElement")
+        assert not isinstance(elements, list)
+        assert list(elements) == self.file.by_type("IfcElement")
+        assert list(self.file.by_type_iter("IfcElement", include_subtypes=False)) == []
+
+    def test_getting_element_ids_by_type(self):
+        wall = self.file.createIfcWall()
+        slab = self.file.createIfcSlab()
+        assert self.file.by_type_ids("IfcWall").tolist() == [wall.id()]
+        assert sorted(self.file.by_type_ids("IfcElement").tolist()) == sorted([wall.id(), slab.id()])
+        assert len(self.file.by_type_ids("IfcElement", include_subtypes=False)) == 0
+
     def test_traversing_direct_attributes_of_an_element(self):
         owner = self.file.createIfcOwnerHistory()
         element = self.file.createIfcWall(OwnerHistory=owner)
@@ -220,6 +399,49 @@ class TestFile(test.bootstrap.IFC4):
         element = self.file.createIfcWall(OwnerHistory=owner)
         assert self.file.traverse(element, max_levels=1) == [element, owner]
 
+    def test_caching_elements_by_type(self):
+        self.file.set_by_type_cache()
+        wall = self.file.createIfcWall()
+        assert self.file.by_type("IfcWall") == [wall]
+        self.file.by_type("IfcWall").clear()
+        assert self.file.by_type("ifcwall") == [wall]
+        assert self.file.by_type_cache.get_stats()["hits"] == 2
+        slab = self.file.createIfcSlab()
+        assert set(self.file.by_type("IfcElement")) == {wall, slab}
+        assert self.file.by_type("IfcElement", include_subtypes=False) == []
+        self.file.remove(wall)
+        assert self.file.by_type("IfcElement") == [slab]
+        stats = self.file.by_type_cache.get_stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 4
+
+    def test_clearing_the_by_type_cache_on_undo_and_redo(self):
+        self.file.set_by_type_cache()
+        self.file.begin_transaction()
+        wall = self.file.createIfcWall()
+        self.file.end_transaction()
+        assert len(self.file.by_type("IfcWall")) == 1
+        self.file.undo()
+        assert self.file.by_type("IfcWall") == []
+        self.file.redo()
+        assert len(self.file.by_type("IfcWall")) == 1
+
+    def test_lazily_traversing_an_element_visiting_shared_elements_once(self):
+        user = self.file.createIfcPersonAndOrganization()
+        owner = self.file.createIfcOwnerHistory(OwningUser=user, LastModifyingUser=user)
+        element = self.file.createIfcWall(OwnerHistory=owner)
+        traversal = self.file.iter_traverse(element)
+        assert next(traversal) == element
+        assert list(traversal) == [owner, user]
+        assert list(self.file.iter_traverse(element, max_levels=1)) == [element, owner]
+
+    def test_lazily_traversing_an_element_filtered_by_class(self):
+        app = self.file.createIfcApplication()
+        owner = self.file.createIfcOwnerHistory(OwningApplication=app)
+        element = self.file.createIfcWall(OwnerHistory=owner)
+        assert list(self.file.iter_traverse(element, include=["IfcApplication"])) == [app]
+        assert list(self.file.iter_traverse(element, exclude=["IfcOwnerHistory"])) == [element]
+
     def test_getting_inverse_references_of_an_element(self):
         owner = self.file.createIfcOwnerHistory()
         element = self.file.createIfcWall(OwnerHistory=owner)
@@ -230,6 +452,30 @@ class TestFile(test.bootstrap.IFC4):
         owner = self.file.createIfcOwnerHistory(OwningUser=user, LastModifyingUser=user)
         assert self.file.get_inverse(user, allow_duplicate=True) == [owner, owner]
 
+    def test_getting_inverse_references_of_many_elements(self):
+        user = self.file.createIfcPersonAndOrganization()
+        owner = self.file.createIfcOwnerHistory(OwningUser=user, LastModifyingUser=user)
+        element = self.file.createIfcWall(OwnerHistory=owner)
+        assert self.file.get_inverse_many([user, owner, element]) == {user: {owner}, owner: {element}, element: set()}
+        assert self.file.get_inverse_many([user.id()], allow_duplicate=True) == {user.id(): [owner, owner]}
+        assert self.file.get_total_inverses_many([user, owner, element.id()]).tolist() == [2, 1, 0]
+
+    def test_getting_info_of_many_elements(self):
+        wall = self.file.createIfcWall(GlobalId="a", Name="Wall")
+        slab = self.file.createIfcSlab(GlobalId="b", ObjectPlacement=self.file.createIfcLocalPlacement())
+        info = self.file.get_info_many([wall, slab.id()])
+        assert info["id"] == [wall.id(), slab.id()]
+        assert info["type"] == ["IfcWall", "IfcSlab"]
+        assert info["GlobalId"] == ["a", "b"]
+        assert info["Name"] == ["Wall", None]
+        assert info["ObjectPlacement"] == [None, None]
+        info = self.file.get_info_many([slab], attributes=["ObjectPlacement"], scalar_only=False)
+        assert list(info.keys()) == ["id", "type", "ObjectPlacement"]
+        assert info["ObjectPlacement"] == [slab.ObjectPlacement]
+        info = self.file.get_info_many([wall, slab], attributes=["Name"], return_type="numpy")
+        assert info["id"].tolist() == [wall.id(), slab.id()]
+        assert info["Name"].tolist() == ["Wall", None]
+
     def test_removing_an_element(self):
         element = self.file.createIfcWall(GlobalId="global_id")
         self.file.remove(element)
@@ -279,3 +525,63 @@ class TestFile(test.bootstrap.IFC4):
         element = self.file.createIfcWall()
         g = ifcopenshell.file.from_string(self.file.wrapped_data.to_string())
         assert g.by_id(1).is_a("IfcWall")
+
+    def test_pickling_a_file(self):
+        element = self.file.createIfcWall(Name="Wall")
+        model = pickle.loads(pickle.dumps(self.file))
+        assert model is not self.file
+        assert model.by_id(element.id()).Name == "Wall"
+
+    def test_pickling_a_shared_file_by_reference(self):
+        element = self.file.createIfcWall(Name="Wall")
+        self.file.share()
+        try:
+            assert pickle.loads(pickle.dumps(self.file)) is self.file
+            if sys.platform.startswith("linux"):
+                with multiprocessing.get_context("fork").Pool(2) as pool:
+                    assert pool.starmap(get_name, [(self.file, element.id())] * 2) == ["Wall", "Wall"]
+        finally:
+            self.file.unshare()
+        assert pickle.loads(pickle.dumps(self.file)) is not self.file
+
+    def test_pickling_a_shared_file_to_spawned_workers(self):
+        element = self.file.createIfcWall(Name="Wall")
+        self.file.share()
+        try:
+            with multiprocessing.get_context("spawn").Pool(1) as pool:
+                results = pool.starmap(get_name_and_model_id, [(self.file, element.id())] * 2)
+        finally:
+            self.file.unshare()
+        assert [name for name, _ in results] == ["Wall", "Wall"]
+        # The worker parses the shared data once and reuses it for later tasks
+        assert results[0][1] == results[1][1]
+
+    def test_unsharing_a_file_releases_its_shared_memory(self):
+        from multiprocessing import shared_memory
+
+        self.file.share()
+        name = self.file.shared_token[0]
+        self.file.unshare()
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name)
+
+    def test_sharing_a_file_does_not_keep_it_alive(self):
+        from multiprocessing import shared_memory
+
+        model = ifcopenshell.file()
+        model.share()
+        name = model.shared_token[0]
+        reference = weakref.ref(model)
+        del model
+        gc.collect()
+        assert reference() is None
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name)
+
+    def test_creating_ifc_data_from_bytes(self):
+        element = self.file.createIfcWall()
+        data = self.file.to_bytes()
+        assert isinstance(data, bytes)
+        for buffer in (data, bytearray(data), memoryview(data)):
+            g = ifcopenshell.file.from_bytes(buffer)
+            assert g.by_id(1).is_a("IfcWall")
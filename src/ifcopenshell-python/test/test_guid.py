@@ -0,0 +1,79 @@
+# IfcOpenShell - IFC toolkit and geometry engine
+# Copyright (C) 2021 Thomas Krijnen <thomas@aecgeeks.com>
+#
+# This file is part of IfcOpenShell.
+#
+# IfcOpenShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# IfcOpenShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with IfcOpenShell.  If not, see <http://www.gnu.org/licenses/>.
+
+import uuid
+import numpy as np
+import pytest
+import ifcopenshell.guid
+
+
+class TestGuid:
+    def test_compressing_many_uuids(self):
+        guids = [uuid.uuid4().hex for i in range(100)] + ["0" * 32, "f" * 32]
+        expected = [ifcopenshell.guid.compress(g) for g in guids]
+        assert ifcopenshell.guid.compress_many(guids) == expected
+        assert ifcopenshell.guid.compress_many(np.array(guids)) == expected
+        data = b"".join(bytes.fromhex(g) for g in guids)
+        assert ifcopenshell.guid.compress_many(data) == expected
+        assert ifcopenshell.guid.compress_many(data, as_array=True).tolist() == [e.encode() for e in expected]
+
+    def test_expanding_many_global_ids(self):
+        global_ids = [ifcopenshell.guid.new() for i in range(100)]
+        expected = [ifcopenshell.guid.expand(g) for g in global_ids]
+        assert ifcopenshell.guid.expand_many(global_ids) == expected
+        assert ifcopenshell.guid.expand_many(np.array(global_ids)) == expected
+        data = ifcopenshell.guid.expand_many(global_ids, as_array=True)
+        assert data.shape == (100, 16)
+        assert ifcopenshell.guid.compress_many(data) == global_ids
+
+    def test_expanding_an_invalid_global_id(self):
+        with pytest.raises(ValueError):
+            ifcopenshell.guid.expand_many(["4" + ifcopenshell.guid.new()[1:]])
+
+    def test_expanding_global_ids_of_the_wrong_length(self):
+        global_id = ifcopenshell.guid.new()
+        with pytest.raises(ValueError):
+            ifcopenshell.guid.expand_many(["0" * 21, "0" * 23])
+        with pytest.raises(ValueError):
+            ifcopenshell.guid.expand_many(np.array([global_id, global_id[:21]]))
+        with pytest.raises(ValueError):
+            ifcopenshell.guid.expand_many(np.array([global_id + "0"]))
+
+    def test_compressing_uuids_of_the_wrong_length(self):
+        a, b = uuid.uuid4().hex, uuid.uuid4().hex
+        with pytest.raises(ValueError):
+            ifcopenshell.guid.compress_many([a[:-1], a[-1] + b])
+        with pytest.raises(ValueError):
+            ifcopenshell.guid.compress_many(["0" * 30, "0" * 34])
+        with pytest.raises(ValueError):
+            ifcopenshell.guid.compress_many(np.array([a, a[:30]]))
+
+    def test_generating_many_global_ids(self):
+        global_ids = ifcopenshell.guid.new_many(100)
+        assert len(set(global_ids)) == 100
+        assert ifcopenshell.guid.is_valid_many(global_ids).all()
+        assert all(uuid.UUID(ifcopenshell.guid.expand(g)).version == 4 for g in global_ids)
+
+    def test_validating_many_global_ids(self):
+        global_id = ifcopenshell.guid.new()
+        global_ids = [global_id, "4" + global_id[1:], global_id[:21], global_id[:21] + "!", "é" * 22]
+        assert ifcopenshell.guid.is_valid_many(global_ids).tolist() == [True, False, False, False, False]
+
+
+if __name__ == "__main__":
+    pytest.main(["-sx", __file__])
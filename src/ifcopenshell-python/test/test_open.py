@@ -41,6 +41,10 @@ class TestOpen:
             TEST_FILE_DIR / "WallInstance_IFC4Add2_ifcspf_format.ifczip"
         )
 
+    def test_open_ifc_zip_ifcspf_format_above_the_memory_limit(self):
+        model = ifcopenshell.open(TEST_FILE_DIR / "WallInstance_IFC4Add2_ifcspf_format.ifczip", zip_memory_limit=0)
+        assert model.by_type("IfcWall")
+
     def test_open_zip(self):
         assert ifcopenshell.open(
             TEST_FILE_DIR / "WallInstance_IFC4Add2_ifcspf_format.zip"
@@ -70,3 +74,20 @@ class TestOpen:
     def test_invalid_ifcxml(self):
         with pytest.raises(IOError):
             assert ifcopenshell.open(TEST_FILE_DIR / "invalid.ifcxml")
+
+    def test_open_ifc_zip_ifcspf_format_as_a_stream(self):
+        model = ifcopenshell.open(TEST_FILE_DIR / "WallInstance_IFC4Add2_ifcspf_format.ifczip", should_stream=True)
+        assert isinstance(model, ifcopenshell.stream)
+        assert model.by_type("IfcWall")
+
+    def test_open_many(self):
+        paths = [TEST_FILE_DIR / "WallInstance_IFC4Add2.ifc", TEST_FILE_DIR / "wall-with-opening-and-window.ifcxml"]
+        models = ifcopenshell.open_many(paths, workers=2)
+        assert [m.schema for m in models] == [ifcopenshell.open(p).schema for p in paths]
+
+    def test_open_many_with_stats(self):
+        paths = [TEST_FILE_DIR / "WallInstance_IFC4Add2.ifc"] * 3
+        models, stats = ifcopenshell.open_many(paths, with_stats=True)
+        assert len(models) == len(stats) == 3
+        assert [s["path"] for s in stats] == [str(p) for p in paths]
+        assert all(s["time"] > 0 for s in stats)
@@ -0,0 +1,510 @@
+# IfcOpenShell - IFC toolkit and geometry engine
+# Copyright (C) 2021 Thomas Krijnen <thomas@aecgeeks.com>
+#
+# This file is part of IfcOpenShell.
+#
+# IfcOpenShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# IfcOpenShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with IfcOpenShell.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import pytest
+import sqlite3
+import threading
+import concurrent.futures
+import numpy as np
+import test.bootstrap
+import ifcopenshell
+import ifcopenshell.api
+import ifcopenshell.guid
+import ifcopenshell.sql
+
+ifcpatch = pytest.importorskip("ifcpatch")
+
+
+def get_value(value):
+    """Returns an attribute value comparable between ifcopenshell.file and ifcopenshell.sql"""
+    if isinstance(value, (tuple, list)):
+        return tuple(get_value(v) for v in value)
+    elif isinstance(value, ifcopenshell.entity_instance):
+        return value.id() or (value.is_a(), value.wrappedValue)
+    return value
+
+
+class Sqlite(test.bootstrap.IFC4):
+    @pytest.fixture(autouse=True)
+    def setup_database(self, setup):
+        project = ifcopenshell.api.run("root.create_entity", self.file, ifc_class="IfcProject")
+        ifcopenshell.api.run("unit.assign_unit", self.file)
+        model = ifcopenshell.api.run("context.add_context", self.file, context_type="Model")
+        body = ifcopenshell.api.run(
+            "context.add_context",
+            self.file,
+            context_type="Model",
+            context_identifier="Body",
+            target_view="MODEL_VIEW",
+            parent=model,
+        )
+        site = ifcopenshell.api.run("root.create_entity", self.file, ifc_class="IfcSite")
+        ifcopenshell.api.run("aggregate.assign_object", self.file, product=site, relating_object=project)
+
+        # The first walls share a representation, so that they share geometry
+        shared_representation = ifcopenshell.api.run("geometry.add_wall_representation", self.file, context=body)
+        other_representation = ifcopenshell.api.run(
+            "geometry.add_wall_representation", self.file, context=body, length=2.0
+        )
+        # Ifc2Sql stores the ids of surface styles as materials
+        style = ifcopenshell.api.run("style.add_style", self.file, name="Concrete")
+        colour = {"Name": None, "Red": 0.5, "Green": 0.5, "Blue": 0.5}
+        ifcopenshell.api.run("style.add_surface_style", self.file, style=style, attributes={"SurfaceColour": colour})
+        for representation in (shared_representation, other_representation):
+            ifcopenshell.api.run(
+                "style.assign_representation_styles", self.file, shape_representation=representation, styles=[style]
+            )
+        for i, representation in enumerate([shared_representation] * 3 + [other_representation]):
+            wall = ifcopenshell.api.run("root.create_entity", self.file, ifc_class="IfcWall", name=f"Wall {i}")
+            matrix = np.eye(4)
+            matrix[0][3] = i
+            ifcopenshell.api.run("geometry.edit_object_placement", self.file, product=wall, matrix=matrix)
+            ifcopenshell.api.run(
+                "geometry.assign_representation", self.file, product=wall, representation=representation
+            )
+            ifcopenshell.api.run("spatial.assign_container", self.file, product=wall, relating_structure=site)
+
+        # The first wall has its own properties, the second inherits those of its type
+        walls = self.file.by_type("IfcWall")
+        pset = ifcopenshell.api.run("pset.add_pset", self.file, product=walls[0], name="Pset_WallCommon")
+        ifcopenshell.api.run("pset.edit_pset", self.file, pset=pset, properties={"FireRating": "2HR"})
+        wall_type = ifcopenshell.api.run("root.create_entity", self.file, ifc_class="IfcWallType", name="Type")
+        pset = ifcopenshell.api.run("pset.add_pset", self.file, product=wall_type, name="Pset_WallCommon")
+        ifcopenshell.api.run("pset.edit_pset", self.file, pset=pset, properties={"IsExternal": True})
+        self.file.createIfcRelDefinesByType(ifcopenshell.guid.new(), RelatedObjects=[walls[1]], RelatingType=wall_type)
+
+        self.path = ifcpatch.execute({"input": None, "file": self.file, "recipe": "Ifc2Sql", "arguments": ["sqlite"]})
+        self.db = ifcopenshell.sql.sqlite(self.path)
+        yield
+        self.db.close()
+        os.remove(self.path)
+
+
+class TestPrefetch(Sqlite):
+    def test_prefetching_all_attributes(self):
+        elements = [self.db.by_id(e.id()) for e in self.file]
+        self.db.prefetch(elements)
+        for element in elements:
+            assert len(element.sqlite_wrapper.attribute_cache) == len(element.sqlite_wrapper.attributes)
+            expected = self.file.by_id(element.id()).get_info()
+            assert get_value(list(element.get_info().values())) == get_value(list(expected.values()))
+
+    def test_prefetching_some_attributes(self):
+        walls = self.db.by_type("IfcWall", prefetch=["Name", "ObjectPlacement", "Foobar"])
+        for wall in walls:
+            assert set(wall.sqlite_wrapper.attribute_cache) == {"Name", "ObjectPlacement"}
+            expected = self.file.by_id(wall.id())
+            assert wall.Name == expected.Name
+            assert wall.ObjectPlacement.id() == expected.ObjectPlacement.id()
+            # Attributes which were not prefetched are still loaded on access
+            assert wall.Representation.id() == expected.Representation.id()
+            assert len(wall.sqlite_wrapper.attribute_cache) == len(wall.sqlite_wrapper.attributes)
+
+    def test_prefetching_some_instances_of_a_class(self):
+        walls = self.db.by_type("IfcWall")
+        self.db.prefetch(walls[:2])
+        assert all(w.sqlite_wrapper.attribute_cache for w in walls[:2])
+        assert not any(w.sqlite_wrapper.attribute_cache for w in walls[2:])
+        assert [w.Name for w in walls] == [self.file.by_id(w.id()).Name for w in walls]
+
+    def test_prefetching_matches_loading_attributes_on_access(self):
+        prefetched = [get_value(list(w.get_info().values())) for w in self.db.by_type("IfcWall", prefetch=True)]
+        db = ifcopenshell.sql.sqlite(self.path)
+        assert prefetched == [get_value(list(w.get_info().values())) for w in db.by_type("IfcWall")]
+        db.close()
+
+
+class TestInverses(Sqlite):
+    def test_creating_the_inverses_table(self):
+        self.db.cursor.execute("SELECT ifc_id, referenced_by, attribute_index FROM inverses")
+        rows = sorted(tuple(r) for r in self.db.cursor.fetchall())
+        expected = sorted(
+            (e.id(), inverse.id(), i)
+            for e in self.file
+            for inverse, i in self.file.get_inverse(e, allow_duplicate=True, with_attribute_indices=True)
+        )
+        assert rows and rows == expected
+
+    def test_getting_inverses(self):
+        assert self.db.has_inverses_table
+        for element in self.file:
+            db_element = self.db.by_id(element.id())
+            inverses = self.file.get_inverse(element, allow_duplicate=True, with_attribute_indices=True)
+            db_inverses = self.db.get_inverse(db_element, allow_duplicate=True, with_attribute_indices=True)
+            assert sorted((e.id(), i) for e, i in db_inverses) == sorted((e.id(), i) for e, i in inverses)
+            db_inverses = self.db.get_inverse(db_element, allow_duplicate=True)
+            assert sorted(e.id() for e in db_inverses) == sorted(e.id() for e, _ in inverses)
+            assert {e.id() for e in self.db.get_inverse(db_element)} == {e.id() for e in self.file.get_inverse(element)}
+            assert self.db.get_total_inverses(db_element) == self.file.get_total_inverses(element)
+
+    def test_getting_inverses_of_many_elements(self):
+        ids = [e.id() for e in self.file]
+        inverse_ids = self.db.get_inverse_ids_many(ids)
+        for element in self.file:
+            expected = sorted(e.id() for e in self.file.get_inverse(element, allow_duplicate=True))
+            assert sorted(inverse_ids.get(element.id(), [])) == expected
+        totals = self.db.get_total_inverses_many(ids).tolist()
+        assert totals == [self.file.get_total_inverses(e) for e in self.file]
+
+    def test_getting_inverse_attributes(self):
+        for element in self.file:
+            db_element = self.db.by_id(element.id())
+            for attribute in element.wrapped_data.declaration().as_entity().all_inverse_attributes():
+                expected = {e.id() for e in getattr(element, attribute.name())}
+                assert {e.id() for e in getattr(db_element, attribute.name())} == expected
+
+    def test_matching_the_inverses_column(self):
+        db = ifcopenshell.sql.sqlite(self.path)
+        # Databases created by older versions of Ifc2Sql only have inverses columns
+        db.has_inverses_table = False
+        assert db.has_inverses_column
+        ids = [e.id() for e in self.file]
+        inverse_ids = self.db.get_inverse_ids_many(ids)
+        column_inverse_ids = db.get_inverse_ids_many(ids)
+        for i in ids:
+            assert set(inverse_ids.get(i, [])) == set(column_inverse_ids.get(i, []))
+            element, db_element = self.db.by_id(i), db.by_id(i)
+            assert {e.id() for e in self.db.get_inverse(element)} == {e.id() for e in db.get_inverse(db_element)}
+            for name in element.sqlite_wrapper.inverse_attributes:
+                assert {e.id() for e in getattr(element, name)} == {e.id() for e in getattr(db_element, name)}
+        db.close()
+
+
+class TestGeometry(Sqlite):
+    def test_getting_geometry_as_read_only_arrays(self):
+        walls = [w.id() for w in self.file.by_type("IfcWall")]
+        result = self.db.get_geometry(walls, as_array=True)
+        assert set(result["shapes"]) == set(walls)
+        for shape in result["shapes"].values():
+            assert not shape["matrix"].flags.writeable
+        assert result["geometry"]
+        for geometry in result["geometry"].values():
+            assert len(geometry["verts"]) and len(geometry["faces"])
+            for key in ("verts", "edges", "faces", "material_ids"):
+                assert isinstance(geometry[key], np.ndarray)
+                assert not geometry[key].flags.writeable
+            with pytest.raises(ValueError):
+                geometry["verts"][0] = 1.0
+
+    def test_getting_geometry_as_lists(self):
+        walls = [w.id() for w in self.file.by_type("IfcWall")]
+        result = self.db.get_geometry(walls)
+        arrays = self.db.get_geometry(walls, as_array=True)
+        for geometry_id, geometry in result["geometry"].items():
+            assert isinstance(geometry["verts"], list)
+            assert geometry["verts"] == arrays["geometry"][geometry_id]["verts"].tolist()
+        for shape in result["shapes"].values():
+            assert shape["matrix"].flags.writeable
+
+    def test_iterating_over_geometry_in_batches(self):
+        walls = [w.id() for w in self.file.by_type("IfcWall")]
+        geometry_ids = {i: s["geometry"] for i, s in self.db.get_geometry(walls)["shapes"].items()}
+        # The first walls share geometry
+        assert len(set(geometry_ids.values())) == 2
+
+        batches = list(self.db.iter_geometry(walls, batch_size=1))
+        assert [list(b["shapes"]) for b in batches] == [[i] for i in walls]
+        seen = set()
+        for batch in batches:
+            # Geometry is only included in the first batch which uses it
+            expected = {s["geometry"] for s in batch["shapes"].values()} - seen
+            assert set(batch["geometry"]) == expected
+            seen.update(expected)
+        assert seen == set(geometry_ids.values())
+
+    def test_iterating_over_all_geometry_in_batches(self):
+        batches = list(self.db.iter_geometry(batch_size=2))
+        assert all(len(b["shapes"]) <= 2 for b in batches)
+        shapes = {i: s for b in batches for i, s in b["shapes"].items()}
+        assert set(shapes) >= {w.id() for w in self.file.by_type("IfcWall")}
+        geometry_ids = [g for b in batches for g in b["geometry"]]
+        assert len(geometry_ids) == len(set(geometry_ids))
+        assert set(geometry_ids) == {s["geometry"] for s in shapes.values() if s["geometry"]}
+
+
+class TestReadOnly(Sqlite):
+    def test_reading_from_many_threads(self):
+        db = ifcopenshell.sql.sqlite(self.path, read_only=True)
+        ids = [e.id() for e in self.file]
+        barrier = threading.Barrier(4)
+
+        def read(i):
+            if i < 4:
+                # Ensure that every worker thread reads concurrently
+                barrier.wait()
+            element = db.by_id(ids[i % len(ids)])
+            return element, get_value(list(element.get_info().values())), {e.id() for e in db.get_inverse(element)}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(read, range(len(ids) * 4)))
+        # Each thread has its own connection, as does the thread which opened the database
+        assert len(db.connections) == 5
+        for i, (element, info, inverses) in enumerate(results):
+            expected = self.file.by_id(ids[i % len(ids)])
+            # Instances are shared between threads
+            assert element is results[i % len(ids)][0]
+            assert info == get_value(list(expected.get_info().values()))
+            assert inverses == {e.id() for e in self.file.get_inverse(expected)}
+        db.close()
+        assert not db.connections
+
+    def test_creating_instances_from_many_threads(self):
+        db = ifcopenshell.sql.sqlite(self.path, read_only=True)
+        wall = self.db.create_entity("IfcWall", Name="Foobar")
+        assert wall.id() not in db.id_map
+        barrier = threading.Barrier(8)
+
+        def read(i):
+            barrier.wait()
+            return db.by_id(wall.id())
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(read, range(8)))
+        # Instances created elsewhere are found in the database and only instantiated once
+        assert all(r is results[0] for r in results)
+        assert results[0].Name == "Foobar"
+        assert db.id_map[wall.id()] == "IfcWall"
+        db.close()
+
+    def test_preventing_writes(self):
+        db = ifcopenshell.sql.sqlite(self.path, read_only=True)
+        with pytest.raises(sqlite3.OperationalError):
+            db.cursor.execute("DELETE FROM id_map")
+        db.close()
+
+    def test_reading_while_writing_with_write_ahead_logging(self):
+        writer = ifcopenshell.sql.sqlite(self.path, wal=True)
+        assert writer.cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        reader = ifcopenshell.sql.sqlite(self.path, read_only=True)
+        wall = writer.by_type("IfcWall")[0]
+        writer.batch()
+        wall.Name = "Foobar"
+        # Uncommitted writes are not visible, and do not block readers
+        assert reader.by_id(wall.id()).Name == "Wall 0"
+        writer.unbatch()
+        reader.clear_cache()
+        assert reader.by_id(wall.id()).Name == "Foobar"
+        reader.close()
+        writer.close()
+
+
+class TestWrite(Sqlite):
+    def assert_database_is_consistent(self, db):
+        db.cursor.execute("SELECT ifc_id, ifc_class FROM id_map")
+        assert dict(tuple(r) for r in db.cursor.fetchall()) == db.id_map
+        assert {i: c for c, ids in db.class_map.items() for i in ids} == db.id_map
+        expected = []
+        for ifc_id, ifc_class in db.id_map.items():
+            db.cursor.execute(f"SELECT * FROM {ifc_class} WHERE ifc_id = ?", (ifc_id,))
+            for index, ids in db.get_references(ifc_class, dict(db.cursor.fetchone())).items():
+                expected.extend((i, ifc_id, index) for i in ids)
+        assert all(i in db.id_map for i, _, _ in expected)
+        db.cursor.execute("SELECT ifc_id, referenced_by, attribute_index FROM inverses")
+        assert sorted(tuple(r) for r in db.cursor.fetchall()) == sorted(expected)
+        for ifc_id, ifc_class in db.id_map.items():
+            db.cursor.execute(f"SELECT inverses FROM {ifc_class} WHERE ifc_id = ?", (ifc_id,))
+            assert set(json.loads(db.cursor.fetchone()[0] or "[]")) == {r for i, r, _ in expected if i == ifc_id}
+
+    def assert_database_matches_file(self):
+        # A new instance, to check what was committed to the database
+        db = ifcopenshell.sql.sqlite(self.path)
+        path = self.path + ".ifc"
+        db.write(path)
+        db.close()
+        ifc = ifcopenshell.open(path)
+        os.remove(path)
+        assert ifc.schema == self.file.schema
+        assert sorted(e.id() for e in ifc) == sorted(e.id() for e in self.file)
+        for element in self.file:
+            info = ifc.by_id(element.id()).get_info()
+            assert get_value(list(info.values())) == get_value(list(element.get_info().values()))
+
+    def test_writing_a_database(self):
+        self.assert_database_matches_file()
+
+    def test_creating_an_entity(self):
+        placement = self.db.by_type("IfcLocalPlacement")[0]
+        max_id = max(e.id() for e in self.file)
+        wall = self.db.create_entity("IfcWall", GlobalId="0" * 22, Name="Foobar", ObjectPlacement=placement)
+        assert wall.id() == max_id + 1
+        assert wall.Name == "Foobar"
+        assert self.db.id_map[wall.id()] == "IfcWall"
+        assert (wall, 5) in self.db.get_inverse(placement, allow_duplicate=True, with_attribute_indices=True)
+        self.assert_database_is_consistent(self.db)
+
+        element = self.file.create_entity("IfcWall", GlobalId="0" * 22, Name="Foobar")
+        element.ObjectPlacement = self.file.by_id(placement.id())
+        assert element.id() == wall.id()
+        self.assert_database_matches_file()
+
+    def test_creating_an_entity_with_an_id(self):
+        wall = self.db.create_entity("IfcWall", GlobalId="0" * 22, id=1000)
+        assert wall.id() == 1000
+        assert self.db.create_entity("IfcWall", GlobalId="1" * 22).id() == 1001
+        with pytest.raises(ValueError):
+            self.db.create_entity("IfcWall", GlobalId="2" * 22, id=1000)
+        self.assert_database_is_consistent(self.db)
+
+    def test_editing_an_entity(self):
+        wall = self.db.by_type("IfcWall")[0]
+        placement = self.db.by_type("IfcLocalPlacement")[-1]
+        old_placement = wall.ObjectPlacement
+        rel = wall.ContainedInStructure[0]
+        wall.Name = "Foobar"
+        wall.ObjectPlacement = placement
+        rel.RelatedElements = [e for e in rel.RelatedElements if e != wall]
+        assert wall.Name == "Foobar"
+        assert wall.ObjectPlacement == placement
+        assert wall not in self.db.get_inverse(old_placement)
+        assert wall in self.db.get_inverse(placement)
+        assert wall.ContainedInStructure == ()
+        self.assert_database_is_consistent(self.db)
+
+        element = self.file.by_id(wall.id())
+        element.Name = "Foobar"
+        element.ObjectPlacement = self.file.by_id(placement.id())
+        element.ContainedInStructure[0].RelatedElements = [
+            e for e in element.ContainedInStructure[0].RelatedElements if e != element
+        ]
+        self.assert_database_matches_file()
+
+    def test_removing_an_entity(self):
+        wall = self.db.by_type("IfcWall")[0]
+        wall_id = wall.id()
+        rel = wall.ContainedInStructure[0]
+        self.db.remove(wall)
+        assert wall_id not in self.db.id_map
+        assert self.db.by_id(wall_id) is None
+        assert wall_id not in [e.id() for e in rel.RelatedElements]
+        self.db.cursor.execute("SELECT COUNT(*) FROM shape WHERE ifc_id = ?", (wall_id,))
+        assert self.db.cursor.fetchone()[0] == 0
+        self.db.cursor.execute("SELECT COUNT(*) FROM inverses WHERE ifc_id = ? OR referenced_by = ?", (wall_id,) * 2)
+        assert self.db.cursor.fetchone()[0] == 0
+        self.assert_database_is_consistent(self.db)
+
+        self.file.remove(self.file.by_id(wall_id))
+        self.assert_database_matches_file()
+
+    def test_removing_many_entities_in_a_batch(self):
+        walls = self.db.by_type("IfcWall")
+        self.db.batch()
+        for wall in walls[::2]:
+            self.db.remove(wall)
+        self.db.unbatch()
+        assert self.db.by_type("IfcWall") == walls[1::2]
+        self.assert_database_is_consistent(self.db)
+
+        for wall in walls[::2]:
+            self.file.remove(self.file.by_id(wall.id()))
+        self.assert_database_matches_file()
+
+    def test_batching_writes(self):
+        self.db.batch()
+        walls = self.db.by_type("IfcWall")
+        for wall in walls:
+            wall.Description = "Foobar"
+        assert self.db.pending_writes == len(walls)
+        self.db.unbatch()
+        assert self.db.pending_writes == 0
+        for wall in self.file.by_type("IfcWall"):
+            wall.Description = "Foobar"
+        self.assert_database_matches_file()
+
+    def get_pset_rows(self, element):
+        query = "SELECT pset_name, name, value FROM psets WHERE ifc_id = ? ORDER BY pset_name, name"
+        self.db.cursor.execute(query, (element.id(),))
+        return [tuple(r) for r in self.db.cursor.fetchall()]
+
+    def test_editing_properties(self):
+        wall, typed_wall = self.db.by_type("IfcWall")[:2]
+        wall_type = self.db.by_type("IfcWallType")[0]
+        fire_rating = [p for p in self.db.by_type("IfcPropertySingleValue") if p.Name == "FireRating"][0]
+        is_external = [p for p in self.db.by_type("IfcPropertySingleValue") if p.Name == "IsExternal"][0]
+        assert self.get_pset_rows(wall) == [("Pset_WallCommon", "FireRating", "2HR")]
+        assert self.get_pset_rows(typed_wall) == [("Pset_WallCommon", "IsExternal", "1")]
+
+        fire_rating.NominalValue = self.db.create_entity("IfcLabel", "4HR")
+        is_external.NominalValue = self.db.create_entity("IfcBoolean", False)
+        assert self.get_pset_rows(wall) == [("Pset_WallCommon", "FireRating", "4HR")]
+        assert self.get_pset_rows(typed_wall) == [("Pset_WallCommon", "IsExternal", "0")]
+        assert self.get_pset_rows(wall_type) == [("Pset_WallCommon", "IsExternal", "0")]
+
+        # Properties are written once per element when batched
+        self.db.batch()
+        fire_rating.Name = "Rating"
+        wall.IsDefinedBy[0].RelatedObjects = [typed_wall]
+        self.db.unbatch()
+        assert self.get_pset_rows(wall) == []
+        assert self.get_pset_rows(typed_wall) == [
+            ("Pset_WallCommon", "IsExternal", "0"),
+            ("Pset_WallCommon", "Rating", "4HR"),
+        ]
+        self.assert_database_is_consistent(self.db)
+
+        element = self.file.by_id(wall.id())
+        self.file.by_id(fire_rating.id()).NominalValue = self.file.createIfcLabel("4HR")
+        self.file.by_id(is_external.id()).NominalValue = self.file.createIfcBoolean(False)
+        self.file.by_id(fire_rating.id()).Name = "Rating"
+        element.IsDefinedBy[0].RelatedObjects = [self.file.by_id(typed_wall.id())]
+        self.assert_database_matches_file()
+
+    def test_removing_a_property(self):
+        wall = self.db.by_type("IfcWall")[0]
+        fire_rating = [p for p in self.db.by_type("IfcPropertySingleValue") if p.Name == "FireRating"][0]
+        self.db.remove(fire_rating)
+        assert self.get_pset_rows(wall) == []
+        self.assert_database_is_consistent(self.db)
+
+    def test_writing_binaries_and_logicals(self):
+        texture = self.db.create_entity("IfcBlobTexture", True, False, RasterFormat="PNG", RasterCode="0110")
+        pixels = self.db.create_entity("IfcPixelTexture", True, True, Width=1, Height=1, ColourComponents=3)
+        pixels.Pixel = ["01101001", "0001"]
+        curve = self.db.create_entity("IfcCompositeCurve", Segments=[], SelfIntersect="UNKNOWN")
+        closed = self.db.create_entity("IfcCompositeCurve", Segments=[], SelfIntersect=True)
+        value = self.db.create_entity("IfcLogical", "UNKNOWN")
+        prop = self.db.create_entity("IfcPropertySingleValue", Name="Foo", NominalValue=value)
+        self.assert_database_is_consistent(self.db)
+
+        path = self.path + ".ifc"
+        self.db.write(path)
+        with open(path) as f:
+            data = f.read()
+        ifc = ifcopenshell.open(path)
+        os.remove(path)
+        assert f"#{texture.id()}=IFCBLOBTEXTURE(.T.,.F.,$,$,$,'PNG',\"06\");" in data
+        assert '("069","01")' in data
+        assert f"#{curve.id()}=IFCCOMPOSITECURVE((),.U.);" in data
+        assert f"#{closed.id()}=IFCCOMPOSITECURVE((),.T.);" in data
+        assert "IFCLOGICAL(.U.)" in data
+        assert ifc.by_id(texture.id()).RasterCode == "0110"
+        assert ifc.by_id(pixels.id()).Pixel == ("01101001", "0001")
+        assert ifc.by_id(curve.id()).SelfIntersect == "UNKNOWN"
+        assert ifc.by_id(closed.id()).SelfIntersect is True
+        assert ifc.by_id(prop.id()).NominalValue.wrappedValue == "UNKNOWN"
+
+    def test_serialising_binaries(self):
+        assert self.db.serialise_spf_value("0110", "binary") == '"06"'
+        assert self.db.serialise_spf_value("1", "binary") == '"31"'
+        assert self.db.serialise_spf_value("10101", "binary") == '"315"'
+        assert self.db.serialise_spf_value("", "binary") == '"0"'
+
+
+if __name__ == "__main__":
+    pytest.main(["-sx", __file__])
@@ -0,0 +1,192 @@
+# IfcOpenShell - IFC toolkit and geometry engine
+# Copyright (C) 2021 Thomas Krijnen <thomas@aecgeeks.com>
+#
+# This file is part of IfcOpenShell.
+#
+# IfcOpenShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# IfcOpenShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with IfcOpenShell.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pytest
+import ifcopenshell
+from ifcopenshell.stream import stream, parse_record, get_index_path, build_indexes
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class TestParseRecord:
+    def test_parsing_simple_values(self):
+        record = b"#1=IFCX('a',$,*,.T.,.F.,.U.,.ELEMENT.,1,-2,1.5,1.E-3,#42);"
+        step_id, ifc_class, attributes, end = parse_record(record)
+        assert step_id == 1
+        assert ifc_class == "IFCX"
+        assert attributes == ("a", None, None, True, False, "UNKNOWN", "ELEMENT", 1, -2, 1.5, 0.001, 42)
+        assert end == len(record)
+
+    def test_parsing_nested_lists_and_typed_values(self):
+        record = b"#2 = IFCX((1.,(2,3),()),IFCLABEL('x'),(IFCREAL(1.5)));"
+        attributes = parse_record(record)[2]
+        assert attributes == ((1.0, (2, 3), ()), ("IFCLABEL", "x"), (("IFCREAL", 1.5),))
+
+    def test_parsing_escaped_strings(self):
+        record = b"#3=IFCX('it''s','\\X2\\00E9\\X0\\','\\S\\D','a\\\\b');"
+        attributes = parse_record(record)[2]
+        assert attributes == ("it's", "é", "Ä", "a\\b")
+
+    def test_parsing_multiline_records(self):
+        record = b"#4=IFCX(\r\n  'a',\r\n  (#1,\r\n#2));\r\n"
+        attributes = parse_record(record, resolve=lambda i: -i)[2]
+        assert attributes == ("a", (-1, -2))
+
+    def test_raising_on_incomplete_records(self):
+        with pytest.raises(ValueError):
+            parse_record(b"#5=IFCX('a',")
+
+
+class TestStream:
+    def test_reading_attributes(self):
+        ifc = stream(os.path.join(FIXTURES, "bug_2517_test2.ifc"))
+        project = ifc.by_type("IfcProject")[0]
+        assert project.Name == "My Project"
+        assert project.UnitsInContext.id() == 9
+        unit = ifc.by_id(7)
+        assert unit.ValueComponent.wrappedValue == pytest.approx(0.0174532925199433)
+
+    def test_indexing_crlf_and_multiline_records(self, tmp_path):
+        with open(os.path.join(FIXTURES, "bug_2517_test2.ifc"), "rb") as f:
+            data = f.read().replace(b"\n", b"\r\n")
+        data = data.replace(b"#9=IFCUNITASSIGNMENT((#4,", b"#9=IFCUNITASSIGNMENT(\r\n(#4,")
+        data = data.replace(b"'My Site'", b"'My;#999=IFCSITE(#5) Site'")
+        path = tmp_path / "crlf.ifc"
+        path.write_bytes(data)
+        ifc = stream(str(path))
+        assert ifc.id_map[9] == "IFCUNITASSIGNMENT"
+        assert 999 not in ifc.id_map
+        assert list(ifc.class_map["IFCSIUNIT"]) == [2, 3, 4, 6]
+        assert len(ifc.by_id(9).Units) == 4
+        assert ifc.by_id(26).Name == "My;#999=IFCSITE(#5) Site"
+
+    def test_getting_inverses(self):
+        ifc = stream(os.path.join(FIXTURES, "bug_2517_test2.ifc"), use_index=False)
+        element = ifc.by_id(5)
+        assert ifc.inverses.get(5) == [8]
+        assert ifc.get_inverse(element) == {ifc.by_id(8)}
+        assert ifc.get_total_inverses(element) == 1
+        assert ifc.get_total_inverses(ifc.by_id(1)) == 1
+        assert ifc.get_total_inverses(ifc.by_id(14)) == 4
+        assert ifc.get_inverse_many([element, 1]) == {element: {ifc.by_id(8)}, 1: {ifc.by_id(44)}}
+        assert ifc.get_total_inverses_many([element, 1, 14, 999]).tolist() == [1, 1, 4, 0]
+
+    def test_getting_elements_by_type(self):
+        ifc = stream(os.path.join(FIXTURES, "bug_2517_test2.ifc"), use_index=False)
+        assert [e.id() for e in ifc.by_type("IfcSIUnit")] == [2, 3, 4, 6]
+        assert [e.id() for e in ifc.by_type_iter("IfcSIUnit")] == [2, 3, 4, 6]
+        assert ifc.by_type_ids("IfcSIUnit").tolist() == [2, 3, 4, 6]
+        assert sorted(ifc.by_type_ids("IfcNamedUnit").tolist()) == [2, 3, 4, 6, 8]
+        assert len(ifc.by_type_ids("IfcNamedUnit", include_subtypes=False)) == 0
+
+    def test_traversing_an_element(self):
+        ifc = stream(os.path.join(FIXTURES, "bug_2517_test2.ifc"), use_index=False)
+        element = ifc.by_id(9)
+        assert [e.id() for e in ifc.traverse(element)] == [9, 4, 2, 8, 5, 7, 6, 3]
+        assert [e.id() for e in ifc.traverse(element, max_levels=1)] == [9, 4, 2, 8, 3]
+        assert [e.id() for e in ifc.traverse(element, breadth_first=True)] == [9, 4, 2, 8, 3, 5, 7, 6]
+        assert [e.id() for e in ifc.iter_traverse(element, include=["IfcSIUnit"])] == [4, 2, 6, 3]
+        assert [e.id() for e in ifc.iter_traverse(element, exclude=["IfcConversionBasedUnit"])] == [9, 4, 2, 3]
+
+    def test_bounding_the_entity_cache(self):
+        ifc = stream(os.path.join(FIXTURES, "bug_2517_test2.ifc"), use_index=False)
+        ifc.set_cache_size(max_items=2)
+        ifc.by_id(1)
+        ifc.by_id(2)
+        ifc.by_id(1)
+        ifc.by_id(3)
+        assert 1 in ifc.entity_cache
+        assert 2 not in ifc.entity_cache
+        assert ifc.by_id(2).id() == 2
+        stats = ifc.entity_cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 4
+        assert stats["evictions"] == 2
+        assert stats["items"] == 2
+
+    def test_opening_an_empty_file(self, tmp_path):
+        path = tmp_path / "empty.ifc"
+        path.write_bytes(b"")
+        with stream(str(path), use_index=False) as ifc:
+            assert len(ifc.id_map) == 0
+            assert ifc.by_type("IfcWall") == []
+
+    def test_closing_the_stream(self):
+        ifc = stream(os.path.join(FIXTURES, "bug_2517_test2.ifc"), use_index=False)
+        with ifc:
+            assert ifc.by_id(5).id() == 5
+        assert ifc.file is None
+        assert len(ifc.data) == 0
+        assert len(ifc.entity_cache) == 0
+
+    def test_indexing_in_parallel(self):
+        path = os.path.join(FIXTURES, "bug_2517_test2.ifc")
+        ifc = stream(path, use_index=False)
+        ifc2 = stream(path, use_index=False, workers=3)
+        assert list(ifc2.id_map.items()) == list(ifc.id_map.items())
+        assert list(ifc2.id_offset.items()) == list(ifc.id_offset.items())
+        assert {k: list(v) for k, v in ifc2.class_map.items()} == {k: list(v) for k, v in ifc.class_map.items()}
+        assert ifc2.inverses.values.tolist() == ifc.inverses.values.tolist()
+
+
+class TestIndex:
+    def test_reusing_a_saved_index(self, tmp_path):
+        path = tmp_path / "model.ifc"
+        path.write_bytes(open(os.path.join(FIXTURES, "bug_2517_test2.ifc"), "rb").read())
+        ifc = stream(path, save_index=True)
+        assert os.path.exists(get_index_path(path))
+        ifc2 = stream(path)
+        assert ifc2.load_index()
+        assert list(ifc2.id_map.items()) == list(ifc.id_map.items())
+        assert list(ifc2.id_offset.items()) == list(ifc.id_offset.items())
+        assert ifc2.inverses.offsets.tolist() == ifc.inverses.offsets.tolist()
+        assert ifc2.inverses.values.tolist() == ifc.inverses.values.tolist()
+        assert ifc2.by_type("IfcProject")[0].Name == "My Project"
+
+    def test_ignoring_a_stale_index(self, tmp_path):
+        path = tmp_path / "model.ifc"
+        path.write_bytes(open(os.path.join(FIXTURES, "bug_2517_test2.ifc"), "rb").read())
+        ifc = stream(path, save_index=True)
+        path.write_bytes(path.read_bytes().replace(b"'My Project'", b"'My Other Project'"))
+        assert not ifc.load_index()
+        assert stream(path).by_type("IfcProject")[0].Name == "My Other Project"
+
+    def test_saving_an_index_when_opening_a_file(self, tmp_path):
+        path = tmp_path / "model.ifc"
+        path.write_bytes(open(os.path.join(FIXTURES, "bug_2517_test2.ifc"), "rb").read())
+        ifcopenshell.open(path, should_stream=True)
+        assert not os.path.exists(get_index_path(path))
+        ifcopenshell.open(path, should_stream=True, save_index=True)
+        assert os.path.exists(get_index_path(path))
+        index_path = tmp_path / "other.index"
+        ifc = ifcopenshell.open(path, should_stream=True, save_index=True, index_path=index_path)
+        assert ifc.index_path == index_path
+        assert os.path.exists(index_path)
+        assert ifc.load_index()
+
+    def test_prebuilding_indexes_for_a_directory(self, tmp_path):
+        for name in ("a.ifc", "b.ifc"):
+            (tmp_path / name).write_bytes(open(os.path.join(FIXTURES, "bug_2517_test2.ifc"), "rb").read())
+        paths = build_indexes(tmp_path)
+        assert paths == [str(tmp_path / "a.ifc.index"), str(tmp_path / "b.ifc.index")]
+        assert all(os.path.exists(p) for p in paths)
+
+
+if __name__ == "__main__":
+    pytest.main(["-sx", __file__])
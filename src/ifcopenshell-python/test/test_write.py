@@ -64,3 +64,24 @@ class TestWrite:
 
     def test_write_to_non_existing_dir(self):
         self.assert_model_is_written("tmp/model.ifczip")
+
+    def test_write_ifc_zip_ifcspf_format_without_an_unzipped_copy(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "model.ifcZIP"
+            self.model.write(file_path)
+            assert [p.name for p in Path(temp_dir).iterdir()] == ["model.ifcZIP"]
+            model = ifcopenshell.open(file_path)
+            assert len(list(model)) == len(list(self.model))
+
+    def test_writing_to_a_callable_in_chunks(self):
+        chunks = []
+        self.model.wrapped_data.write_to(chunks.append, 64)
+        assert all(len(chunk) <= 64 for chunk in chunks)
+        assert b"".join(chunks) == self.model.to_bytes()
+
+    def test_propagating_errors_when_writing_to_a_callable(self):
+        def write(data):
+            raise OSError("No space left on device")
+
+        with pytest.raises(OSError):
+            self.model.wrapped_data.write_to(write, 64)
@@ -51,6 +51,10 @@ class Patcher:
           entities will be separated into multiple rows. This means the ifc_id
           is no longer a unique primary key. If False, lists will be stored as
           JSON.
+        - should_get_inverses: if True, each table has an inverses column with
+          a JSON list of the ids of instances referencing each row, and an
+          indexed inverses table is created with one row per reference. This
+          is required by ifcopenshell.sqlite.
         - should_get_psets: if True, a separate psets table will be created to
           make it easy to query properties. This is in addition to regular IFC
           tables like IfcPropertySet.
@@ -106,6 +110,9 @@ class Patcher:
         self.create_id_map()
         self.create_metadata()
 
+        if self.should_get_inverses:
+            self.create_inverses_table()
+
         if self.should_get_psets:
             self.create_pset_table()
 
@@ -146,6 +153,9 @@ class Patcher:
                 for row in self.geometry_rows.values():
                     self.c.execute("INSERT INTO geometry VALUES (%s, %s, %s, %s, %s, %s);", row)
 
+        if self.should_get_inverses:
+            self.create_inverses_indices()
+
         self.db.commit()
         self.db.close()
 
@@ -254,6 +264,34 @@ class Patcher:
             self.c.execute(statement)
             self.c.execute("INSERT INTO metadata VALUES (%s, %s, %s);", metadata)
 
+    def create_inverses_table(self):
+        # One row per reference, where ifc_id is referenced by the attribute
+        # at attribute_index of referenced_by. Instances referencing ifc_id
+        # multiple times have multiple rows.
+        if self.sql_type == "sqlite":
+            statement = """
+            CREATE TABLE IF NOT EXISTS inverses (
+                ifc_id integer NOT NULL,
+                referenced_by integer NOT NULL,
+                attribute_index integer NOT NULL
+            );
+            """
+        elif self.sql_type == "mysql":
+            statement = """
+            CREATE TABLE `inverses` (
+              `ifc_id` int(10) unsigned NOT NULL,
+              `referenced_by` int(10) unsigned NOT NULL,
+              `attribute_index` int(10) unsigned NOT NULL
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3 COLLATE=utf8mb3_general_ci;
+            """
+        self.c.execute(statement)
+
+    def create_inverses_indices(self):
+        # Indices are created after inserting all rows, which is faster than
+        # maintaining them during the inserts
+        self.c.execute("CREATE INDEX inverses_ifc_id ON inverses (ifc_id);")
+        self.c.execute("CREATE INDEX inverses_referenced_by ON inverses (referenced_by);")
+
     def create_pset_table(self):
         statement = """
         CREATE TABLE IF NOT EXISTS psets (
@@ -312,7 +350,7 @@ class Patcher:
         for i in range(0, total_attributes):
             attribute = declaration.attribute_by_index(i)
             primitive = ifcopenshell.util.attribute.get_primitive_type(attribute)
-            if primitive in ("string", "enum"):
+            if primitive in ("string", "enum", "binary"):
                 data_type = "TEXT"
             elif primitive in ("entity", "integer", "boolean"):
                 data_type = "INTEGER"
@@ -353,6 +391,8 @@ class Patcher:
                 data_type = "int(10) unsigned"
             elif primitive == "boolean":
                 data_type = "tinyint(1)"
+            elif primitive == "binary":
+                data_type = "text"
             elif primitive == "integer":
                 data_type = "int(10)"
                 if "Positive" in str(attribute.type_of_attribute()):
@@ -387,6 +427,7 @@ class Patcher:
         rows = []
         id_map_rows = []
         pset_rows = []
+        inverse_rows = []
 
         for element in elements:
             nested_indices = []
@@ -416,7 +457,9 @@ class Patcher:
                     values.append(attribute)
 
             if self.should_get_inverses:
-                values.append(json.dumps([e.id() for e in self.file.get_inverse(element)]))
+                inverses = self.file.get_inverse(element, allow_duplicate=True, with_attribute_indices=True)
+                values.append(json.dumps(list({e.id() for e, _ in inverses})))
+                inverse_rows.extend([(element.id(), e.id(), i) for e, i in inverses])
 
             if self.should_expand:
                 rows.extend(self.get_permutations(values, nested_indices))
@@ -445,12 +488,16 @@ class Patcher:
                 self.c.executemany("INSERT INTO id_map VALUES (?, ?);", id_map_rows)
             if pset_rows:
                 self.c.executemany("INSERT INTO psets VALUES (?, ?, ?, ?);", pset_rows)
+            if inverse_rows:
+                self.c.executemany("INSERT INTO inverses VALUES (?, ?, ?);", inverse_rows)
         elif self.sql_type == "mysql":
             if rows:
                 self.c.executemany(f"INSERT INTO {ifc_class} VALUES ({','.join(['%s']*len(rows[0]))});", rows)
                 self.c.executemany("INSERT INTO id_map VALUES (%s, %s);", id_map_rows)
             if pset_rows:
                 self.c.executemany("INSERT INTO psets VALUES (%s, %s, %s, %s);", pset_rows)
+            if inverse_rows:
+                self.c.executemany("INSERT INTO inverses VALUES (%s, %s, %s);", inverse_rows)
 
     def serialise_value(self, element, value):
         return element.walk(
@@ -59,6 +59,61 @@ class attribute_value_derived {};
 class attribute_value_derived {};
 %}
 
+%{
+// A stream buffer which passes its contents to a Python callable whenever it
+// is full or flushed. Once the callable raises, all further output is dropped
+// and the Python exception is left set for the caller to propagate.
+class python_write_buffer : public std::streambuf {
+public:
+	python_write_buffer(PyObject* write, size_t size)
+		: write_(write)
+		, buffer_(size)
+		, failed_(false)
+	{
+		setp(buffer_.data(), buffer_.data() + buffer_.size());
+	}
+
+	bool failed() const { return failed_; }
+
+protected:
+	int_type overflow(int_type c) {
+		if (!flush_buffer()) {
+			return traits_type::eof();
+		}
+		if (!traits_type::eq_int_type(c, traits_type::eof())) {
+			*pptr() = traits_type::to_char_type(c);
+			pbump(1);
+		}
+		return traits_type::not_eof(c);
+	}
+
+	int sync() {
+		return flush_buffer() ? 0 : -1;
+	}
+
+private:
+	bool flush_buffer() {
+		const std::ptrdiff_t n = pptr() - pbase();
+		if (n > 0 && !failed_) {
+			PyObject* data = PyBytes_FromStringAndSize(pbase(), n);
+			PyObject* result = data ? PyObject_CallFunctionObjArgs(write_, data, nullptr) : nullptr;
+			Py_XDECREF(data);
+			if (result) {
+				Py_DECREF(result);
+			} else {
+				failed_ = true;
+			}
+		}
+		setp(buffer_.data(), buffer_.data() + buffer_.size());
+		return !failed_;
+	}
+
+	PyObject* write_;
+	std::vector<char> buffer_;
+	bool failed_;
+};
+%}
+
 %extend attribute_value_derived {
 	%pythoncode %{
 		def __bool__(self): return False
@@ -138,6 +193,38 @@ static IfcUtil::ArgumentType helper_fn_attribute_type(const IfcUtil::IfcBaseClas
 		return $self->getTotalInverses(e->data().id());
 	}
 
+	// A tuple with the tuple of inverses of every id, in the order of ids
+	PyObject* get_inverse_many(const std::vector<int>& ids) {
+		PyObject* result = PyTuple_New(ids.size());
+		for (size_t i = 0; i < ids.size(); ++i) {
+			PyTuple_SetItem(result, i, pythonize($self->getInverse(ids[i], 0, -1)));
+		}
+		return result;
+	}
+
+	std::vector<int> get_total_inverses_many(const std::vector<int>& ids) {
+		std::vector<int> totals;
+		totals.reserve(ids.size());
+		for (std::vector<int>::const_iterator it = ids.begin(); it != ids.end(); ++it) {
+			totals.push_back($self->getTotalInverses(*it));
+		}
+		return totals;
+	}
+
+	std::vector<unsigned> by_type_ids(const std::string& t, bool include_subtypes = true) {
+		aggregate_of_instance::ptr instances = include_subtypes
+			? $self->instances_by_type(t)
+			: $self->instances_by_type_excl_subtypes(t);
+		std::vector<unsigned> ids;
+		if (instances) {
+			ids.reserve(instances->size());
+			for (aggregate_of_instance::it it = instances->begin(); it != instances->end(); ++it) {
+				ids.push_back((*it)->data().id());
+			}
+		}
+		return ids;
+	}
+
 	void write(const std::string& fn) {
 		std::ofstream f(IfcUtil::path::from_utf8(fn).c_str());
 		f << (*$self);
@@ -149,6 +236,28 @@ static IfcUtil::ArgumentType helper_fn_attribute_type(const IfcUtil::IfcBaseClas
 		return s.str();
 	}
 
+	// Serialised as Python bytes, avoiding the UTF-8 decoding into a str
+	PyObject* to_bytes() {
+		std::stringstream s;
+		s << (*$self);
+		const std::string data = s.str();
+		return PyBytes_FromStringAndSize(data.data(), data.size());
+	}
+
+	// Serialised in chunks passed to a Python callable, such as the write
+	// method of a file object, so the data is never held in memory at once
+	PyObject* write_to(PyObject* write, size_t chunk_size = 1 << 24) {
+		python_write_buffer buffer(write, chunk_size);
+		std::ostream s(&buffer);
+		s << (*$self);
+		s.flush();
+		if (buffer.failed()) {
+			// The exception raised by the callable is propagated
+			return nullptr;
+		}
+		Py_RETURN_NONE;
+	}
+
 	std::vector<unsigned> entity_names() const {
 		std::vector<unsigned> keys;
 		keys.reserve(std::distance($self->begin(), $self->end()));
@@ -578,10 +687,23 @@ static IfcUtil::ArgumentType helper_fn_attribute_type(const IfcUtil::IfcBaseClas
 // The IfcFile* returned by open() is to be freed by SWIG/Python
 %newobject open;
 %newobject read;
+%newobject read_buffer;
 %newobject parse_ifcxml;
 
+%{
+	// Releases the GIL for the lifetime of the object, so that files can be
+	// parsed concurrently from Python threads. Only used around code that
+	// does not touch any Python objects.
+	struct scoped_gil_release {
+		PyThreadState* state;
+		scoped_gil_release() : state(PyEval_SaveThread()) {}
+		~scoped_gil_release() { PyEval_RestoreThread(state); }
+	};
+%}
+
 %inline %{
 	IfcParse::IfcFile* open(const std::string& fn) {
+		scoped_gil_release release;
 		IfcParse::IfcFile* f = new IfcParse::IfcFile(fn);
 		return f;
 	}
@@ -593,6 +715,17 @@ static IfcUtil::ArgumentType helper_fn_attribute_type(const IfcUtil::IfcBaseClas
 		return f;
 	}
 
+	// Parses SPF data from a Python buffer without an intermediate Python
+	// string. The parser takes ownership of the copied data.
+	IfcParse::IfcFile* read_buffer(char* buffer_data, size_t buffer_length) {
+		if (buffer_length > (size_t) std::numeric_limits<int>::max()) {
+			delete[] buffer_data;
+			throw IfcParse::IfcException("Buffer exceeds the maximum size of an in-memory IFC-SPF file");
+		}
+		scoped_gil_release release;
+		return new IfcParse::IfcFile((void *)buffer_data, (int) buffer_length);
+	}
+
 	const char* version() {
 		return IFCOPENSHELL_VERSION;
 	}
@@ -317,4 +317,16 @@ CREATE_VECTOR_TYPEMAP_IN(std::string, STRING, str)
 
 CREATE_OPTIONAL_TYPEMAP_IN(int, integer, int)
 CREATE_OPTIONAL_TYPEMAP_IN(double, real, float)
-CREATE_OPTIONAL_TYPEMAP_IN(std::string, string, str)
\ No newline at end of file
+CREATE_OPTIONAL_TYPEMAP_IN(std::string, string, str)
+// Any contiguous Python buffer (bytes, bytearray, memoryview, mmap) is copied
+// once into a new array, ownership of which is passed on to the callee.
+%typemap(in) (char* buffer_data, size_t buffer_length) {
+	Py_buffer view;
+	if (PyObject_GetBuffer($input, &view, PyBUF_CONTIG_RO) != 0) {
+		SWIG_fail;
+	}
+	$2 = (size_t) view.len;
+	$1 = new char[$2];
+	memcpy($1, view.buf, $2);
+	PyBuffer_Release(&view);
+}